@@ -0,0 +1,17 @@
+
+from django.contrib import admin
+from .models import DailySales, DailyProductSales
+
+@admin.register(DailySales)
+class DailySalesAdmin(admin.ModelAdmin):
+    list_display = ('day', 'status', 'orders', 'units', 'revenue')
+    list_filter = ('status',)
+    date_hierarchy = 'day'
+
+@admin.register(DailyProductSales)
+class DailyProductSalesAdmin(admin.ModelAdmin):
+    list_display = ('day', 'product', 'status', 'orders', 'units', 'revenue')
+    list_filter = ('status',)
+    list_select_related = ('product',)
+    raw_id_fields = ('product',)
+    date_hierarchy = 'day'
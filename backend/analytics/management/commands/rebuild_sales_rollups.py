@@ -0,0 +1,78 @@
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils.dateparse import parse_date
+
+from analytics.models import DailySales, DailyProductSales
+from products.models import Order, OrderItem
+
+BATCH_SIZE = 5_000
+
+
+class Command(BaseCommand):
+    help = 'Recompute the sales rollup tables from orders (backfill, or repair after manual edits)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help='Only rebuild days on or after this date (YYYY-MM-DD)')
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            since = parse_date(options['since'])
+            if since is None:
+                raise CommandError('--since must be a date, e.g. 2024-01-31')
+
+        orders = Order.objects.all()
+        items = OrderItem.objects.all()
+        daily = DailySales.objects.all()
+        daily_products = DailyProductSales.objects.all()
+        if since:
+            orders = orders.filter(created_at__date__gte=since)
+            items = items.filter(order__created_at__date__gte=since)
+            daily = daily.filter(day__gte=since)
+            daily_products = daily_products.filter(day__gte=since)
+
+        with transaction.atomic():
+            daily.delete()
+            daily_products.delete()
+
+            # Days follow the current time zone, as timezone.localdate() does for live updates
+            units = {
+                (row['day'], row['order__status']): row['units']
+                for row in items.annotate(day=TruncDate('order__created_at')).values('day', 'order__status')
+                .annotate(units=Sum('quantity')).order_by()
+            }
+            days = [
+                DailySales(
+                    day=row['day'], status=row['status'], orders=row['orders'], revenue=row['revenue'],
+                    units=units.get((row['day'], row['status']), 0),
+                )
+                for row in orders.annotate(day=TruncDate('created_at')).values('day', 'status')
+                .annotate(orders=Count('id'), revenue=Sum('total_amount')).order_by()
+            ]
+            DailySales.objects.bulk_create(days, batch_size=BATCH_SIZE)
+
+            rows = (
+                DailyProductSales(
+                    day=row['day'], product_id=row['product_id'], status=row['order__status'],
+                    orders=row['orders'], units=row['units'], revenue=row['revenue'],
+                )
+                for row in items.annotate(day=TruncDate('order__created_at'))
+                .values('day', 'product_id', 'order__status')
+                .annotate(
+                    orders=Count('order_id', distinct=True),
+                    units=Sum('quantity'),
+                    revenue=Sum(F('quantity') * F('price'), output_field=DecimalField(max_digits=14, decimal_places=2)),
+                )
+                .order_by()
+                .iterator(chunk_size=BATCH_SIZE)
+            )
+            created = 0
+            while batch := list(islice(rows, BATCH_SIZE)):
+                DailyProductSales.objects.bulk_create(batch)
+                created += len(batch)
+
+        self.stdout.write(f'Rebuilt {len(days)} daily and {created} daily product rollup rows')
@@ -0,0 +1,51 @@
+
+from django.db import models
+from django.db.models.signals import pre_delete
+from django.dispatch import receiver
+from products.models import Order, Product
+
+# Pre-aggregated sales, maintained incrementally by analytics.rollups as orders are
+# created, change status or are deleted. Rows are keyed by the order's current status,
+# so a cancellation moves its numbers to 'cancelled' instead of losing them.
+
+class DailySales(models.Model):
+    day = models.DateField()
+    status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    orders = models.IntegerField(default=0)
+    units = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'status'], name='daily_sales_day_status_uniq'),
+        ]
+    
+    def __str__(self):
+        return f"{self.day} {self.status}: {self.revenue}"
+
+class DailyProductSales(models.Model):
+    day = models.DateField()
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='daily_sales')
+    status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    # Orders that contained the product
+    orders = models.IntegerField(default=0)
+    units = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'product', 'status'], name='daily_product_sales_uniq'),
+        ]
+        indexes = [
+            # Per-product history for a date range
+            models.Index(fields=['product', 'day'], name='daily_product_sales_prod_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.day} #{self.product_id} {self.status}: {self.revenue}"
+
+# Take deleted orders (including cascades from user deletion) out of the rollups
+@receiver(pre_delete, sender=Order)
+def remove_order_from_rollups(sender, instance, **kwargs):
+    from .rollups import remove_order
+    remove_order(instance)
@@ -0,0 +1,114 @@
+
+"""
+Incremental maintenance of the sales rollup tables.
+
+Each order contributes one DailySales row and one DailyProductSales row per
+product, under its creation day and current status. Changes are applied as
+deltas with a single INSERT ... ON CONFLICT DO UPDATE per table (SQLite and
+PostgreSQL), inside the caller's transaction, so rollups commit or roll back
+together with the order change that caused them.
+"""
+
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import connection
+from django.utils import timezone
+
+from products.models import OrderItem
+from .models import DailySales, DailyProductSales
+
+SUMMED = ['orders', 'units', 'revenue']
+
+
+def upsert_deltas(model, keys, rows, batch_size=500):
+    """Add each row's orders/units/revenue to the row with the same keys, creating it if needed"""
+    for start in range(0, len(rows), batch_size):
+        upsert_batch(model, keys, rows[start:start + batch_size])
+
+
+def upsert_batch(model, keys, rows):
+    qn = connection.ops.quote_name
+    table = qn(model._meta.db_table)
+    key_columns = [qn(model._meta.get_field(key).column) for key in keys]
+    summed = [qn(name) for name in SUMMED]
+    placeholders = '(' + ', '.join(['%s'] * (len(keys) + len(SUMMED))) + ')'
+    sql = (
+        f"INSERT INTO {table} ({', '.join(key_columns + summed)}) "
+        f"VALUES {', '.join([placeholders] * len(rows))} "
+        f"ON CONFLICT ({', '.join(key_columns)}) DO UPDATE SET "
+        + ', '.join(f'{column} = {table}.{column} + excluded.{column}' for column in summed)
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [value for row in rows for value in row])
+
+
+class Deltas:
+    """Accumulates order contributions so a whole batch is written with one upsert per table"""
+    
+    def __init__(self):
+        self.daily = defaultdict(lambda: [0, 0, Decimal('0')])
+        self.products = defaultdict(lambda: [0, 0, Decimal('0')])
+    
+    def add(self, order, items, status, sign):
+        """Add (sign=1) or subtract (sign=-1) an order's contribution under `status`"""
+        day = timezone.localdate(order.created_at)
+        lines = defaultdict(lambda: [0, Decimal('0')])
+        for item in items:
+            lines[item.product_id][0] += item.quantity
+            lines[item.product_id][1] += item.quantity * item.price
+        
+        daily = self.daily[(day, status)]
+        daily[0] += sign
+        daily[1] += sign * sum(quantity for quantity, _ in lines.values())
+        daily[2] += sign * order.total_amount
+        for product_id, (quantity, revenue) in lines.items():
+            totals = self.products[(day, product_id, status)]
+            totals[0] += sign
+            totals[1] += sign * quantity
+            totals[2] += sign * revenue
+    
+    def save(self):
+        upsert_deltas(DailySales, ['day', 'status'], [
+            (*key, *totals) for key, totals in sorted(self.daily.items())
+        ])
+        upsert_deltas(DailyProductSales, ['day', 'product', 'status'], [
+            (*key, *totals) for key, totals in sorted(self.products.items())
+        ])
+
+
+def items_by_order(order_ids):
+    items = defaultdict(list)
+    for item in OrderItem.objects.filter(order_id__in=order_ids).only('order_id', 'product_id', 'quantity', 'price'):
+        items[item.order_id].append(item)
+    return items
+
+
+def record_order(order, items):
+    """Count a newly created order; `items` are its OrderItems"""
+    deltas = Deltas()
+    deltas.add(order, items, order.status, 1)
+    deltas.save()
+
+
+def move_orders(orders, new_status):
+    """
+    Move orders' numbers to `new_status`, e.g. reverse them on cancellation.
+
+    `orders` are (order, previous_status) pairs; items are loaded in one query.
+    """
+    moved = [(order, previous) for order, previous in orders if previous != new_status]
+    if not moved:
+        return
+    items = items_by_order([order.pk for order, _ in moved])
+    deltas = Deltas()
+    for order, previous in moved:
+        deltas.add(order, items[order.pk], previous, -1)
+        deltas.add(order, items[order.pk], new_status, 1)
+    deltas.save()
+
+
+def remove_order(order):
+    deltas = Deltas()
+    deltas.add(order, items_by_order([order.pk])[order.pk], order.status, -1)
+    deltas.save()
@@ -0,0 +1,106 @@
+
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from products.models import Order, Product
+from .models import DailySales, DailyProductSales
+
+
+def snapshot():
+    return (
+        sorted((str(r.day), r.status, r.orders, r.units, r.revenue) for r in DailySales.objects.all() if r.orders),
+        sorted(
+            (str(r.day), r.product_id, r.status, r.orders, r.units, r.revenue)
+            for r in DailyProductSales.objects.all() if r.orders
+        ),
+    )
+
+
+class SalesRollupTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.staff = User.objects.create_user('staff', 'staff@example.com', is_staff=True)
+        self.customer = User.objects.create_user('jane', 'jane@example.com')
+        self.lamp = Product.objects.create(name='Lamp', description='', price=Decimal('10.00'))
+        self.rug = Product.objects.create(name='Rug', description='', price=Decimal('25.50'))
+        self.client = APIClient()
+
+    def place_order(self, items):
+        self.client.force_authenticate(self.customer)
+        response = self.client.post('/api/orders/', {
+            'shipping_address': '1 Road', 'billing_address': '1 Road',
+            'items': [{'product': product.id, 'quantity': quantity} for product, quantity in items],
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        return response.data['id']
+
+    def set_status(self, order_id, new_status):
+        self.client.force_authenticate(self.staff)
+        return self.client.post(f'/api/orders/{order_id}/update_status/', {'status': new_status}, format='json')
+
+    def test_orders_update_rollups(self):
+        self.place_order([(self.lamp, 2), (self.rug, 1)])
+        self.place_order([(self.lamp, 1), (self.lamp, 1)])
+        today = timezone.localdate()
+
+        day = DailySales.objects.get(day=today, status='pending')
+        self.assertEqual((day.orders, day.units, day.revenue), (2, 5, Decimal('65.50')))
+        lamp = DailyProductSales.objects.get(day=today, product=self.lamp, status='pending')
+        self.assertEqual((lamp.orders, lamp.units, lamp.revenue), (2, 4, Decimal('40.00')))
+
+    def test_status_changes_move_and_cancellations_reverse(self):
+        order_id = self.place_order([(self.lamp, 2)])
+        self.place_order([(self.rug, 2)])
+        self.assertEqual(self.set_status(order_id, 'processing').status_code, 200)
+        self.assertEqual(self.set_status(order_id, 'cancelled').status_code, 200)
+
+        rows = {r.status: (r.orders, r.revenue) for r in DailySales.objects.all()}
+        self.assertEqual(rows['pending'], (1, Decimal('51.00')))
+        self.assertEqual(rows['processing'], (0, Decimal('0.00')))
+        self.assertEqual(rows['cancelled'], (1, Decimal('20.00')))
+        self.assertEqual(self.set_status(order_id, 'bogus').status_code, 400)
+
+        Order.objects.get(pk=order_id).delete()
+        self.assertEqual(DailySales.objects.get(status='cancelled').orders, 0)
+
+    def test_rebuild_matches_incremental_rollups(self):
+        first = self.place_order([(self.lamp, 2), (self.rug, 1)])
+        self.place_order([(self.rug, 3)])
+        self.set_status(first, 'delivered')
+        expected = snapshot()
+
+        DailySales.objects.all().delete()
+        call_command('rebuild_sales_rollups', stdout=StringIO())
+        self.assertEqual(snapshot(), expected)
+
+    def test_analytics_endpoint(self):
+        order_id = self.place_order([(self.lamp, 2), (self.rug, 1)])
+        self.place_order([(self.rug, 2)])
+        cancelled = self.place_order([(self.lamp, 5)])
+        self.set_status(cancelled, 'cancelled')
+
+        self.client.force_authenticate(self.staff)
+        with self.assertNumQueries(4):
+            data = self.client.get('/api/analytics/').data
+        self.assertEqual(data['totals'], {'orders': 2, 'units': 5, 'revenue': '96.50'})
+        self.assertEqual([row['day'] for row in data['daily']], [timezone.localdate()])
+        self.assertEqual([p['name'] for p in data['top_products']], ['Rug', 'Lamp'])
+        self.assertEqual(data['by_status']['cancelled']['orders'], 1)
+
+        data = self.client.get('/api/analytics/', {'product': self.lamp.id, 'status': 'pending,cancelled'}).data
+        self.assertEqual(data['totals'], {'orders': 2, 'units': 7, 'revenue': '70.00'})
+
+        yesterday = timezone.localdate() - timedelta(days=1)
+        data = self.client.get('/api/analytics/', {'end': str(yesterday)}).data
+        self.assertEqual(data['totals']['orders'], 0)
+
+        self.client.force_authenticate(self.customer)
+        self.assertEqual(self.client.get('/api/analytics/').status_code, 403)
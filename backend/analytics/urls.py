@@ -0,0 +1,7 @@
+
+from django.urls import path
+from .views import AnalyticsView
+
+urlpatterns = [
+    path('', AnalyticsView.as_view(), name='analytics'),
+]
@@ -0,0 +1,82 @@
+
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db.models import Sum
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from rest_framework import permissions, status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from products.models import Order
+from .models import DailySales, DailyProductSales
+
+CENTS = Decimal('0.01')
+
+def totals(row):
+    return {
+        'orders': row['orders'] or 0,
+        'units': row['units'] or 0,
+        'revenue': str(Decimal(row['revenue'] or 0).quantize(CENTS)),
+    }
+
+class AnalyticsView(APIView):
+    """Sales dashboard numbers, read from the pre-aggregated rollup tables"""
+    permission_classes = [permissions.IsAdminUser]
+    default_days = 30
+    max_top_products = 100
+    
+    def get(self, request):
+        params = request.query_params
+        
+        try:
+            end = parse_date(params['end']) if params.get('end') else timezone.localdate()
+            start = parse_date(params['start']) if params.get('start') else end - timedelta(days=self.default_days - 1)
+        except (TypeError, ValueError):
+            start = end = None
+        if start is None or end is None:
+            return Response({'error': 'start and end must be dates (YYYY-MM-DD)'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Cancelled orders are left out unless asked for explicitly
+        valid_statuses = dict(Order.STATUS_CHOICES)
+        statuses = [s for s in params.get('status', '').split(',') if s] or [
+            s for s in valid_statuses if s != 'cancelled'
+        ]
+        if any(s not in valid_statuses for s in statuses):
+            return Response({'error': 'Unknown status'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            limit = min(max(int(params.get('limit', 10)), 1), self.max_top_products)
+        except ValueError:
+            limit = 10
+        
+        sums = {'orders': Sum('orders'), 'units': Sum('units'), 'revenue': Sum('revenue')}
+        daily = DailySales.objects.filter(day__range=(start, end), status__in=statuses)
+        products = DailyProductSales.objects.filter(day__range=(start, end), status__in=statuses)
+        if params.get('product'):
+            try:
+                product_id = int(params['product'])
+            except ValueError:
+                return Response({'error': 'product must be an integer id'}, status=status.HTTP_400_BAD_REQUEST)
+            products = products.filter(product_id=product_id)
+            # For one product the daily series comes from its own rollup
+            daily = products
+        
+        by_status = DailySales.objects.filter(day__range=(start, end)).values('status').annotate(**sums).order_by('status')
+        top_products = products.values('product_id', 'product__name').annotate(**sums).order_by('-revenue')[:limit]
+        
+        return Response({
+            'start': start,
+            'end': end,
+            'statuses': statuses,
+            'totals': totals(daily.aggregate(**sums)),
+            'daily': [
+                {'day': row['day'], **totals(row)}
+                for row in daily.values('day').annotate(**sums).order_by('day')
+            ],
+            'by_status': {row['status']: totals(row) for row in by_status},
+            'top_products': [
+                {'product_id': row['product_id'], 'name': row['product__name'], **totals(row)}
+                for row in top_products
+            ],
+        })
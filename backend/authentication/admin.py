@@ -1,8 +1,22 @@
 
 from django.contrib import admin
+from django.contrib.auth.models import User
+from django.db.models import Q
+from ecommerce_backend.admin import LargeTableAdmin, prefix_q
 from .models import UserProfile
 
 @admin.register(UserProfile)
-class UserProfileAdmin(admin.ModelAdmin):
+class UserProfileAdmin(LargeTableAdmin):
     list_display = ('user', 'full_name')
-    search_fields = ('user__email', 'user__username', 'full_name')
+    list_select_related = ('user',)
+    raw_id_fields = ('user',)
+    search_fields = ('^user__username', '^full_name')
+    search_help_text = 'Start of the username or full name, or an exact email'
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        # auth_user.email has no index, so it is only searched for emails
+        users = User.objects.filter(email=term) if '@' in term else User.objects.filter(prefix_q('username', term))
+        return queryset.filter(prefix_q('full_name', term) | Q(user__in=users.values('pk'))), False
@@ -0,0 +1,61 @@
+
+import json
+
+from django.contrib.auth.models import User
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from rest_framework import status
+from .hashing import PoolOverloaded, hashing_pool
+from .views import login_user, register_user
+
+# Async-native counterparts of LoginView and RegisterView for the ASGI deployment.
+# The event loop only parses and routes; password hashing and the ORM work around
+# it run in the bounded hashing pool, which sheds load with 429 + Retry-After.
+
+def parse_json(request):
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+def overloaded(error):
+    response = JsonResponse(
+        {'error': 'Too many requests, please retry shortly'},
+        status=status.HTTP_429_TOO_MANY_REQUESTS,
+    )
+    response['Retry-After'] = str(error.retry_after)
+    return response
+
+@csrf_exempt
+@require_POST
+async def login_view(request):
+    data = parse_json(request)
+    if data is None:
+        return JsonResponse({'error': 'Invalid JSON body'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    # Try to find user by email
+    try:
+        username = (await User.objects.aget(email=data.get('email'))).username
+    except User.DoesNotExist:
+        return JsonResponse({'error': 'Invalid credentials'}, status=status.HTTP_401_UNAUTHORIZED)
+    
+    try:
+        payload, status_code = await hashing_pool.run(login_user, username, data.get('password'))
+    except PoolOverloaded as e:
+        return overloaded(e)
+    return JsonResponse(payload, status=status_code)
+
+@csrf_exempt
+@require_POST
+async def register_view(request):
+    data = parse_json(request)
+    if data is None:
+        return JsonResponse({'error': 'Invalid JSON body'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        payload, status_code = await hashing_pool.run(register_user, data)
+    except PoolOverloaded as e:
+        return overloaded(e)
+    return JsonResponse(payload, status=status_code)
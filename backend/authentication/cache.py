@@ -0,0 +1,79 @@
+
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from .models import UserProfile
+
+def snapshot(instance):
+    return [getattr(instance, field.attname) for field in instance._meta.concrete_fields]
+
+def restore(model, values):
+    return model.from_db('default', [field.attname for field in model._meta.concrete_fields], values)
+
+class UserCache:
+    """
+    Bounded LRU of User + UserProfile rows with a TTL, local to this process.
+
+    Rows are stored as plain values and a fresh instance is built on every
+    hit, so one request mutating request.user can never leak into another.
+    Saves in this process invalidate immediately via signals; the TTL bounds
+    how long other processes may serve a stale copy.
+    """
+    
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        # Bumped on every invalidation so a load that raced with a save is not stored
+        self.generation = 0
+    
+    def get(self, user_id):
+        key = str(user_id)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires, user_values, profile_values = entry
+            if expires < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+        
+        user = restore(User, user_values)
+        if profile_values is not None:
+            user.profile = restore(UserProfile, profile_values)
+        return user
+    
+    def set(self, user_id, user, generation):
+        try:
+            profile_values = snapshot(user.profile)
+        except UserProfile.DoesNotExist:
+            profile_values = None
+        entry = (time.monotonic() + self.ttl, snapshot(user), profile_values)
+        
+        with self.lock:
+            if generation != self.generation:
+                return
+            self.entries[str(user_id)] = entry
+            self.entries.move_to_end(str(user_id))
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+    
+    def invalidate(self, user_id):
+        with self.lock:
+            self.generation += 1
+            self.entries.pop(str(user_id), None)
+    
+    def clear(self):
+        with self.lock:
+            self.generation += 1
+            self.entries.clear()
+
+user_cache = UserCache(
+    max_size=getattr(settings, 'USER_CACHE_SIZE', 10000),
+    ttl=getattr(settings, 'USER_CACHE_TTL', 60),
+)
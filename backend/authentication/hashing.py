@@ -0,0 +1,82 @@
+
+import asyncio
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+
+
+class PoolOverloaded(Exception):
+    def __init__(self, retry_after):
+        self.retry_after = retry_after
+        super().__init__(f"Password hashing pool is full, retry after {retry_after}s")
+
+
+class HashingPool:
+    """
+    Bounded thread pool for password hashing work (PBKDF2 releases the GIL).
+
+    At most `workers` jobs run at once and at most `max_queue` more may wait.
+    Anything beyond that is refused immediately with PoolOverloaded, so a login
+    burst turns into fast 429s instead of an ever-growing queue of requests
+    that will time out anyway.
+    """
+
+    def __init__(self, workers, max_queue):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hashing')
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        # Moving average of job duration, used to estimate Retry-After
+        self.average_seconds = 0.3
+
+    @property
+    def queue_depth(self):
+        return max(self.in_flight - self.workers, 0)
+
+    def retry_after(self):
+        waves = math.ceil((self.in_flight + 1) / self.workers)
+        return max(1, math.ceil(waves * self.average_seconds))
+
+    def reserve(self):
+        with self.lock:
+            if self.in_flight >= self.workers + self.max_queue:
+                raise PoolOverloaded(self.retry_after())
+            self.in_flight += 1
+
+    def release(self, elapsed=None):
+        with self.lock:
+            self.in_flight -= 1
+            if elapsed is not None:
+                self.average_seconds = 0.8 * self.average_seconds + 0.2 * elapsed
+
+    def call(self, fn, *args, **kwargs):
+        # Pool threads live outside the request cycle, so manage DB connections here
+        close_old_connections()
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            close_old_connections()
+            self.release(time.perf_counter() - start)
+
+    async def run(self, fn, *args, **kwargs):
+        """Run `fn` in the pool from async code, or raise PoolOverloaded"""
+        self.reserve()
+        try:
+            future = self.executor.submit(self.call, fn, *args, **kwargs)
+        except BaseException:
+            self.release()
+            raise
+        return await asyncio.wrap_future(future)
+
+
+hashing_pool = HashingPool(
+    workers=getattr(settings, 'PASSWORD_HASHING_WORKERS', None) or os.cpu_count() or 2,
+    max_queue=getattr(settings, 'PASSWORD_HASHING_QUEUE', 32),
+)
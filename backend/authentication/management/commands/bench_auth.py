@@ -0,0 +1,43 @@
+
+from unittest import mock
+
+from django.core.management.base import BaseCommand
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from authentication.authentication import CachedJWTAuthentication
+from authentication.cache import user_cache
+from authentication.views import UserView
+from products import benchmarks
+from products.views import OrderViewSet
+
+
+class Command(BaseCommand):
+    help = 'Compare per-request cost of JWTAuthentication and CachedJWTAuthentication'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=200)
+
+    def handle(self, *args, **options):
+        with benchmarks.benchmark_database():
+            benchmarks.seed_catalog(100)
+            user = benchmarks.create_bench_user('benchauth')
+            benchmarks.seed_orders(20, [user.id])
+
+            client = APIClient()
+            client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+
+            measurements = []
+            for label, auth_class in (('jwt', JWTAuthentication), ('cached jwt', CachedJWTAuthentication)):
+                user_cache.clear()
+                with mock.patch.object(UserView, 'authentication_classes', [auth_class]), \
+                        mock.patch.object(OrderViewSet, 'authentication_classes', [auth_class]):
+                    measurements.append(benchmarks.measure(
+                        f'auth user ({label})', lambda: client.get('/api/auth/user/'), options['iterations']
+                    ))
+                    measurements.append(benchmarks.measure(
+                        f'orders list ({label})', lambda: client.get('/api/orders/'), options['iterations']
+                    ))
+
+            self.stdout.write(benchmarks.format_table(measurements))
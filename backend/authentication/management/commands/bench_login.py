@@ -0,0 +1,63 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient
+from rest_framework.test import APIClient
+
+from products import benchmarks
+
+
+class Command(BaseCommand):
+    help = 'Load-test login under concurrency: thread-per-request sync view vs the async view with its hashing pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Login attempts per scenario')
+        parser.add_argument('--concurrency', default='8,32,128', help='Comma-separated numbers of concurrent clients')
+
+    def handle(self, *args, **options):
+        with benchmarks.benchmark_database():
+            user = benchmarks.create_bench_user('benchlogin')
+            self.payload = {'email': user.email, 'password': benchmarks.BENCH_PASSWORD}
+
+            self.stdout.write(
+                f'{"scenario":<24} {"clients":>7} {"n":>5} {"p50 ms":>9} {"p95 ms":>9} {"req/s":>8} {"429s":>5}'
+            )
+            for concurrency in [int(n) for n in options['concurrency'].split(',')]:
+                self.report('sync (threads)', concurrency, *self.run_sync(options['requests'], concurrency))
+                self.report('async (hashing pool)', concurrency, *asyncio.run(self.run_async(options['requests'], concurrency)))
+
+    def report(self, name, concurrency, results, elapsed):
+        timings = sorted(ms for ms, _ in results)
+        shed = sum(1 for _, status in results if status == 429)
+        self.stdout.write(
+            f'{name:<24} {concurrency:>7} {len(results):>5} {benchmarks.percentile(timings, 0.5):>9.1f} '
+            f'{benchmarks.percentile(timings, 0.95):>9.1f} {len(results) / elapsed:>8.1f} {shed:>5}'
+        )
+
+    def run_sync(self, requests, concurrency):
+        # Stands in for a WSGI server with `concurrency` worker threads
+        def login():
+            start = time.perf_counter()
+            response = APIClient().post('/api/auth/login/', self.payload, format='json')
+            return (time.perf_counter() - start) * 1000, response.status_code
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(lambda _: login(), range(requests)))
+        return results, time.perf_counter() - started
+
+    async def run_async(self, requests, concurrency):
+        client = AsyncClient()
+        gate = asyncio.Semaphore(concurrency)
+
+        async def login():
+            async with gate:
+                start = time.perf_counter()
+                response = await client.post('/api/auth/async/login/', self.payload, content_type='application/json')
+                return (time.perf_counter() - start) * 1000, response.status_code
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(login() for _ in range(requests)))
+        return results, time.perf_counter() - started
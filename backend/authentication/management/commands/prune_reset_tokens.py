@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from authentication.models import PasswordResetToken
+
+
+class Command(BaseCommand):
+    help = 'Delete used and expired password reset tokens in bounded batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--sleep', type=float, default=0, help='Seconds to pause between batches')
+
+    def handle(self, *args, **options):
+        deleted = 0
+        while True:
+            # Short delete transactions keep locks brief on a busy table
+            ids = list(PasswordResetToken.objects.stale().values_list('pk', flat=True)[:options['batch_size']])
+            if not ids:
+                break
+            deleted += PasswordResetToken.objects.filter(pk__in=ids).delete()[0]
+            if options['sleep']:
+                time.sleep(options['sleep'])
+        
+        self.stdout.write(f'Deleted {deleted} password reset tokens')
@@ -1,14 +1,25 @@
 
-from django.db import models
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.db import models, transaction
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
+from django.utils import timezone
 
 class UserProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
     full_name = models.CharField(max_length=255, blank=True)
     phone = models.CharField(max_length=20, blank=True)
     
+    class Meta:
+        indexes = [
+            # Prefix search in the admin
+            models.Index(fields=['full_name'], name='profile_full_name_idx'),
+        ]
+    
     def __str__(self):
         return self.user.username
 
@@ -24,11 +35,46 @@ def save_user_profile(sender, instance, **kwargs):
         UserProfile.objects.create(user=instance)
     instance.profile.save()
 
+class PasswordResetTokenQuerySet(models.QuerySet):
+    @staticmethod
+    def cutoff():
+        return timezone.now() - timedelta(seconds=settings.PASSWORD_RESET_TIMEOUT)
+
+    def valid(self):
+        return self.filter(used=False, created_at__gte=self.cutoff())
+
+    def stale(self):
+        """Used or expired tokens, safe to delete"""
+        return self.filter(models.Q(used=True) | models.Q(created_at__lt=self.cutoff()))
+
 class PasswordResetToken(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
-    token = models.CharField(max_length=100)
+    # SHA-256 of the token sent by email; the token itself is never stored
+    token_hash = models.CharField(max_length=64, unique=True)
     created_at = models.DateTimeField(auto_now_add=True)
     used = models.BooleanField(default=False)
     
+    objects = PasswordResetTokenQuerySet.as_manager()
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'created_at'], name='reset_token_user_created_idx'),
+        ]
+    
     def __str__(self):
         return f"{self.user.username} - {self.created_at}"
+
+# Drop cached request users when the user or profile changes (including password resets).
+# Only once the change is committed: invalidating earlier would let a concurrent request
+# load the old row again and cache it after the invalidation.
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    from .cache import user_cache
+    transaction.on_commit(partial(user_cache.invalidate, instance.pk))
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def invalidate_cached_profile(sender, instance, **kwargs):
+    from .cache import user_cache
+    transaction.on_commit(partial(user_cache.invalidate, instance.user_id))
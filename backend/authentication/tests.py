@@ -1,4 +1,189 @@
 
-from django.test import TestCase
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.management import call_command
+from django.test import AsyncClient, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .cache import user_cache
+from .hashing import HashingPool, PoolOverloaded
+from .models import PasswordResetToken
+from .tokens import hash_token
+
+
+class CachedJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        user_cache.clear()
+        self.user = User.objects.create_user('jane', 'jane@example.com')
+        self.user.profile.full_name = 'Jane Doe'
+        self.user.profile.save()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+
+    def test_cached_user_needs_no_queries(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get('/api/auth/user/').data['profile']['full_name'], 'Jane Doe')
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/auth/user/')
+        self.assertEqual(response.data['email'], 'jane@example.com')
+
+    def test_profile_and_user_saves_invalidate(self):
+        self.client.get('/api/auth/user/')
+        profile = self.user.profile
+        profile.full_name = 'Jane Smith'
+        with self.captureOnCommitCallbacks(execute=True):
+            profile.save()
+        self.assertEqual(self.client.get('/api/auth/user/').data['profile']['full_name'], 'Jane Smith')
+
+        self.user.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        self.assertEqual(self.client.get('/api/auth/user/').status_code, 401)
+
+    def test_invalidation_waits_for_commit(self):
+        self.client.get('/api/auth/user/')
+        self.user.email = 'smith@example.com'
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.user.save()
+            self.assertIsNotNone(user_cache.get(self.user.id))
+        for callback in callbacks:
+            callback()
+        self.assertIsNone(user_cache.get(self.user.id))
+
+    def test_hits_return_independent_instances(self):
+        self.client.get('/api/auth/user/')
+        first = user_cache.get(self.user.id)
+        first.email = 'changed@example.com'
+        self.assertEqual(user_cache.get(self.user.id).email, 'jane@example.com')
+
+    def test_lru_is_bounded(self):
+        cache = type(user_cache)(max_size=2, ttl=60)
+        for user_id in (1, 2, 3):
+            cache.set(user_id, User(id=user_id, username=str(user_id)), cache.generation)
+        self.assertIsNone(cache.get(1))
+        self.assertEqual(cache.get(3).username, '3')
+
+    def test_load_racing_an_invalidation_is_not_stored(self):
+        generation = user_cache.generation
+        user_cache.invalidate(self.user.id)
+        user_cache.set(self.user.id, self.user, generation)
+        self.assertIsNone(user_cache.get(self.user.id))
+
+
+class AsyncAuthViewTests(TransactionTestCase):
+    # Hashing runs on pool threads with their own connections, so test data must be committed
+    def setUp(self):
+        User.objects.create_user('jane', 'jane@example.com', 'secret-password-1')
+        self.client = AsyncClient()
+
+    async def test_login(self):
+        response = await self.client.post(
+            '/api/auth/async/login/', {'email': 'jane@example.com', 'password': 'secret-password-1'},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['user']['username'], 'jane')
+        self.assertIn('token', response.json())
+
+        response = await self.client.post(
+            '/api/auth/async/login/', {'email': 'jane@example.com', 'password': 'wrong'},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 401)
+
+    async def test_register(self):
+        response = await self.client.post('/api/auth/async/register/', {
+            'username': 'john', 'email': 'john@example.com',
+            'password': 'secret-password-2', 'full_name': 'John',
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertTrue(await User.objects.filter(username='john').aexists())
+
+    async def test_full_pool_sheds_with_retry_after(self):
+        pool = HashingPool(workers=1, max_queue=0)
+        pool.in_flight = 1
+        with mock.patch('authentication.async_views.hashing_pool', pool):
+            response = await self.client.post(
+                '/api/auth/async/login/', {'email': 'jane@example.com', 'password': 'secret-password-1'},
+                content_type='application/json',
+            )
+        self.assertEqual(response.status_code, 429)
+        self.assertGreaterEqual(int(response['Retry-After']), 1)
+
+
+class HashingPoolTests(TestCase):
+    def test_reserve_is_bounded_by_workers_and_queue(self):
+        pool = HashingPool(workers=2, max_queue=1)
+        for _ in range(3):
+            pool.reserve()
+        self.assertEqual(pool.queue_depth, 1)
+        with self.assertRaises(PoolOverloaded):
+            pool.reserve()
+        pool.release()
+        pool.reserve()
+
+
+class PasswordResetTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('jane', 'jane@example.com', 'old-password-1')
+        self.client = APIClient()
+
+    def request_token(self):
+        self.client.post('/api/auth/password-reset/', {'email': 'jane@example.com'}, format='json')
+        return mail.outbox[-1].body.rsplit('token=', 1)[1]
+
+    def confirm(self, token, password='new-password-1'):
+        return self.client.post('/api/auth/password-reset/confirm/', {'token': token, 'password': password}, format='json')
+
+    def test_token_is_stored_hashed_and_single_use(self):
+        token = self.request_token()
+        reset_token = PasswordResetToken.objects.get()
+        self.assertEqual(reset_token.token_hash, hash_token(token))
+        self.assertNotIn(token, reset_token.token_hash)
+
+        self.assertEqual(self.confirm(token).status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password('new-password-1'))
+        self.assertEqual(self.confirm(token, 'other-password-1').status_code, 400)
+
+    def test_expired_token_is_rejected(self):
+        token = self.request_token()
+        PasswordResetToken.objects.update(created_at=timezone.now() - timedelta(hours=25))
+        self.assertEqual(self.confirm(token).status_code, 400)
+
+    @override_settings(PASSWORD_RESET_TOKEN_MODE='signed')
+    def test_signed_tokens_need_no_writes(self):
+        with self.assertNumQueries(1):
+            token = self.request_token()
+        self.assertFalse(PasswordResetToken.objects.exists())
+
+        self.assertEqual(self.confirm(token).status_code, 200)
+        # Changing the password invalidates the signature
+        self.assertEqual(self.confirm(token, 'other-password-1').status_code, 400)
+        self.assertEqual(self.confirm('bad.token').status_code, 400)
+
+    def test_non_string_token_is_rejected(self):
+        self.request_token()
+        for token in (['a.b'], {'token': 'a.b'}, 12345, True):
+            response = self.confirm(token)
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.data, {'error': 'Token and password must be strings'})
+        self.assertEqual(self.confirm('some-token', ['new-password-1']).status_code, 400)
+        self.assertFalse(PasswordResetToken.objects.get().used)
+
+    def test_prune_deletes_used_and_expired_tokens(self):
+        fresh = PasswordResetToken.objects.create(user=self.user, token_hash='a' * 64)
+        PasswordResetToken.objects.create(user=self.user, token_hash='b' * 64, used=True)
+        expired = PasswordResetToken.objects.create(user=self.user, token_hash='c' * 64)
+        PasswordResetToken.objects.filter(pk=expired.pk).update(created_at=timezone.now() - timedelta(days=2))
+
+        out = StringIO()
+        call_command('prune_reset_tokens', batch_size=1, stdout=out)
+        self.assertIn('Deleted 2', out.getvalue())
+        self.assertEqual(list(PasswordResetToken.objects.values_list('pk', flat=True)), [fresh.pk])
@@ -0,0 +1,57 @@
+
+import hashlib
+import secrets
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.auth.tokens import default_token_generator
+from django.utils.encoding import force_bytes, force_str
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+from .models import PasswordResetToken
+
+# Password reset tokens come in two flavours, chosen with PASSWORD_RESET_TOKEN_MODE:
+#
+# - 'db' (default): a random token whose SHA-256 is stored in PasswordResetToken,
+#   looked up through a unique index and marked used on confirmation.
+# - 'signed': '<uidb64>.<token>' from Django's PasswordResetTokenGenerator. Nothing
+#   is written when the link is requested; the HMAC covers the password hash and
+#   last login, so the token stops working once the password has been changed.
+#
+# Confirmation accepts both, so switching modes does not break links already sent.
+
+SIGNED_SEPARATOR = '.'
+
+
+def hash_token(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def issue_reset_token(user):
+    if getattr(settings, 'PASSWORD_RESET_TOKEN_MODE', 'db') == 'signed':
+        uidb64 = urlsafe_base64_encode(force_bytes(user.pk))
+        return f'{uidb64}{SIGNED_SEPARATOR}{default_token_generator.make_token(user)}'
+    
+    token = secrets.token_urlsafe(32)
+    PasswordResetToken.objects.create(user=user, token_hash=hash_token(token))
+    return token
+
+
+def consume_reset_token(token):
+    """Return the user a valid reset token belongs to, marking DB tokens used, or None"""
+    if SIGNED_SEPARATOR in token:
+        uidb64, _, signed = token.partition(SIGNED_SEPARATOR)
+        try:
+            user = User.objects.get(pk=force_str(urlsafe_base64_decode(uidb64)))
+        except (ValueError, TypeError, OverflowError, User.DoesNotExist):
+            return None
+        return user if default_token_generator.check_token(user, signed) else None
+    
+    reset_token = PasswordResetToken.objects.valid().select_related('user').filter(token_hash=hash_token(token)).first()
+    if reset_token is None:
+        return None
+    
+    # Claim the token with a conditional update so two concurrent confirmations can't both use it
+    if not PasswordResetToken.objects.filter(pk=reset_token.pk, used=False).update(used=True):
+        return None
+    return reset_token.user
@@ -6,10 +6,13 @@ from .views import (
     PasswordResetRequestView, PasswordResetConfirmView,
     SendNotificationView
 )
+from .async_views import login_view, register_view
 
 urlpatterns = [
     path('register/', RegisterView.as_view(), name='register'),
     path('login/', LoginView.as_view(), name='login'),
+    path('async/register/', register_view, name='register-async'),
+    path('async/login/', login_view, name='login-async'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('user/', UserView.as_view(), name='user'),
     path('password-reset/', PasswordResetRequestView.as_view(), name='password-reset'),
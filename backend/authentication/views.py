@@ -9,38 +9,59 @@ from django.core.mail import send_mail
 from django.conf import settings
 from django.utils.crypto import get_random_string
 from .serializers import RegisterSerializer, UserSerializer
-from .models import UserProfile, PasswordResetToken
-import uuid
+from .models import UserProfile
+from .tokens import consume_reset_token, issue_reset_token
 import logging
 
 logger = logging.getLogger(__name__)
 
+def register_user(data):
+    """Create an account and issue tokens; returns (payload, status). Shared by the sync and async views"""
+    serializer = RegisterSerializer(data=data)
+    if not serializer.is_valid():
+        return serializer.errors, status.HTTP_400_BAD_REQUEST
+    user = serializer.save()
+    
+    # Save phone number if provided
+    if 'phone' in data:
+        profile = user.profile
+        profile.phone = data['phone']
+        profile.save()
+    
+    # Generate tokens for the new user
+    refresh = RefreshToken.for_user(user)
+    
+    return {
+        'message': 'User registered successfully',
+        'tokens': {
+            'refresh': str(refresh),
+            'access': str(refresh.access_token),
+        },
+        'user': UserSerializer(user).data
+    }, status.HTTP_201_CREATED
+
+def login_user(username, password):
+    """Check credentials and issue tokens; returns (payload, status). Shared by the sync and async views"""
+    user = authenticate(username=username, password=password)
+    
+    if user:
+        refresh = RefreshToken.for_user(user)
+        
+        return {
+            'token': str(refresh.access_token),
+            'refresh': str(refresh),
+            'user': UserSerializer(user).data
+        }, status.HTTP_200_OK
+    
+    return {'error': 'Invalid credentials'}, status.HTTP_401_UNAUTHORIZED
+
 class RegisterView(generics.CreateAPIView):
     permission_classes = [permissions.AllowAny]
     serializer_class = RegisterSerializer
     
     def create(self, request, *args, **kwargs):
-        serializer = self.get_serializer(data=request.data)
-        serializer.is_valid(raise_exception=True)
-        user = serializer.save()
-        
-        # Save phone number if provided
-        if 'phone' in request.data:
-            profile = user.profile
-            profile.phone = request.data['phone']
-            profile.save()
-        
-        # Generate tokens for the new user
-        refresh = RefreshToken.for_user(user)
-        
-        return Response({
-            'message': 'User registered successfully',
-            'tokens': {
-                'refresh': str(refresh),
-                'access': str(refresh.access_token),
-            },
-            'user': UserSerializer(user).data
-        }, status=status.HTTP_201_CREATED)
+        data, status_code = register_user(request.data)
+        return Response(data, status=status_code)
 
 class LoginView(APIView):
     permission_classes = [permissions.AllowAny]
@@ -55,18 +76,8 @@ class LoginView(APIView):
         except User.DoesNotExist:
             return Response({'error': 'Invalid credentials'}, status=status.HTTP_401_UNAUTHORIZED)
         
-        user = authenticate(username=username, password=password)
-        
-        if user:
-            refresh = RefreshToken.for_user(user)
-            
-            return Response({
-                'token': str(refresh.access_token),
-                'refresh': str(refresh),
-                'user': UserSerializer(user).data
-            })
-            
-        return Response({'error': 'Invalid credentials'}, status=status.HTTP_401_UNAUTHORIZED)
+        data, status_code = login_user(username, password)
+        return Response(data, status=status_code)
 
 class UserView(APIView):
     permission_classes = [permissions.IsAuthenticated]
@@ -88,11 +99,8 @@ class PasswordResetRequestView(APIView):
             # Don't reveal that the email doesn't exist
             return Response({'message': 'If your email exists in our system, you will receive a password reset link'})
         
-        # Generate unique token
-        token = uuid.uuid4().hex
-        
-        # Save token to database
-        PasswordResetToken.objects.create(user=user, token=token)
+        # Generate token (stored hashed, or signed and not stored at all)
+        token = issue_reset_token(user)
         
         # Send email with reset link
         try:
@@ -119,28 +127,18 @@ class PasswordResetConfirmView(APIView):
         
         if not token or not password:
             return Response({'error': 'Token and password are required'}, status=status.HTTP_400_BAD_REQUEST)
+        # A JSON body can carry any type; consume_reset_token() expects a string
+        if not isinstance(token, str) or not isinstance(password, str):
+            return Response({'error': 'Token and password must be strings'}, status=status.HTTP_400_BAD_REQUEST)
         
-        try:
-            reset_token = PasswordResetToken.objects.get(token=token, used=False)
-        except PasswordResetToken.DoesNotExist:
+        user = consume_reset_token(token)
+        if user is None:
             return Response({'error': 'Invalid or expired token'}, status=status.HTTP_400_BAD_REQUEST)
         
-        # Check if token is not older than 24 hours
-        from django.utils import timezone
-        from datetime import timedelta
-        
-        if timezone.now() - reset_token.created_at > timedelta(hours=24):
-            return Response({'error': 'Token expired'}, status=status.HTTP_400_BAD_REQUEST)
-        
         # Update user password
-        user = reset_token.user
         user.set_password(password)
         user.save()
         
-        # Mark token as used
-        reset_token.used = True
-        reset_token.save()
-        
         return Response({'message': 'Password has been reset successfully'})
 
 class SendNotificationView(APIView):
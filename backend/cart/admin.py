@@ -0,0 +1,15 @@
+
+from django.contrib import admin
+from .models import Cart, CartItem
+
+class CartItemInline(admin.TabularInline):
+    model = CartItem
+    raw_id_fields = ('product',)
+    extra = 0
+
+@admin.register(Cart)
+class CartAdmin(admin.ModelAdmin):
+    list_display = ('user', 'item_count', 'subtotal', 'updated_at')
+    list_select_related = ('user',)
+    raw_id_fields = ('user',)
+    inlines = [CartItemInline]
@@ -0,0 +1,10 @@
+
+from django.apps import AppConfig
+
+class CartConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'cart'
+
+    def ready(self):
+        # Registers the shared-cache deploy check
+        from . import checks
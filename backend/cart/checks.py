@@ -0,0 +1,26 @@
+
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+# Backends that keep a separate store per process
+LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def cart_cache_is_local():
+    return settings.CACHES['default']['BACKEND'] in LOCAL_CACHES
+
+
+@register(Tags.caches, deploy=True)
+def check_cart_cache(app_configs, **kwargs):
+    """Carts live in the cache, so every worker must share it"""
+    if not cart_cache_is_local():
+        return []
+    return [Error(
+        'Carts are stored in a per-process cache, so each worker has its own carts and '
+        'flush_carts cannot see them.',
+        hint='Set REDIS_URL (or configure a shared CACHES backend) in production.',
+        id='cart.E001',
+    )]
@@ -0,0 +1,33 @@
+
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+
+from cart.checks import cart_cache_is_local
+from cart.store import flush_dirty_carts
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Write carts changed in the cache to the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=10.0, help='Seconds between runs')
+        parser.add_argument('--once', action='store_true', help='Write dirty carts once and exit')
+
+    def handle(self, *args, **options):
+        if cart_cache_is_local():
+            self.stderr.write(
+                'Warning: the cache is per-process, so this command only sees carts changed in this process. '
+                'Set REDIS_URL so it can write the carts of the web workers.'
+            )
+        while True:
+            flushed, failed = flush_dirty_carts()
+            if flushed or failed:
+                logger.info(f'Wrote {flushed} carts, {failed} failed')
+            if options['once']:
+                self.stdout.write(f'Wrote {flushed} carts, {failed} failed')
+                return
+            time.sleep(options['interval'])
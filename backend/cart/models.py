@@ -0,0 +1,31 @@
+
+from django.contrib.auth.models import User
+from django.db import models
+from products.models import Product
+
+# Durable copy of each user's cart. The live cart is kept in the cache and
+# written here behind the requests that change it, see cart.store.
+
+class Cart(models.Model):
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='cart')
+    subtotal = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    item_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"Cart of {self.user.username}: {self.item_count} items"
+
+class CartItem(models.Model):
+    cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name='items')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField()
+    # Unit price when the product was added; checkout prices from the catalog again
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['cart', 'product'], name='cart_item_product_uniq'),
+        ]
+    
+    def __str__(self):
+        return f"{self.quantity} x #{self.product_id} in {self.cart}"
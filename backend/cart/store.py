@@ -0,0 +1,282 @@
+
+"""
+Carts kept in the cache, written behind to the database.
+
+A user's cart lives under `cart:<user id>` as its lines plus a running
+subtotal and item count. Each change adjusts the totals by the difference
+it makes instead of re-summing the lines, and needs no database access once
+the cart and the product are cached.
+
+Changed carts are marked dirty and written to Cart/CartItem by the request
+that changes them once CART_WRITE_BEHIND_SECONDS have passed since the last
+write and by `manage.py flush_carts`, so losing the cache loses at most that
+window. A cart missing from the cache is loaded from the database.
+
+Dirty carts are found through an append-only log in the cache: marking a
+cart takes the next number from the `cart:dirty:seq` counter (an atomic
+incr) and stores the user id under `cart:dirty:<n>`, so no lock is shared
+between carts. The flusher reads the log from its cursor onwards. A number can
+be taken before its entry is stored, so the cursor stops at the first empty
+slot; a slot still empty DIRTY_GAP_SECONDS later was evicted and is skipped.
+
+The cache must be shared by every worker (Redis); a per-process cache would
+give each worker its own carts, see checks.py.
+"""
+
+import logging
+import time
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from products.cache import get_catalog_version
+from products.checkout import place_order
+from products.models import Product
+from .models import Cart, CartItem
+
+CART_TIMEOUT = getattr(settings, 'CART_CACHE_TIMEOUT', 30 * 24 * 60 * 60)
+WRITE_BEHIND_SECONDS = getattr(settings, 'CART_WRITE_BEHIND_SECONDS', 30)
+MAX_LINES = getattr(settings, 'CART_MAX_LINES', 100)
+MAX_QUANTITY = getattr(settings, 'CART_MAX_QUANTITY', 999)
+
+DIRTY_SEQ_KEY = 'cart:dirty:seq'
+DIRTY_CURSOR_KEY = 'cart:dirty:cursor'
+# (last number, time) of the log when the flusher last stopped at an empty slot
+DIRTY_GAP_KEY = 'cart:dirty:gap'
+DIRTY_GAP_SECONDS = 60
+# Log entries read per get_many() by the flusher
+FLUSH_CHUNK = 500
+
+logger = logging.getLogger(__name__)
+
+
+class CartBusy(Exception):
+    """Another request holds the cart lock"""
+
+
+class CartError(Exception):
+    """A change the cart cannot accept, e.g. an unknown product or too many lines"""
+
+
+def cart_key(user_id):
+    return f'cart:{user_id}'
+
+
+@contextmanager
+def locked(key, wait=2.0, timeout=10):
+    """Cross-process mutex on a cache key; `timeout` frees locks of crashed holders"""
+    deadline = time.monotonic() + wait
+    while not cache.add(key, 1, timeout):
+        if time.monotonic() > deadline:
+            raise CartBusy(key)
+        time.sleep(0.005)
+    try:
+        yield
+    finally:
+        cache.delete(key)
+
+
+def empty_state():
+    return {'lines': {}, 'subtotal': Decimal('0.00'), 'item_count': 0, 'dirty': False, 'flushed_at': time.time()}
+
+
+def load_cart(user_id):
+    state = cache.get(cart_key(user_id))
+    if state is not None:
+        return state
+
+    state = empty_state()
+    items = CartItem.objects.filter(cart__user_id=user_id).select_related('product').only(
+        'product_id', 'product__name', 'quantity', 'price'
+    ).order_by('id')
+    for item in items:
+        state['lines'][item.product_id] = {
+            'product': item.product_id, 'name': item.product.name, 'price': item.price, 'quantity': item.quantity,
+        }
+        state['subtotal'] += item.price * item.quantity
+        state['item_count'] += item.quantity
+    # add() so a cart changed meanwhile by another request is not overwritten
+    if not cache.add(cart_key(user_id), state, CART_TIMEOUT):
+        return cache.get(cart_key(user_id)) or state
+    return state
+
+
+def product_snapshot(product_id):
+    """Name and price of a product, cached until the catalog changes"""
+    key = f'catalog:v{get_catalog_version()}:cart-product:{product_id}'
+    snapshot = cache.get(key)
+    if snapshot is None:
+        product = Product.objects.filter(pk=product_id).values('name', 'price').first()
+        if product is None:
+            raise CartError(f'Product {product_id} does not exist')
+        snapshot = {'name': product['name'], 'price': product['price']}
+        cache.set(key, snapshot, CART_TIMEOUT)
+    return snapshot
+
+
+def change_line(user_id, product_id, quantity=None, delta=0):
+    """Set a line to `quantity`, or add `delta` to it; zero removes the line"""
+    with locked(f'{cart_key(user_id)}:lock'):
+        state = load_cart(user_id)
+        line = state['lines'].get(product_id)
+        old_quantity = line['quantity'] if line else 0
+        new_quantity = max(0, quantity if quantity is not None else old_quantity + delta)
+        if new_quantity > MAX_QUANTITY:
+            raise CartError(f'At most {MAX_QUANTITY} of a product per cart')
+        if new_quantity == old_quantity:
+            return state
+
+        if line is None:
+            if len(state['lines']) >= MAX_LINES:
+                raise CartError(f'At most {MAX_LINES} different products per cart')
+            line = state['lines'][product_id] = {'product': product_id, **product_snapshot(product_id), 'quantity': 0}
+
+        # Adjust the totals by this change only
+        state['subtotal'] += line['price'] * (new_quantity - old_quantity)
+        state['item_count'] += new_quantity - old_quantity
+        if new_quantity:
+            line['quantity'] = new_quantity
+        else:
+            del state['lines'][product_id]
+        return save_cart(user_id, state)
+
+
+def clear_cart(user_id):
+    with locked(f'{cart_key(user_id)}:lock'):
+        state = load_cart(user_id)
+        if not state['lines']:
+            return state
+        state = {**empty_state(), 'dirty': state['dirty'], 'flushed_at': state['flushed_at']}
+        return save_cart(user_id, state)
+
+
+def save_cart(user_id, state):
+    """Store a changed cart (the caller holds its lock) and write it through when due"""
+    was_dirty = state['dirty']
+    state['dirty'] = True
+    if time.time() - state['flushed_at'] >= WRITE_BEHIND_SECONDS:
+        flush_cart(user_id, state)
+    elif not was_dirty:
+        mark_dirty(user_id)
+    cache.set(cart_key(user_id), state, CART_TIMEOUT)
+    return state
+
+
+def dirty_key(number):
+    return f'cart:dirty:{number}'
+
+
+def mark_dirty(user_id):
+    """Append a cart to the dirty log; called once per clean-to-dirty change"""
+    try:
+        number = cache.incr(DIRTY_SEQ_KEY)
+    except ValueError:
+        # First mark ever (or the counter was evicted): add() so only one caller creates it.
+        # Restart from the cursor so new numbers land after everything already read
+        cache.add(DIRTY_SEQ_KEY, cache.get(DIRTY_CURSOR_KEY) or 0, None)
+        number = cache.incr(DIRTY_SEQ_KEY)
+    cache.set(dirty_key(number), user_id, None)
+
+
+def flush_cart(user_id, state):
+    """Write a cart to the database; the caller holds its lock"""
+    with transaction.atomic():
+        cart, _ = Cart.objects.update_or_create(
+            user_id=user_id, defaults={'subtotal': state['subtotal'], 'item_count': state['item_count']}
+        )
+        CartItem.objects.filter(cart=cart).exclude(product_id__in=list(state['lines'])).delete()
+        CartItem.objects.bulk_create(
+            [
+                CartItem(cart=cart, product_id=line['product'], quantity=line['quantity'], price=line['price'])
+                for line in state['lines'].values()
+            ],
+            update_conflicts=True, unique_fields=['cart', 'product'], update_fields=['quantity', 'price'],
+        )
+    state['dirty'] = False
+    state['flushed_at'] = time.time()
+
+
+def flush_dirty_carts():
+    """
+    Write every cart changed since its last write.
+
+    Returns (flushed, failed). A cart that cannot be written is logged and
+    marked dirty again for the next run; the others are still written.
+    """
+    start = cache.get(DIRTY_CURSOR_KEY) or 0
+    end = cache.get(DIRTY_SEQ_KEY) or 0
+    if end <= start:
+        # Nothing new, or the counter was evicted and no cart has been marked since
+        return 0, 0
+
+    now = time.time()
+    gap = cache.get(DIRTY_GAP_KEY)
+    gap_end, gap_seen = gap or (0, now)
+    # Slots up to gap_end were already numbered DIRTY_GAP_SECONDS ago; still empty, they were evicted
+    settled = gap_end if now - gap_seen >= DIRTY_GAP_SECONDS else 0
+
+    flushed = failed = 0
+    cursor = start
+    stalled = False
+    for chunk_start in range(start + 1, end + 1, FLUSH_CHUNK):
+        numbers = range(chunk_start, min(chunk_start + FLUSH_CHUNK, end + 1))
+        entries = cache.get_many([dirty_key(number) for number in numbers])
+        for user_id in dict.fromkeys(entries.values()):
+            try:
+                if flush_dirty_cart(user_id):
+                    flushed += 1
+            except Exception:
+                failed += 1
+                logger.exception(f'Could not write cart of user {user_id}, retrying next run')
+                mark_dirty(user_id)
+        cache.delete_many(list(entries))
+
+        # Move the cursor up to the first slot whose entry may still be on its way
+        for number in numbers:
+            if stalled:
+                break
+            if dirty_key(number) in entries or number <= settled:
+                cursor = number
+            else:
+                stalled = True
+        cache.set(DIRTY_CURSOR_KEY, cursor, None)
+
+    if not stalled:
+        cache.delete(DIRTY_GAP_KEY)
+    elif gap is None or settled:
+        cache.set(DIRTY_GAP_KEY, (end, now), None)
+    return flushed, failed
+
+
+def flush_dirty_cart(user_id):
+    with locked(f'{cart_key(user_id)}:lock'):
+        state = cache.get(cart_key(user_id))
+        if state is None or not state['dirty']:
+            return False
+        flush_cart(user_id, state)
+        cache.set(cart_key(user_id), state, CART_TIMEOUT)
+        return True
+
+
+def checkout(user, **fields):
+    """
+    Turn the user's cart into an order and empty the cart, in one transaction.
+
+    Raises CartError for an empty cart and InsufficientStock (cart untouched)
+    when a product has run out.
+    """
+    with locked(f'{cart_key(user.id)}:lock'):
+        state = load_cart(user.id)
+        if not state['lines']:
+            raise CartError('Cart is empty')
+
+        with transaction.atomic():
+            order = place_order(user, [(line['product'], line['quantity']) for line in state['lines'].values()], **fields)
+            CartItem.objects.filter(cart__user=user).delete()
+            Cart.objects.filter(user=user).update(subtotal=0, item_count=0)
+
+        cache.set(cart_key(user.id), empty_state(), CART_TIMEOUT)
+    return order
@@ -0,0 +1,162 @@
+
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from products.models import Order, Product
+from . import store
+from .checks import check_cart_cache
+from .models import Cart, CartItem
+
+
+class CartTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('jane', 'jane@example.com')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.lamp = Product.objects.create(name='Lamp', description='', price=Decimal('12.50'), stock=5)
+        self.rug = Product.objects.create(name='Rug', description='', price=Decimal('30.00'))
+
+    def add(self, product, quantity=1):
+        return self.client.post('/api/cart/items/', {'product': product.id, 'quantity': quantity}, format='json')
+
+    def test_totals_follow_each_change(self):
+        self.add(self.lamp, 2)
+        data = self.add(self.rug).data
+        self.assertEqual((data['item_count'], data['subtotal']), (3, '55.00'))
+        self.assertEqual(data['items'][0], {
+            'product': self.lamp.id, 'name': 'Lamp', 'price': '12.50', 'quantity': 2, 'line_total': '25.00',
+        })
+
+        data = self.client.put(f'/api/cart/items/{self.lamp.id}/', {'quantity': 1}, format='json').data
+        self.assertEqual((data['item_count'], data['subtotal']), (2, '42.50'))
+        data = self.client.delete(f'/api/cart/items/{self.rug.id}/').data
+        self.assertEqual((data['item_count'], data['subtotal']), (1, '12.50'))
+
+        self.assertEqual(self.add(self.lamp, 0).status_code, 400)
+        self.assertEqual(self.client.post('/api/cart/items/', {'product': 999999}, format='json').status_code, 400)
+        self.assertEqual(self.client.delete('/api/cart/').data['item_count'], 0)
+
+    def test_changes_stay_in_the_cache_until_written_behind(self):
+        self.add(self.lamp)
+        self.add(self.rug)
+        # Once the cart and products are cached, clicks never reach the database
+        with self.assertNumQueries(0):
+            self.add(self.lamp)
+        self.assertFalse(CartItem.objects.exists())
+
+        call_command('flush_carts', '--once', stdout=StringIO())
+        cart = Cart.objects.get(user=self.user)
+        self.assertEqual((cart.item_count, cart.subtotal), (3, Decimal('55.00')))
+        self.assertEqual(
+            sorted(cart.items.values_list('product_id', 'quantity')), sorted([(self.lamp.id, 2), (self.rug.id, 1)])
+        )
+
+        # A cart evicted from the cache comes back from the database
+        cache.clear()
+        data = self.client.get('/api/cart/').data
+        self.assertEqual((data['item_count'], data['subtotal']), (3, '55.00'))
+
+    def test_flush_keeps_going_and_requeues_failures(self):
+        users = [self.user] + [User.objects.create_user(f'user{i}') for i in range(2)]
+        for user in users:
+            store.change_line(user.id, self.rug.id, delta=1)
+        failing = users[1].id
+        real_flush = store.flush_cart
+
+        def flush_cart(user_id, state):
+            if user_id == failing:
+                raise store.CartBusy(user_id)
+            return real_flush(user_id, state)
+
+        with mock.patch.object(store, 'flush_cart', side_effect=flush_cart):
+            self.assertEqual(store.flush_dirty_carts(), (2, 1))
+        self.assertEqual(set(Cart.objects.values_list('user_id', flat=True)), {users[0].id, users[2].id})
+
+        out = StringIO()
+        call_command('flush_carts', '--once', stdout=out, stderr=StringIO())
+        self.assertEqual(out.getvalue().strip(), 'Wrote 1 carts, 0 failed')
+        self.assertEqual(Cart.objects.count(), 3)
+        self.assertEqual(store.flush_dirty_carts(), (0, 0))
+
+    def test_mark_interleaved_with_a_flush_is_not_lost(self):
+        real_set = store.cache.set
+
+        def set_after_a_flush(key, *args):
+            # The flusher runs between mark_dirty's incr and its set
+            if key == store.dirty_key(1):
+                self.assertEqual(store.flush_dirty_carts(), (0, 0))
+            return real_set(key, *args)
+
+        with mock.patch.object(store.cache, 'set', side_effect=set_after_a_flush):
+            store.change_line(self.user.id, self.rug.id, delta=1)
+        self.assertEqual(store.flush_dirty_carts(), (1, 0))
+        self.assertEqual(Cart.objects.get().item_count, 1)
+
+    def test_evicted_log_entries_are_skipped_after_a_while(self):
+        users = [User.objects.create_user(f'user{i}') for i in range(2)]
+        store.change_line(users[0].id, self.rug.id, delta=1)
+        cache.delete(store.dirty_key(1))
+        store.change_line(users[1].id, self.rug.id, delta=1)
+        # Slot 1 might still be written, so the cursor waits there
+        self.assertEqual(store.flush_dirty_carts(), (1, 0))
+        self.assertEqual(cache.get(store.DIRTY_CURSOR_KEY), 0)
+        with mock.patch.object(store.time, 'time', return_value=store.time.time() + store.DIRTY_GAP_SECONDS):
+            store.flush_dirty_carts()
+        self.assertEqual(cache.get(store.DIRTY_CURSOR_KEY), 2)
+
+        # A counter evicted and restarted carries on after the cursor
+        cache.delete(store.DIRTY_SEQ_KEY)
+        store.change_line(self.user.id, self.rug.id, delta=1)
+        self.assertEqual(cache.get(store.DIRTY_SEQ_KEY), 3)
+        self.assertEqual(store.flush_dirty_carts(), (1, 0))
+
+    def test_deploy_check_rejects_a_per_process_cache(self):
+        self.assertEqual([e.id for e in check_cart_cache(None)], ['cart.E001'])
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache'}}):
+            self.assertEqual(check_cart_cache(None), [])
+
+    @mock.patch.object(store, 'WRITE_BEHIND_SECONDS', 0)
+    def test_write_behind_window(self):
+        self.add(self.lamp, 3)
+        self.assertEqual(CartItem.objects.get().quantity, 3)
+        self.client.delete('/api/cart/')
+        self.assertFalse(CartItem.objects.exists())
+
+    def test_checkout_creates_order_and_empties_cart(self):
+        self.add(self.lamp, 2)
+        self.add(self.rug)
+        # Checkout prices from the catalog, not from the cart
+        Product.objects.filter(pk=self.rug.pk).update(price=Decimal('28.00'))
+
+        response = self.client.post('/api/cart/checkout/', {'shipping_address': '1 Road', 'billing_address': '1 Road'})
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data['total_amount'], '53.00')
+        self.assertEqual([(i['product'], i['quantity']) for i in response.data['items']], [(self.lamp.id, 2), (self.rug.id, 1)])
+        self.lamp.refresh_from_db()
+        self.assertEqual(self.lamp.stock, 3)
+
+        self.assertEqual(self.client.get('/api/cart/').data['item_count'], 0)
+        self.assertEqual(self.client.post('/api/cart/checkout/', {
+            'shipping_address': '1 Road', 'billing_address': '1 Road',
+        }).status_code, 400)
+
+    def test_checkout_out_of_stock_keeps_cart(self):
+        self.add(self.lamp, 6)
+        response = self.client.post('/api/cart/checkout/', {'shipping_address': '1 Road', 'billing_address': '1 Road'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['out_of_stock'], [str(self.lamp.id)])
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(self.client.get('/api/cart/').data['item_count'], 6)
+        self.assertEqual(self.client.post('/api/cart/checkout/', {}).status_code, 400)
+
+    def test_requires_authentication(self):
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get('/api/cart/').status_code, 401)
@@ -0,0 +1,10 @@
+
+from django.urls import path
+from .views import CartView, CartItemsView, CartItemView, CheckoutView
+
+urlpatterns = [
+    path('', CartView.as_view(), name='cart'),
+    path('items/', CartItemsView.as_view(), name='cart-items'),
+    path('items/<int:product_id>/', CartItemView.as_view(), name='cart-item'),
+    path('checkout/', CheckoutView.as_view(), name='cart-checkout'),
+]
@@ -0,0 +1,102 @@
+
+from decimal import Decimal
+
+from rest_framework import permissions, status
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from products.inventory import InsufficientStock
+from products.models import Order
+from products.serializers import OrderSerializer
+from . import store
+
+CENTS = Decimal('0.01')
+
+def money(value):
+    return str(Decimal(value).quantize(CENTS))
+
+def cart_payload(state):
+    return {
+        'items': [
+            {
+                'product': line['product'],
+                'name': line['name'],
+                'price': money(line['price']),
+                'quantity': line['quantity'],
+                'line_total': money(line['price'] * line['quantity']),
+            }
+            for line in state['lines'].values()
+        ],
+        'item_count': state['item_count'],
+        'subtotal': money(state['subtotal']),
+    }
+
+def parse_quantity(value, minimum):
+    try:
+        quantity = int(value)
+    except (TypeError, ValueError):
+        return None
+    return quantity if quantity >= minimum else None
+
+class CartAPIView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def handle_exception(self, exc):
+        if isinstance(exc, store.CartBusy):
+            return Response(
+                {'error': 'Cart is being updated by another request, please retry'},
+                status=status.HTTP_409_CONFLICT, headers={'Retry-After': '1'},
+            )
+        if isinstance(exc, store.CartError):
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return super().handle_exception(exc)
+
+class CartView(CartAPIView):
+    """The current user's cart"""
+    
+    def get(self, request):
+        return Response(cart_payload(store.load_cart(request.user.id)))
+    
+    def delete(self, request):
+        return Response(cart_payload(store.clear_cart(request.user.id)))
+
+class CartItemsView(CartAPIView):
+    def post(self, request):
+        """Add `quantity` (default 1) of `product` to the cart"""
+        product_id = parse_quantity(request.data.get('product'), 1)
+        quantity = parse_quantity(request.data.get('quantity', 1), 1)
+        if product_id is None or quantity is None:
+            return Response(
+                {'error': 'product and a positive quantity are required'}, status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response(cart_payload(store.change_line(request.user.id, product_id, delta=quantity)))
+
+class CartItemView(CartAPIView):
+    def put(self, request, product_id):
+        """Set the quantity of a product; 0 removes it"""
+        quantity = parse_quantity(request.data.get('quantity'), 0)
+        if quantity is None:
+            return Response({'error': 'quantity must be 0 or more'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(cart_payload(store.change_line(request.user.id, product_id, quantity=quantity)))
+    
+    patch = put
+    
+    def delete(self, request, product_id):
+        return Response(cart_payload(store.change_line(request.user.id, product_id, quantity=0)))
+
+class CheckoutView(CartAPIView):
+    def post(self, request):
+        """Place an order for everything in the cart"""
+        fields = {name: request.data.get(name) for name in ('shipping_address', 'billing_address')}
+        missing = [name for name, value in fields.items() if not value]
+        if missing:
+            return Response({name: 'This field is required.' for name in missing}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            order = store.checkout(request.user, **fields)
+        except InsufficientStock as e:
+            # Same error shape as POST /api/orders/
+            raise ValidationError({'items': 'Not enough stock', 'out_of_stock': e.product_ids})
+        
+        order = Order.objects.with_details().get(pk=order.pk)
+        return Response(OrderSerializer(order, context={'request': request}).data, status=status.HTTP_201_CREATED)
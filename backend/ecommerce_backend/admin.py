@@ -0,0 +1,73 @@
+
+"""
+Admin building blocks for tables too large for the stock changelist.
+
+The default changelist runs two exact COUNT(*) queries per page and searches
+with `icontains`, a full scan on every column listed. LargeTableAdmin swaps
+in an estimated count and leaves search to lookups an index can answer.
+"""
+
+from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.db.models import Q, QuerySet
+from django.utils.functional import cached_property
+
+# Sorts after every other character, so [term, term + PREFIX_END) is a prefix range
+PREFIX_END = '\U0010ffff'
+
+
+def prefix_q(field, term):
+    """
+    Case-sensitive prefix match written as a range, which a plain B-tree
+    index on `field` can serve on any database (LIKE 'x%' cannot on SQLite).
+    """
+    return Q(**{f'{field}__gte': term, f'{field}__lt': term + PREFIX_END})
+
+
+def estimate_count(model, using='default'):
+    """Approximate row count of a model's table from database statistics, or None"""
+    connection = connections[using]
+    table = connection.ops.quote_name(model._meta.db_table)
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [table])
+            elif connection.vendor == 'sqlite' and model._meta.pk.get_internal_type() in ('AutoField', 'BigAutoField'):
+                # The largest rowid is an index lookup; it overcounts by the rows deleted since
+                cursor.execute(f'SELECT max(rowid) FROM {table}')
+            else:
+                return None
+            row = cursor.fetchone()
+    except DatabaseError:
+        return None
+    # reltuples is -1 for a table that was never analyzed
+    if row is None or row[0] is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that does not COUNT(*) an unfiltered large table.
+
+    Unfiltered querysets use estimate_count(); the exact count is still used
+    for filtered querysets, which the indexes narrow down, and for tables
+    estimated below `exact_below` rows.
+    """
+    exact_below = 10_000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if isinstance(queryset, QuerySet) and not queryset.query.where and not queryset.query.distinct:
+            estimate = estimate_count(queryset.model, queryset.db)
+            if estimate is not None and estimate >= self.exact_below:
+                return estimate
+        return super().count
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    # Skip the second, unfiltered COUNT(*) behind "N results (M total)"
+    show_full_result_count = False
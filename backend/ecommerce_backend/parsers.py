@@ -0,0 +1,22 @@
+
+"""orjson-backed JSON parser for the REST API, a drop-in for DRF's JSONParser"""
+
+import orjson
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+
+
+class ORJSONParser(JSONParser):
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        
+        try:
+            body = stream.read()
+            if encoding.lower().replace('_', '-') not in ('utf-8', 'utf8'):
+                body = body.decode(encoding)
+            # orjson rejects NaN and Infinity, as JSONParser does with STRICT_JSON
+            return orjson.loads(body)
+        except (ValueError, UnicodeDecodeError, LookupError) as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
@@ -0,0 +1,64 @@
+
+"""
+orjson-backed JSON renderer for the REST API.
+
+Output follows DRF's JSONRenderer with the default settings (compact
+separators, UTF-8, \\u2028/\\u2029 escaped). Types orjson does not encode
+natively, and datetimes, go through DRF's encoder so they are represented the
+same way. Indented output (the browsable API,
+`Accept: application/json; indent=4`) and anything orjson rejects fall back
+to JSONRenderer.
+
+Floats are the exception. orjson writes the shortest form, so exponents
+differ from `json.dumps` (`1e-6` rather than `1e-06`; the value parses the
+same). It also writes NaN and Infinity as `null` where DRF's strict mode
+refuses them; data holding those goes to JSONRenderer, which raises.
+"""
+
+import math
+
+import orjson
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+
+encoder = JSONEncoder()
+
+
+def has_non_finite_float(data):
+    stack = [data]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, float):
+            if not math.isfinite(value):
+                return True
+        elif isinstance(value, dict):
+            stack.extend(value.values())
+        elif isinstance(value, (list, tuple)):
+            stack.extend(value)
+    return False
+
+
+class ORJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        
+        renderer_context = renderer_context or {}
+        if self.ensure_ascii or not self.compact or not self.strict or self.get_indent(accepted_media_type, renderer_context) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        
+        try:
+            ret = orjson.dumps(data, default=encoder.default, option=OPTIONS)
+        except orjson.JSONEncodeError:
+            # e.g. integers beyond 64 bits
+            return super().render(data, accepted_media_type, renderer_context)
+        
+        # NaN and Infinity come out as null; only then is the data worth walking
+        if b'null' in ret and has_non_finite_float(data):
+            return super().render(data, accepted_media_type, renderer_context)
+        
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
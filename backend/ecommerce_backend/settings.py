@@ -32,9 +32,14 @@ INSTALLED_APPS = [
     # Local apps
     'products',
     'authentication',
+    'notifications',
+    'monitoring',
+    'analytics',
+    'cart',
 ]
 
 MIDDLEWARE = [
+    'monitoring.middleware.RequestProfilingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -45,6 +50,13 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Request profiling: Server-Timing headers, per-route histograms at /api/metrics/
+# and SQL capture for slow requests. Off unless REQUEST_PROFILING=1.
+REQUEST_PROFILING = os.environ.get('REQUEST_PROFILING') == '1'
+REQUEST_PROFILING_SLOW_MS = int(os.environ.get('REQUEST_PROFILING_SLOW_MS', 500))
+# Queries at least this slow record their calling line even in fast requests
+REQUEST_PROFILING_SLOW_QUERY_MS = int(os.environ.get('REQUEST_PROFILING_SLOW_QUERY_MS', 100))
+
 ROOT_URLCONF = 'ecommerce_backend.urls'
 
 TEMPLATES = [
@@ -66,13 +78,86 @@ TEMPLATES = [
 WSGI_APPLICATION = 'ecommerce_backend.wsgi.application'
 
 # Database
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+# DB_ENGINE picks the profile: 'sqlite' (default) or 'postgres'. Both keep connections
+# open between requests for DB_CONN_MAX_AGE seconds. Compare them with
+# `manage.py bench_db_writers`.
+DB_ENGINE = os.environ.get('DB_ENGINE', 'sqlite')
+DB_CONN_MAX_AGE = int(os.environ.get('DB_CONN_MAX_AGE', 60))
+
+# SQLite tuning for concurrent writers, applied to every new connection by
+# ecommerce_backend/sqlite3 (the PRAGMAS entry below): WAL lets readers run alongside the single writer,
+# synchronous=NORMAL is durable across application crashes in WAL mode, and
+# busy_timeout makes writers wait for the lock instead of failing
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 20000,
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
 }
 
+if DB_ENGINE == 'postgres':
+    # Django 5.0 has no built-in pool: persistent connections are reused per worker
+    # thread, and PgBouncer can pool across processes (set DB_PGBOUNCER=1 for
+    # transaction pooling, which cannot keep server-side cursors open)
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DB_NAME', 'ecommerce'),
+            'USER': os.environ.get('DB_USER', 'postgres'),
+            'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+            'HOST': os.environ.get('DB_HOST', 'localhost'),
+            'PORT': os.environ.get('DB_PORT', '5432'),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+            'DISABLE_SERVER_SIDE_CURSORS': os.environ.get('DB_PGBOUNCER') == '1',
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            # django.db.backends.sqlite3 plus OPTIONS['transaction_mode'], see ecommerce_backend/sqlite3
+            'ENGINE': 'ecommerce_backend.sqlite3',
+            'NAME': os.environ.get('DB_NAME', BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                # Seconds to wait for the write lock
+                'timeout': 20,
+                # Take the write lock at BEGIN, so a transaction that read first can't
+                # fail with "database is locked" when it later tries to write
+                'transaction_mode': 'IMMEDIATE',
+            },
+            'PRAGMAS': SQLITE_PRAGMAS,
+        }
+    }
+
+# Cache
+# The catalog response cache must be shared by every worker process, so use
+# Redis in production (set REDIS_URL); the local-memory cache is per process.
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Seconds a cached catalog response is kept; product writes invalidate it anyway
+CATALOG_CACHE_TIMEOUT = 60 * 60
+
+# Carts live in the cache and are written to the database by the request that changes
+# them at most every CART_WRITE_BEHIND_SECONDS, and by `manage.py flush_carts`
+CART_WRITE_BEHIND_SECONDS = 30
+CART_MAX_LINES = 100
+CART_MAX_QUANTITY = 999
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -109,13 +194,32 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'authentication.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
-    ]
+    ],
+    # orjson drop-ins for DRF's JSON renderer and parser, see ecommerce_backend/renderers.py
+    'DEFAULT_RENDERER_CLASSES': [
+        'ecommerce_backend.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'ecommerce_backend.parsers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
+# Thread pool for password hashing in the async login/register views; requests beyond
+# workers + queue are refused with 429 (workers default to the CPU count)
+PASSWORD_HASHING_WORKERS = None
+PASSWORD_HASHING_QUEUE = 32
+
+# Per-process cache of authenticated users, see authentication/cache.py
+USER_CACHE_SIZE = 10000
+USER_CACHE_TTL = 60  # seconds
+
 # JWT settings
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(days=1),
@@ -143,11 +247,21 @@ EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'  # For developm
 # EMAIL_HOST_PASSWORD = 'your-password'
 
 DEFAULT_FROM_EMAIL = 'noreply@ecommerce.com'
+
+# Order notifications are queued in an outbox and sent by `manage.py process_outbox`
+OUTBOX_MAX_ATTEMPTS = 8
+OUTBOX_RETRY_BASE_SECONDS = 30
+OUTBOX_LEASE_SECONDS = 5 * 60
 ADMINS = [('Admin', 'admin@ecommerce.com')]
 
 # Frontend URL for password reset links
 FRONTEND_URL = 'http://localhost:5173'  # Change to your frontend URL
 
+# Reset links expire after 24 hours. 'db' stores a hashed single-use token per request;
+# 'signed' issues stateless HMAC tokens that need no database write
+PASSWORD_RESET_TIMEOUT = 60 * 60 * 24
+PASSWORD_RESET_TOKEN_MODE = os.environ.get('PASSWORD_RESET_TOKEN_MODE', 'db')
+
 # Logging
 LOGGING = {
     'version': 1,
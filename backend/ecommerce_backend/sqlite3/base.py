@@ -0,0 +1,28 @@
+
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    SQLite backend accepting OPTIONS['transaction_mode'] ('DEFERRED', 'IMMEDIATE'
+    or 'EXCLUSIVE'), as Django 5.1+ does natively, and running the PRAGMAs in
+    the database's `PRAGMAS` setting on every new connection (see
+    SQLITE_PRAGMAS in settings.py).
+    """
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in (self.settings_dict.get('PRAGMAS') or {}).items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        self.transaction_mode = params.pop('transaction_mode', None)
+        return params
+
+    def _start_transaction_under_autocommit(self):
+        if self.transaction_mode:
+            self.cursor().execute(f'BEGIN {self.transaction_mode}')
+        else:
+            super()._start_transaction_under_autocommit()
@@ -11,5 +11,8 @@ from django.conf.urls.static import static
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/auth/', include('authentication.urls')),
+    path('api/metrics/', include('monitoring.urls')),
+    path('api/analytics/', include('analytics.urls')),
+    path('api/cart/', include('cart.urls')),
     path('api/', include('products.urls')),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
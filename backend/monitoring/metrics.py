@@ -0,0 +1,121 @@
+
+import bisect
+import threading
+import time
+from collections import deque
+
+# Upper bounds in milliseconds; the last bucket catches everything slower
+BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, float('inf'))
+
+
+class RollingHistogram:
+    """
+    Latency histogram over the last `window` seconds, kept in one-minute slots.
+
+    Old slots are dropped as time moves on, so the numbers describe recent
+    traffic rather than everything since the process started.
+    """
+
+    def __init__(self, window=15 * 60, slot=60):
+        self.slot = slot
+        self.slots = deque(maxlen=max(1, window // slot))
+
+    def current_slot(self, now):
+        start = int(now // self.slot) * self.slot
+        if not self.slots or self.slots[-1]['start'] != start:
+            self.slots.append({
+                'start': start,
+                'buckets': [0] * len(BUCKETS_MS),
+                'count': 0,
+                'total_ms': 0.0,
+                'db_ms': 0.0,
+                'queries': 0,
+            })
+        return self.slots[-1]
+
+    def observe(self, total_ms, db_ms, queries, now=None):
+        slot = self.current_slot(now if now is not None else time.time())
+        slot['buckets'][bisect.bisect_left(BUCKETS_MS, total_ms)] += 1
+        slot['count'] += 1
+        slot['total_ms'] += total_ms
+        slot['db_ms'] += db_ms
+        slot['queries'] += queries
+
+    def snapshot(self, now=None):
+        now = now if now is not None else time.time()
+        horizon = now - self.slot * self.slots.maxlen
+        buckets = [0] * len(BUCKETS_MS)
+        count = 0
+        total_ms = db_ms = 0.0
+        queries = 0
+        for slot in self.slots:
+            if slot['start'] < horizon:
+                continue
+            count += slot['count']
+            total_ms += slot['total_ms']
+            db_ms += slot['db_ms']
+            queries += slot['queries']
+            for i, n in enumerate(slot['buckets']):
+                buckets[i] += n
+
+        return {
+            'count': count,
+            'mean_ms': round(total_ms / count, 2) if count else 0.0,
+            'mean_db_ms': round(db_ms / count, 2) if count else 0.0,
+            'mean_queries': round(queries / count, 2) if count else 0.0,
+            'p50_ms': self.quantile(buckets, count, 0.50),
+            'p95_ms': self.quantile(buckets, count, 0.95),
+            'p99_ms': self.quantile(buckets, count, 0.99),
+            'buckets': {
+                ('+Inf' if bound == float('inf') else str(bound)): n
+                for bound, n in zip(BUCKETS_MS, buckets)
+            },
+        }
+
+    @staticmethod
+    def quantile(buckets, count, fraction):
+        # Reports the bucket's upper bound, as Prometheus-style histograms do
+        if not count:
+            return None
+        target = fraction * count
+        seen = 0
+        for bound, n in zip(BUCKETS_MS, buckets):
+            seen += n
+            if seen >= target:
+                return None if bound == float('inf') else bound
+        return None
+
+
+class RequestMetrics:
+    """Per-route histograms and the most recent slow requests for this process"""
+
+    def __init__(self, slow_log_size=50):
+        self.lock = threading.Lock()
+        self.routes = {}
+        self.slow_requests = deque(maxlen=slow_log_size)
+
+    def observe(self, route, total_ms, db_ms, queries):
+        with self.lock:
+            histogram = self.routes.get(route)
+            if histogram is None:
+                histogram = self.routes[route] = RollingHistogram()
+            histogram.observe(total_ms, db_ms, queries)
+
+    def record_slow(self, entry):
+        with self.lock:
+            self.slow_requests.append(entry)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'routes': {route: histogram.snapshot() for route, histogram in sorted(self.routes.items())},
+                'slow_requests': list(self.slow_requests),
+            }
+
+    def reset(self):
+        with self.lock:
+            self.routes.clear()
+            self.slow_requests.clear()
+
+
+request_metrics = RequestMetrics()
@@ -0,0 +1,140 @@
+
+import json
+import logging
+import os
+import sys
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from .metrics import request_metrics
+
+logger = logging.getLogger('monitoring.requests')
+
+PROJECT_ROOT = str(settings.BASE_DIR)
+IGNORED_PATHS = (os.path.dirname(os.__file__), 'site-packages', os.path.dirname(__file__))
+
+
+def caller():
+    """The innermost project frame that issued a query, as 'path:line in function'"""
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(PROJECT_ROOT) and not any(part in filename for part in IGNORED_PATHS):
+            return f'{os.path.relpath(filename, PROJECT_ROOT)}:{frame.f_lineno} in {frame.f_code.co_name}'
+        frame = frame.f_back
+    return None
+
+
+class QueryRecorder:
+    """
+    execute_wrapper that times every query. Walking the stack for the caller
+    is the costly part, so only queries that are slow themselves, or that run
+    once the request has already taken `slow_ms`, remember where they came from.
+    """
+
+    def __init__(self, start, slow_ms, slow_query_ms):
+        self.start = start
+        self.slow_ms = slow_ms
+        self.slow_query_ms = slow_query_ms
+        self.count = 0
+        self.duration = 0.0
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            end = time.perf_counter()
+            elapsed = end - start
+            self.count += 1
+            self.duration += elapsed
+            slow = elapsed * 1000 >= self.slow_query_ms or (end - self.start) * 1000 >= self.slow_ms
+            self.queries.append((sql, elapsed, caller() if slow else None))
+
+
+class RequestProfilingMiddleware:
+    """
+    Opt-in per-request profiling, enabled with REQUEST_PROFILING = True.
+
+    Adds a Server-Timing header, logs one JSON line per request to the
+    `monitoring.requests` logger and feeds the per-route histograms served by
+    /api/metrics/. Requests slower than REQUEST_PROFILING_SLOW_MS keep their
+    SQL, with the calling project frame for queries slower than
+    REQUEST_PROFILING_SLOW_QUERY_MS or issued after the request turned slow.
+
+    Phases: `db` is time in queries, `app` the rest of the view (including
+    DRF serializers, which run inside it), `render` turning the response into
+    bytes (DRF renderers, templates) and `total` the whole request.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'REQUEST_PROFILING', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.slow_ms = getattr(settings, 'REQUEST_PROFILING_SLOW_MS', 500)
+        self.slow_query_ms = getattr(settings, 'REQUEST_PROFILING_SLOW_QUERY_MS', 100)
+
+    def __call__(self, request):
+        request._profiling_view_done = None
+        start = time.perf_counter()
+        recorder = QueryRecorder(start, self.slow_ms, self.slow_query_ms)
+
+        wrappers = [conn.execute_wrapper(recorder) for conn in connections.all()]
+        for wrapper in wrappers:
+            wrapper.__enter__()
+        try:
+            response = self.get_response(request)
+        finally:
+            for wrapper in reversed(wrappers):
+                wrapper.__exit__(None, None, None)
+
+        end = time.perf_counter()
+        total_ms = (end - start) * 1000
+        db_ms = recorder.duration * 1000
+        view_done = request._profiling_view_done or end
+        render_ms = (end - view_done) * 1000
+        app_ms = max(total_ms - render_ms - db_ms, 0.0)
+
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={db_ms:.1f};desc="{recorder.count} queries"',
+            f'app;dur={app_ms:.1f};desc="view and serializers"',
+            f'render;dur={render_ms:.1f};desc="renderer"',
+            f'total;dur={total_ms:.1f}',
+        ])
+
+        match = getattr(request, 'resolver_match', None)
+        route = f"{request.method} {match.view_name if match else 'unresolved'}"
+        request_metrics.observe(route, total_ms, db_ms, recorder.count)
+
+        entry = {
+            'method': request.method,
+            'path': request.path,
+            'route': route,
+            'status': response.status_code,
+            'total_ms': round(total_ms, 2),
+            'db_ms': round(db_ms, 2),
+            'queries': recorder.count,
+            'app_ms': round(app_ms, 2),
+            'render_ms': round(render_ms, 2),
+        }
+        logger.info(json.dumps(entry))
+
+        if total_ms >= self.slow_ms:
+            entry['timestamp'] = time.time()
+            entry['sql'] = [
+                {'sql': sql, 'ms': round(elapsed * 1000, 2), 'caller': where}
+                for sql, elapsed, where in recorder.queries
+            ]
+            request_metrics.record_slow(entry)
+            logger.warning(json.dumps({'slow_request': entry}))
+
+        return response
+
+    def process_template_response(self, request, response):
+        # Called after the view returns and before the response is rendered
+        request._profiling_view_done = time.perf_counter()
+        return response
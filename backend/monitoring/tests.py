@@ -0,0 +1,78 @@
+
+import json
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from products.models import Product
+from .metrics import RollingHistogram, request_metrics
+
+
+@override_settings(REQUEST_PROFILING=True, REQUEST_PROFILING_SLOW_MS=0)
+class RequestProfilingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        request_metrics.reset()
+        Product.objects.create(name='Mug', description='', price=Decimal('5.00'))
+        self.client = APIClient()
+
+    def test_server_timing_header(self):
+        with self.assertLogs('monitoring.requests', level='INFO') as logs:
+            response = self.client.get('/api/products/')
+        timing = response['Server-Timing']
+        for metric in ('db;dur=', 'app;dur=', 'render;dur=', 'total;dur='):
+            self.assertIn(metric, timing)
+        self.assertIn('desc="1 queries"', timing)
+
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual(line['route'], 'GET product-list')
+        self.assertEqual(line['queries'], 1)
+
+    def test_slow_requests_keep_attributed_sql(self):
+        with self.assertLogs('monitoring.requests', level='INFO'):
+            self.client.get('/api/products/')
+        slow = request_metrics.snapshot()['slow_requests'][0]
+        self.assertIn('products_product', slow['sql'][0]['sql'])
+        self.assertTrue(slow['sql'][0]['caller'].startswith('products/'))
+
+    @override_settings(REQUEST_PROFILING_SLOW_MS=60_000, REQUEST_PROFILING_SLOW_QUERY_MS=60_000)
+    def test_fast_requests_do_not_walk_the_stack(self):
+        with mock.patch('monitoring.middleware.caller') as caller:
+            with self.assertLogs('monitoring.requests', level='INFO') as logs:
+                self.client.get('/api/products/')
+        caller.assert_not_called()
+        self.assertIn('app_ms', json.loads(logs.records[0].getMessage()))
+
+    def test_metrics_endpoint_is_admin_only(self):
+        with self.assertLogs('monitoring.requests', level='INFO'):
+            self.client.get('/api/products/')
+            self.assertEqual(self.client.get('/api/metrics/').status_code, 401)
+
+            self.client.force_authenticate(User.objects.create_user('admin', is_staff=True))
+            data = self.client.get('/api/metrics/').data
+        self.assertEqual(data['routes']['GET product-list']['count'], 1)
+        self.assertIn('depth', data['outbox'])
+
+
+class ProfilingDisabledTests(TestCase):
+    def test_no_header_when_disabled(self):
+        response = self.client.get('/api/products/')
+        self.assertNotIn('Server-Timing', response)
+
+
+class RollingHistogramTests(TestCase):
+    def test_quantiles_and_expiry(self):
+        histogram = RollingHistogram(window=120, slot=60)
+        for ms in [3] * 90 + [40] * 9 + [900]:
+            histogram.observe(ms, 1.0, 2, now=1000)
+        snapshot = histogram.snapshot(now=1000)
+        self.assertEqual(snapshot['count'], 100)
+        self.assertEqual((snapshot['p50_ms'], snapshot['p95_ms'], snapshot['p99_ms']), (5, 50, 50))
+        self.assertEqual(snapshot['mean_queries'], 2)
+
+        histogram.observe(3, 1.0, 1, now=1200)
+        self.assertEqual(histogram.snapshot(now=1200)['count'], 1)
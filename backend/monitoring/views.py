@@ -0,0 +1,17 @@
+
+from rest_framework import permissions
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from django.conf import settings
+from notifications.outbox import outbox_stats
+from .metrics import request_metrics
+
+class MetricsView(APIView):
+    """Rolling per-route latency histograms and recent slow requests (this process only)"""
+    permission_classes = [permissions.IsAdminUser]
+    
+    def get(self, request):
+        data = request_metrics.snapshot()
+        data['profiling_enabled'] = getattr(settings, 'REQUEST_PROFILING', False)
+        data['outbox'] = outbox_stats()
+        return Response(data)
@@ -0,0 +1,2 @@
+
+# Init file
@@ -0,0 +1,9 @@
+
+from django.contrib import admin
+from .models import OutboxMessage
+
+@admin.register(OutboxMessage)
+class OutboxMessageAdmin(admin.ModelAdmin):
+    list_display = ('id', 'channel', 'subject', 'status', 'attempts', 'next_attempt_at', 'created_at')
+    list_filter = ('status', 'channel')
+    readonly_fields = ('created_at', 'sent_at')
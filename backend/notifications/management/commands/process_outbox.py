@@ -0,0 +1,42 @@
+
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+
+from notifications.outbox import outbox_stats, process_batch
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Deliver queued notifications from the outbox'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--interval', type=float, default=2.0, help='Seconds to sleep when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Drain due messages and exit')
+        parser.add_argument('--stats', action='store_true', help='Print queue depth and lag and exit')
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            stats = outbox_stats()
+            self.stdout.write(
+                f"depth={stats['depth']} failed={stats['failed']} lag_seconds={stats['lag_seconds']:.1f}"
+            )
+            return
+
+        while True:
+            sent, failed = process_batch(options['batch_size'])
+            if sent or failed:
+                stats = outbox_stats()
+                logger.info(
+                    f"Outbox batch sent={sent} failed={failed} "
+                    f"depth={stats['depth']} lag_seconds={stats['lag_seconds']:.1f}"
+                )
+                # A full batch usually means more is waiting
+                if sent + failed == options['batch_size']:
+                    continue
+            if options['once']:
+                return
+            time.sleep(options['interval'])
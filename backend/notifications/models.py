@@ -0,0 +1,46 @@
+
+from django.db import models
+from django.utils import timezone
+
+class OutboxMessage(models.Model):
+    """
+    A notification waiting to be delivered by the process_outbox worker.
+
+    Rows are written in the same transaction as the change that triggers
+    them, so a notification is queued if and only if that change commits.
+    """
+    EMAIL = 'email'
+    SMS = 'sms'
+    CHANNEL_CHOICES = (
+        (EMAIL, 'Email'),
+        (SMS, 'SMS'),
+    )
+    
+    PENDING = 'pending'
+    SENT = 'sent'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (PENDING, 'Pending'),
+        (SENT, 'Sent'),
+        (FAILED, 'Failed'),
+    )
+    
+    channel = models.CharField(max_length=10, choices=CHANNEL_CHOICES, default=EMAIL)
+    recipients = models.JSONField(default=list)
+    subject = models.CharField(max_length=255, blank=True)
+    body = models.TextField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        indexes = [
+            # The worker polls for due pending rows in id order
+            models.Index(fields=['status', 'next_attempt_at', 'id'], name='outbox_due_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_channel_display()} to {', '.join(self.recipients)} ({self.status})"
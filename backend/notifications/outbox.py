@@ -0,0 +1,151 @@
+
+from datetime import timedelta
+import logging
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import connection as db_connection, transaction
+from django.db.models import Min
+from django.utils import timezone
+
+from .models import OutboxMessage
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = getattr(settings, 'OUTBOX_MAX_ATTEMPTS', 8)
+RETRY_BASE_SECONDS = getattr(settings, 'OUTBOX_RETRY_BASE_SECONDS', 30)
+RETRY_MAX_SECONDS = 60 * 60
+# How long a claimed batch is hidden from other workers while it is sent
+LEASE_SECONDS = getattr(settings, 'OUTBOX_LEASE_SECONDS', 5 * 60)
+
+
+def email_message(subject, body, recipients):
+    return OutboxMessage(channel=OutboxMessage.EMAIL, subject=subject, body=body, recipients=list(recipients))
+
+
+def sms_message(phone, body):
+    return OutboxMessage(channel=OutboxMessage.SMS, body=body, recipients=[phone])
+
+
+def enqueue_email(subject, body, recipients):
+    """Queue an email; call inside the transaction that makes it necessary"""
+    message = email_message(subject, body, recipients)
+    message.save()
+    return message
+
+
+def enqueue_sms(phone, body):
+    message = sms_message(phone, body)
+    message.save()
+    return message
+
+
+def enqueue_batch(messages, batch_size=500):
+    """Queue many unsaved messages (from email_message/sms_message) with bulk inserts"""
+    return OutboxMessage.objects.bulk_create(messages, batch_size=batch_size)
+
+
+def retry_delay(attempts):
+    return timedelta(seconds=min(RETRY_BASE_SECONDS * 2 ** (attempts - 1), RETRY_MAX_SECONDS))
+
+
+def send_sms(phone_number, message):
+    # This is a placeholder - implement your SMS service integration here
+    logger.info(f"Would send SMS to {phone_number}: {message}")
+
+
+def claim_batch(batch_size):
+    """
+    Lease a batch of due messages in a short transaction.
+
+    Their next_attempt_at moves LEASE_SECONDS ahead, so other workers skip
+    them while they are being sent, and a worker that dies mid-batch only
+    delays them until the lease runs out.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        queryset = OutboxMessage.objects.filter(
+            status=OutboxMessage.PENDING, next_attempt_at__lte=now
+        ).order_by('id')
+        if db_connection.features.has_select_for_update_skip_locked:
+            # Lets several workers drain the queue without sending a message twice
+            queryset = queryset.select_for_update(skip_locked=True)
+        messages = list(queryset[:batch_size])
+        if messages:
+            OutboxMessage.objects.filter(pk__in=[message.pk for message in messages]).update(
+                next_attempt_at=now + timedelta(seconds=LEASE_SECONDS)
+            )
+    return messages
+
+
+def process_batch(batch_size=100):
+    """
+    Deliver one batch of due messages over a single mail connection.
+
+    Returns (sent, failed) counts. A message that fails is rescheduled with
+    exponential backoff until MAX_ATTEMPTS, after which it is marked failed.
+    No transaction is open while messages are sent: the batch is leased by
+    claim_batch() and the results are written afterwards.
+    """
+    messages = claim_batch(batch_size)
+    if not messages:
+        return 0, 0
+
+    sent = failed = 0
+    now = timezone.now()
+    mail_connection = get_connection(fail_silently=False)
+    try:
+        try:
+            mail_connection.open()
+            connection_error = None
+        except Exception as e:
+            # Count it against every email in the batch rather than reconnecting per message
+            connection_error = e
+
+        for message in messages:
+            message.attempts += 1
+            try:
+                if message.channel == OutboxMessage.EMAIL:
+                    if connection_error is not None:
+                        raise connection_error
+                    mail_connection.send_messages([EmailMessage(
+                        message.subject, message.body, settings.DEFAULT_FROM_EMAIL,
+                        message.recipients, connection=mail_connection,
+                    )])
+                else:
+                    for phone in message.recipients:
+                        send_sms(phone, message.body)
+            except Exception as e:
+                failed += 1
+                message.last_error = str(e)
+                if message.attempts >= MAX_ATTEMPTS:
+                    message.status = OutboxMessage.FAILED
+                    logger.error(f"Giving up on outbox message #{message.id}: {str(e)}")
+                else:
+                    message.next_attempt_at = now + retry_delay(message.attempts)
+                    logger.warning(f"Outbox message #{message.id} failed, retrying: {str(e)}")
+            else:
+                sent += 1
+                message.status = OutboxMessage.SENT
+                message.sent_at = now
+                message.last_error = ''
+    finally:
+        mail_connection.close()
+
+    with transaction.atomic():
+        OutboxMessage.objects.bulk_update(
+            messages, ['status', 'attempts', 'last_error', 'next_attempt_at', 'sent_at']
+        )
+    return sent, failed
+
+
+def outbox_stats():
+    """Queue depth and the age in seconds of the oldest due pending message"""
+    now = timezone.now()
+    pending = OutboxMessage.objects.filter(status=OutboxMessage.PENDING)
+    oldest = pending.filter(next_attempt_at__lte=now).aggregate(oldest=Min('created_at'))['oldest']
+    return {
+        'depth': pending.count(),
+        'failed': OutboxMessage.objects.filter(status=OutboxMessage.FAILED).count(),
+        'lag_seconds': (now - oldest).total_seconds() if oldest else 0.0,
+    }
@@ -0,0 +1,109 @@
+
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from products.models import Order, Product
+from .models import OutboxMessage
+from .outbox import MAX_ATTEMPTS, enqueue_email, outbox_stats, process_batch
+
+
+class OutboxTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('buyer', 'buyer@example.com')
+        self.user.profile.phone = '+15550100'
+        self.user.profile.save()
+
+    def test_order_creation_queues_instead_of_sending(self):
+        product = Product.objects.create(name='Mug', description='', price=Decimal('5.00'))
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.post('/api/orders/', {
+            'shipping_address': 'x', 'billing_address': 'x',
+            'items': [{'product': product.id, 'quantity': 1}],
+        }, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(
+            sorted(OutboxMessage.objects.values_list('channel', flat=True)),
+            ['email', 'email', 'sms'],
+        )
+
+        self.assertEqual(process_batch(), (3, 0))
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(mail.outbox[0].to, ['buyer@example.com'])
+        self.assertFalse(OutboxMessage.objects.filter(status=OutboxMessage.PENDING).exists())
+
+    def test_status_update_queues_notification(self):
+        order = Order.objects.create(user=self.user, shipping_address='x', billing_address='x', total_amount=1)
+        OutboxMessage.objects.all().delete()
+        staff = User.objects.create_user('staff', is_staff=True)
+        client = APIClient()
+        client.force_authenticate(staff)
+
+        client.post(f'/api/orders/{order.id}/update_status/', {'status': 'processing'})
+        message = OutboxMessage.objects.get(channel=OutboxMessage.EMAIL)
+        self.assertIn('Processing', message.body)
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_batch_reuses_one_connection(self):
+        for i in range(5):
+            enqueue_email('Hello', 'Body', [f'user{i}@example.com'])
+        with mock.patch('notifications.outbox.get_connection', wraps=mail.get_connection) as get_connection:
+            self.assertEqual(process_batch(batch_size=10), (5, 0))
+        get_connection.assert_called_once()
+        self.assertEqual(len(mail.outbox), 5)
+
+    def test_sends_outside_a_transaction_while_leased(self):
+        enqueue_email('Hello', 'Body', ['user@example.com'])
+        outer = len(connection.atomic_blocks)
+        seen = {}
+
+        def send_messages(messages):
+            seen['atomic_blocks'] = len(connection.atomic_blocks)
+            # Another worker finds nothing due while the batch is out
+            seen['other_worker'] = process_batch()
+            return len(messages)
+
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=send_messages):
+            self.assertEqual(process_batch(), (1, 0))
+        self.assertEqual(seen, {'atomic_blocks': outer, 'other_worker': (0, 0)})
+        self.assertEqual(OutboxMessage.objects.get().status, OutboxMessage.SENT)
+
+    def test_failures_back_off_then_give_up(self):
+        message = enqueue_email('Hello', 'Body', ['user@example.com'])
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=OSError('down')):
+            self.assertEqual(process_batch(), (0, 1))
+            message.refresh_from_db()
+            self.assertEqual(message.attempts, 1)
+            self.assertGreater(message.next_attempt_at, timezone.now())
+            # Not due yet, so nothing is retried immediately
+            self.assertEqual(process_batch(), (0, 0))
+
+            for _ in range(MAX_ATTEMPTS - 1):
+                OutboxMessage.objects.filter(pk=message.pk).update(next_attempt_at=timezone.now())
+                process_batch()
+        message.refresh_from_db()
+        self.assertEqual(message.status, OutboxMessage.FAILED)
+        self.assertEqual(message.last_error, 'down')
+
+    def test_stats_and_worker_command(self):
+        enqueue_email('Hello', 'Body', ['user@example.com'])
+        self.assertEqual(outbox_stats()['depth'], 1)
+
+        out = StringIO()
+        call_command('process_outbox', '--stats', stdout=out)
+        self.assertIn('depth=1', out.getvalue())
+
+        call_command('process_outbox', '--once')
+        self.assertEqual(outbox_stats()['depth'], 0)
+        self.assertEqual(len(mail.outbox), 1)
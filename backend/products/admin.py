@@ -1,9 +1,136 @@
 
-from django.contrib import admin
-from .models import Product
+from django.contrib import admin, messages
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Case, PositiveIntegerField, Q, Value, When
+from django.utils import timezone
+from ecommerce_backend.admin import LargeTableAdmin, prefix_q
+from .cache import bump_catalog_version
+from .models import Order, OrderItem, Product
+from .search import matching_q
+from .transitions import INVALID, UPDATED, transition_orders
+
+# Orders handed to transition_orders() at a time by the admin actions
+TRANSITION_BATCH_SIZE = 5000
 
 @admin.register(Product)
-class ProductAdmin(admin.ModelAdmin):
-    list_display = ('name', 'price', 'created_at')
-    search_fields = ('name', 'description')
-    list_filter = ('created_at',)
+class ProductAdmin(LargeTableAdmin):
+    list_display = ('name', 'sku', 'price', 'stock', 'in_stock', 'created_at')
+    # Fallback without a full-text backend; see get_search_results
+    search_fields = ('^sku', '^name')
+    search_help_text = 'SKU prefix, or words from the name or description'
+    list_filter = ('in_stock', 'created_at')
+    ordering = ('-created_at', '-id')
+    actions = ['mark_in_stock', 'mark_out_of_stock']
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        matches = matching_q(term)
+        if not term or matches is None:
+            return super().get_search_results(request, queryset, search_term)
+        return queryset.filter(prefix_q('sku', term) | matches), False
+
+    def stock_changed(self, request, updated, message):
+        if updated:
+            # update() skips post_save, so refresh cached catalog responses by hand
+            transaction.on_commit(bump_catalog_version)
+        self.message_user(request, message % updated, messages.SUCCESS)
+
+    @admin.action(description='Mark selected products as in stock', permissions=['change'])
+    def mark_in_stock(self, request, queryset):
+        # Tracked products with no stock left stay out of stock until restocked
+        updated = queryset.filter(Q(stock__isnull=True) | Q(stock__gt=0)).update(
+            in_stock=True, updated_at=timezone.now()
+        )
+        self.stock_changed(request, updated, '%d products marked as in stock.')
+
+    @admin.action(description='Mark selected products as out of stock', permissions=['change'])
+    def mark_out_of_stock(self, request, queryset):
+        updated = queryset.update(
+            in_stock=False,
+            # Untracked products (stock NULL) stay untracked
+            stock=Case(When(stock__isnull=False, then=Value(0)), default=None, output_field=PositiveIntegerField()),
+            updated_at=timezone.now(),
+        )
+        self.stock_changed(request, updated, '%d products marked as out of stock.')
+
+class OrderItemInline(admin.TabularInline):
+    # Items are fixed once the order is placed: changing them here would not
+    # update the total, the reserved stock or the rollups
+    model = OrderItem
+    fields = ('product', 'quantity', 'price')
+    readonly_fields = fields
+    extra = 0
+
+    def get_queryset(self, request):
+        # OrderItem.__str__ and the product name are shown on every row
+        return super().get_queryset(request).select_related('product', 'order')
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+@admin.register(Order)
+class OrderAdmin(LargeTableAdmin):
+    list_display = ('id', 'user', 'status', 'total_amount', 'created_at')
+    list_filter = ('status', 'created_at')
+    list_select_related = ('user',)
+    search_fields = ('=id',)
+    search_help_text = 'Order number, or the exact username or email of the customer'
+    ordering = ('-created_at', '-id')
+    raw_id_fields = ('user',)
+    # Status changes go through the actions so the state machine, stock and
+    # notifications stay in step; orders are placed through the API
+    readonly_fields = ('status', 'total_amount', 'created_at', 'updated_at')
+    inlines = [OrderItemInline]
+    actions = ['mark_processing', 'mark_shipped', 'mark_delivered', 'mark_cancelled']
+
+    def has_add_permission(self, request):
+        return False
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        if term.lstrip('#').isdigit():
+            return queryset.filter(pk=int(term.lstrip('#'))), False
+        # Resolve the customer first so the orders come from the user index;
+        # auth_user.email has no index, so it is only searched for emails
+        users = User.objects.filter(Q(email=term) if '@' in term else Q(username=term)).values('pk')
+        return queryset.filter(user__in=users), False
+
+    def transition(self, request, queryset, status):
+        counts = {UPDATED: 0, INVALID: 0}
+        order_ids = list(queryset.values_list('pk', flat=True))
+        for start in range(0, len(order_ids), TRANSITION_BATCH_SIZE):
+            outcomes, _ = transition_orders(order_ids[start:start + TRANSITION_BATCH_SIZE], status)
+            for outcome in outcomes:
+                if outcome['result'] in counts:
+                    counts[outcome['result']] += 1
+
+        self.message_user(request, f'{counts[UPDATED]} orders moved to {status}.', messages.SUCCESS)
+        if counts[INVALID]:
+            self.message_user(
+                request, f'{counts[INVALID]} orders skipped: their status cannot change to {status}.', messages.WARNING
+            )
+
+    @admin.action(description='Move selected orders to processing', permissions=['change'])
+    def mark_processing(self, request, queryset):
+        self.transition(request, queryset, 'processing')
+
+    @admin.action(description='Move selected orders to shipped', permissions=['change'])
+    def mark_shipped(self, request, queryset):
+        self.transition(request, queryset, 'shipped')
+
+    @admin.action(description='Move selected orders to delivered', permissions=['change'])
+    def mark_delivered(self, request, queryset):
+        self.transition(request, queryset, 'delivered')
+
+    @admin.action(description='Cancel selected orders', permissions=['change'])
+    def mark_cancelled(self, request, queryset):
+        self.transition(request, queryset, 'cancelled')
@@ -0,0 +1,230 @@
+
+"""
+Helpers for the in-process benchmark commands (`manage.py bench_api` and friends).
+
+Benchmarks run against a throwaway test database created with Django's
+test utilities, so they never touch development or production data.
+"""
+
+import statistics
+import time
+from contextlib import contextmanager
+from decimal import Decimal
+from itertools import islice
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import (
+    CaptureQueriesContext, setup_databases, setup_test_environment, teardown_databases, teardown_test_environment,
+)
+
+from authentication.models import UserProfile
+from .models import Product, Order, OrderItem
+
+SIZES = {
+    '1k': 1_000,
+    '10k': 10_000,
+    '100k': 100_000,
+    '1M': 1_000_000,
+}
+
+BATCH_SIZE = 5_000
+
+BENCH_PASSWORD = 'bench-password-123'
+
+
+def parse_size(label):
+    if label in SIZES:
+        return SIZES[label]
+    return int(label)
+
+
+@contextmanager
+def benchmark_database(keepdb=False):
+    """
+    Create the test database for the duration of a benchmark run.
+
+    Also installs the test environment, as the test runner does: the
+    `testserver` host is allowed and mail goes to the in-memory backend.
+    """
+    setup_test_environment()
+    old_config = setup_databases(verbosity=0, interactive=False, keepdb=keepdb)
+    try:
+        yield
+    finally:
+        teardown_databases(old_config, verbosity=0, keepdb=keepdb)
+        teardown_test_environment()
+
+
+def batched(iterable, size=BATCH_SIZE):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def seed_catalog(count, stock=None):
+    for batch in batched(
+        Product(
+            name=f'Product {i}',
+            description=f'Synthetic product number {i} used for benchmarking the catalog API',
+            price=Decimal(i % 500 + 1) + Decimal('0.99'),
+            in_stock=i % 7 != 0,
+            stock=stock,
+        )
+        for i in range(count)
+    ):
+        Product.objects.bulk_create(batch)
+
+
+def seed_customers(count):
+    """Customers with unusable passwords and profiles, created without signals"""
+    start = User.objects.count()
+    for batch in batched(
+        User(username=f'customer{i}', email=f'customer{i}@example.com', password='!')
+        for i in range(start, start + count)
+    ):
+        User.objects.bulk_create(batch)
+    user_ids = list(User.objects.filter(profile__isnull=True).values_list('id', flat=True))
+    for batch in batched(UserProfile(user_id=user_id, full_name=f'Customer {user_id}') for user_id in user_ids):
+        UserProfile.objects.bulk_create(batch)
+    return list(User.objects.filter(username__startswith='customer').values_list('id', flat=True))
+
+
+def seed_orders(count, user_ids, items_per_order=3):
+    product_ids = list(Product.objects.values_list('id', flat=True)[:1000])
+    # bulk_create skips post_save, so no notifications are queued for seeded orders
+    for batch in batched(range(count)):
+        orders = Order.objects.bulk_create([
+            Order(
+                user_id=user_ids[i % len(user_ids)],
+                status='pending',
+                shipping_address='1 Benchmark Way',
+                billing_address='1 Benchmark Way',
+                total_amount=Decimal('29.97'),
+            )
+            for i in batch
+        ])
+        OrderItem.objects.bulk_create([
+            OrderItem(
+                order_id=order.id,
+                product_id=product_ids[(order.id * 7 + n) % len(product_ids)],
+                quantity=1 + n,
+                price=Decimal('9.99'),
+            )
+            for order in orders
+            for n in range(items_per_order)
+        ])
+
+
+def create_bench_user(username, is_staff=False):
+    user = User.objects.create_user(username, f'{username}@example.com', BENCH_PASSWORD, is_staff=is_staff)
+    user.profile.full_name = username.title()
+    user.profile.save()
+    return user
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class Measurement:
+    def __init__(self, name, timings, queries, statuses):
+        self.name = name
+        self.timings = sorted(timings)
+        self.queries = queries
+        self.statuses = statuses
+
+    @property
+    def p50(self):
+        return statistics.median(self.timings) if self.timings else 0.0
+
+    @property
+    def p95(self):
+        return percentile(self.timings, 0.95)
+
+    @property
+    def p99(self):
+        return percentile(self.timings, 0.99)
+
+    @property
+    def throughput(self):
+        total = sum(self.timings) / 1000
+        return len(self.timings) / total if total else 0.0
+
+    @property
+    def max_queries(self):
+        return max(self.queries) if self.queries else 0
+
+    def as_dict(self):
+        return {
+            'name': self.name,
+            'requests': len(self.timings),
+            'p50_ms': round(self.p50, 3),
+            'p95_ms': round(self.p95, 3),
+            'p99_ms': round(self.p99, 3),
+            'throughput_rps': round(self.throughput, 1),
+            'max_queries': self.max_queries,
+            'statuses': sorted(set(self.statuses)),
+        }
+
+
+def measure(name, call, iterations, setup=None, warmup=1):
+    """
+    Time `call()` `iterations` times, counting SQL queries for each call.
+
+    `setup()` runs untimed before every call, e.g. to clear a cache. `call`
+    should return a response (or anything with `status_code`).
+    """
+    for _ in range(warmup):
+        if setup:
+            setup()
+        call()
+
+    timings, queries, statuses = [], [], []
+    for _ in range(iterations):
+        if setup:
+            setup()
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            response = call()
+            timings.append((time.perf_counter() - start) * 1000)
+        queries.append(len(captured))
+        statuses.append(getattr(response, 'status_code', None))
+    return Measurement(name, timings, queries, statuses)
+
+
+def format_table(measurements, budgets=None):
+    budgets = budgets or {}
+    lines = [
+        f'{"endpoint":<28} {"n":>5} {"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9} '
+        f'{"req/s":>8} {"queries":>8}  budget'
+    ]
+    for m in measurements:
+        violations = check_budget(m, budgets.get(m.name))
+        verdict = '-' if m.name not in budgets else ('FAIL ' + '; '.join(violations) if violations else 'ok')
+        lines.append(
+            f'{m.name:<28} {len(m.timings):>5} {m.p50:>9.2f} {m.p95:>9.2f} {m.p99:>9.2f} '
+            f'{m.throughput:>8.1f} {m.max_queries:>8}  {verdict}'
+        )
+    return '\n'.join(lines)
+
+
+def check_budget(measurement, budget):
+    """Return human-readable budget violations; an empty list means within budget"""
+    if not budget:
+        return []
+    violations = []
+    if 'max_queries' in budget and measurement.max_queries > budget['max_queries']:
+        violations.append(f"queries {measurement.max_queries} > {budget['max_queries']}")
+    for key in ('p50_ms', 'p95_ms', 'p99_ms'):
+        if key in budget:
+            value = getattr(measurement, key[:-3])
+            if value > budget[key]:
+                violations.append(f'{key} {value:.1f} > {budget[key]}')
+    expected = budget.get('status')
+    if expected is not None and any(s != expected for s in measurement.statuses):
+        violations.append(f'status {sorted(set(measurement.statuses))} != {expected}')
+    return violations
@@ -0,0 +1,136 @@
+
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+CATALOG_VERSION_KEY = 'catalog:version'
+
+# Bump when the shape of cached catalog responses changes
+CATALOG_CACHE_SCHEMA = 1
+
+
+def get_catalog_version():
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        # Seed from the clock rather than 1 so that an evicted version key can
+        # never wrap around onto entries cached under an older version
+        cache.add(CATALOG_VERSION_KEY, int(time.time() * 1000), timeout=None)
+        version = cache.get(CATALOG_VERSION_KEY)
+    return version
+
+
+def bump_catalog_version():
+    try:
+        return cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        version = int(time.time() * 1000)
+        cache.set(CATALOG_VERSION_KEY, version, timeout=None)
+        return version
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls for the same key within this process.
+
+    The first caller runs the function; callers arriving while it is in
+    flight wait for and share its result (or exception).
+    """
+
+    class Call:
+        def __init__(self):
+            self.done = threading.Event()
+            self.result = None
+            self.error = None
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+
+    def do(self, key, fn):
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = self.Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+        return call.result
+
+
+catalog_flight = SingleFlight()
+
+
+class CatalogCacheMixin:
+    """
+    Serve list/retrieve from a cache keyed on the catalog version.
+
+    Any product write bumps the version, which orphans every cached entry at
+    once. Because the version alone determines the payload, the ETag can be
+    derived from the cache key and a matching If-None-Match is answered with
+    a 304 before touching the cache or the database.
+    """
+    catalog_cache_timeout = getattr(settings, 'CATALOG_CACHE_TIMEOUT', 60 * 60)
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, lambda: super(CatalogCacheMixin, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(request, lambda: super(CatalogCacheMixin, self).retrieve(request, *args, **kwargs))
+
+    def get_catalog_cache_key(self, request, version):
+        query = sorted(request.query_params.lists())
+        raw = '|'.join([
+            str(CATALOG_CACHE_SCHEMA),
+            request.accepted_renderer.format or '',
+            request.build_absolute_uri(request.path),
+            repr(query),
+        ])
+        digest = hashlib.sha256(raw.encode('utf-8')).hexdigest()[:32]
+        return f'catalog:v{version}:{digest}'
+
+    def cached_response(self, request, build):
+        version = get_catalog_version()
+        key = self.get_catalog_cache_key(request, version)
+        etag = '"%s"' % key.replace(':', '-')
+        headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match:
+            etags = parse_etags(if_none_match)
+            if '*' in etags or etag in etags:
+                return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        def load():
+            data = cache.get(key)
+            if data is None:
+                response = build()
+                if response.status_code != status.HTTP_200_OK:
+                    return response.status_code, response.data
+                data = response.data
+                cache.set(key, data, self.catalog_cache_timeout)
+            return status.HTTP_200_OK, data
+
+        status_code, data = catalog_flight.do(key, load)
+        if status_code != status.HTTP_200_OK:
+            return Response(data, status=status_code)
+        return Response(data, headers=headers)
@@ -0,0 +1,184 @@
+
+"""
+Streaming catalog import/export used by `manage.py import_products` and
+`manage.py export_products`.
+
+Files are read and written in fixed-size chunks so memory stays flat no
+matter how large they are. Rows are keyed by `sku`: importing a row whose
+SKU already exists updates that product in place. Products without a SKU
+are exported with their `id`, and a row with an empty SKU is upserted on
+that id, so importing a file twice, or into an empty database, always ends
+with the same products under the same ids.
+"""
+
+import csv
+import gzip
+import json
+import sys
+from contextlib import nullcontext
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.core.management.color import no_style
+from django.db import connection
+
+from .models import Product
+
+FIELDS = ['id', 'sku', 'name', 'description', 'price', 'in_stock', 'stock']
+# Columns overwritten when an imported SKU already exists
+UPDATE_FIELDS = ['name', 'description', 'price', 'in_stock', 'stock', 'updated_at']
+
+CHUNK_SIZE = 5_000
+
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 't'}
+FALSE_VALUES = {'0', 'false', 'no', 'n', 'f', ''}
+
+
+def detect_format(path, fmt=None):
+    if fmt:
+        return fmt
+    name = path[:-3] if path.endswith('.gz') else path
+    if name.endswith('.csv'):
+        return 'csv'
+    if name.endswith(('.ndjson', '.jsonl')):
+        return 'ndjson'
+    raise ValueError(f'Cannot tell the format of {path}, pass --format')
+
+
+def open_text(path, mode):
+    """Open a path (or '-' for stdin/stdout) as text, transparently handling .gz"""
+    if path == '-':
+        return nullcontext(sys.stdin if mode == 'r' else sys.stdout)
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8', newline='')
+    return open(path, mode, encoding='utf-8', newline='')
+
+
+def read_chunks(stream, fmt, size=CHUNK_SIZE):
+    """
+    Yield (first_row_number, raw_rows) chunks.
+
+    NDJSON chunks are raw lines, so JSON decoding happens in the parser. CSV
+    is split into records here because quoted fields may span lines; the
+    parser then only converts values.
+    """
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        missing = {'sku', 'name', 'price'} - set(reader.fieldnames or [])
+        if missing:
+            raise ValueError(f"CSV header is missing: {', '.join(sorted(missing))}")
+        rows = reader
+    else:
+        rows = stream
+
+    number = 1
+    while chunk := list(islice(rows, size)):
+        yield number, chunk
+        number += len(chunk)
+
+
+def parse_chunk(fmt, first_row, chunk):
+    """
+    Turn raw rows into clean field dicts. Runs in worker processes.
+
+    Returns (rows, errors) with errors as (row_number, message) tuples.
+    """
+    rows, errors = [], []
+    for number, raw in enumerate(chunk, first_row):
+        try:
+            if fmt == 'ndjson':
+                if not raw.strip():
+                    continue
+                raw = json.loads(raw)
+                if not isinstance(raw, dict):
+                    raise ValueError('expected a JSON object')
+            rows.append(clean_row(raw))
+        except (ValueError, InvalidOperation) as e:
+            errors.append((number, str(e) or e.__class__.__name__))
+    return rows, errors
+
+
+def clean_row(raw):
+    sku = str(raw.get('sku') or '').strip()
+    product_id = None
+    if not sku:
+        if raw.get('id') in (None, ''):
+            raise ValueError('sku is required (or the id of a product without one)')
+        product_id = int(raw['id'])
+    name = str(raw.get('name') or '').strip()
+    if not name:
+        raise ValueError('name is required')
+    if len(sku) > 64 or len(name) > 200:
+        raise ValueError('sku or name is too long')
+
+    price = Decimal(str(raw.get('price'))).quantize(Decimal('0.01'))
+    if price < 0 or price >= Decimal('1e8'):
+        raise ValueError(f'price out of range: {price}')
+
+    stock = raw.get('stock')
+    if stock in (None, ''):
+        stock = None
+    else:
+        stock = int(stock)
+        if stock < 0:
+            raise ValueError('stock cannot be negative')
+
+    in_stock = raw.get('in_stock', True)
+    if not isinstance(in_stock, bool):
+        value = str(in_stock).strip().lower()
+        if value not in TRUE_VALUES | FALSE_VALUES:
+            raise ValueError(f'in_stock is not a boolean: {in_stock}')
+        in_stock = value in TRUE_VALUES
+
+    return {
+        'id': product_id,
+        'sku': sku or None,
+        'name': name,
+        'description': str(raw.get('description') or ''),
+        'price': price,
+        'in_stock': in_stock,
+        'stock': stock,
+    }
+
+
+def upsert(rows):
+    """Insert or update a batch of clean rows; rows with a SKU in a single statement"""
+    # One statement can't touch the same row twice, so the last occurrence of a key wins
+    by_sku = {row['sku']: row for row in rows if row['sku']}
+    by_id = {row['id']: row for row in rows if not row['sku']}
+
+    products = [Product(**{**row, 'id': None}) for row in by_sku.values()]
+    Product.objects.bulk_create(
+        products,
+        update_conflicts=True,
+        unique_fields=['sku'],
+        update_fields=UPDATE_FIELDS,
+    )
+
+    if by_id:
+        # Products without a SKU keep the id they were exported with
+        Product.objects.bulk_create(
+            [Product(**row) for row in by_id.values()],
+            update_conflicts=True,
+            unique_fields=['id'],
+            update_fields=UPDATE_FIELDS,
+        )
+        # Explicit ids do not advance the Postgres sequence; SQLite needs nothing
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), [Product]):
+                cursor.execute(sql)
+    return len(products) + len(by_id)
+
+
+def export_rows(queryset, chunk_size=CHUNK_SIZE):
+    for row in queryset.order_by('id').values_list(*FIELDS).iterator(chunk_size=chunk_size):
+        yield dict(zip(FIELDS, row))
+
+
+def row_writer(stream, fmt):
+    """Return a function writing one exported row as NDJSON or CSV"""
+    if fmt == 'csv':
+        writer = csv.writer(stream)
+        writer.writerow(FIELDS)
+        return lambda row: writer.writerow(['' if row[field] is None else row[field] for field in FIELDS])
+    return lambda row: stream.write(json.dumps({**row, 'price': str(row['price'])}) + '\n')
@@ -0,0 +1,41 @@
+
+"""Order placement shared by the orders API and cart checkout"""
+
+from decimal import Decimal
+
+from django.db import transaction
+
+from analytics.rollups import record_order
+from .inventory import reserve_stock
+from .models import Product, Order, OrderItem
+
+
+def place_order(user, lines, **fields):
+    """
+    Create an order for `lines` of (product_id, quantity) in one transaction.
+
+    Items and the total are priced from the database, unknown product ids are
+    skipped and tracked stock is reserved (raising InsufficientStock). The
+    items are written with a single bulk insert.
+    """
+    lines = list(lines)
+    with transaction.atomic():
+        # Load every referenced product in one query
+        products = Product.objects.only('id', 'price', 'stock').in_bulk({product_id for product_id, _ in lines})
+        
+        # Price items and the order total on the server; skip invalid product IDs
+        items = [
+            OrderItem(product=products[product_id], quantity=quantity, price=products[product_id].price)
+            for product_id, quantity in lines
+            if product_id in products
+        ]
+        
+        reserve_stock((item.product_id, item.quantity) for item in items if item.product.stock is not None)
+        total_amount = sum((item.price * item.quantity for item in items), Decimal('0.00'))
+        
+        order = Order.objects.create(user=user, total_amount=total_amount, **fields)
+        for item in items:
+            item.order = order
+        OrderItem.objects.bulk_create(items)
+        record_order(order, items)
+    return order
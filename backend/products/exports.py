@@ -0,0 +1,113 @@
+
+"""
+Streaming order exports for `GET /api/orders/export/`.
+
+Orders are read with a chunked iterator (server-side cursor on PostgreSQL)
+and written out as they arrive, so memory does not depend on how many
+orders match.
+"""
+
+import csv
+import json
+
+from django.db.models import Prefetch
+from rest_framework.negotiation import BaseContentNegotiation
+
+from .models import OrderItem
+
+CSV_FIELDS = [
+    'order_id', 'created_at', 'status', 'customer', 'email', 'total_amount',
+    'product_id', 'product_name', 'quantity', 'price',
+]
+
+CHUNK_SIZE = 1000
+BUFFER_SIZE = 64 * 1024
+
+
+# ?format= values and their content types
+FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+class ExportContentNegotiation(BaseContentNegotiation):
+    """
+    The export reads its format from ?format= and streams it itself, so
+    DRF only renders errors there: always with the view's first renderer
+    (JSON), whatever the Accept header asks for.
+    """
+
+    def select_parser(self, request, parsers):
+        return parsers[0] if parsers else None
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
+
+
+class Echo:
+    """File-like object whose write() returns the value, for csv.writer"""
+
+    def write(self, value):
+        return value
+
+
+def iterate_orders(queryset):
+    """Yield orders oldest first, prefetching items one chunk of orders at a time"""
+    items = OrderItem.objects.select_related('product').only(
+        'id', 'order_id', 'product_id', 'product__name', 'quantity', 'price'
+    )
+    return queryset.select_related('user').prefetch_related(
+        Prefetch('items', queryset=items)
+    ).order_by('created_at', 'id').iterator(chunk_size=CHUNK_SIZE)
+
+
+def csv_rows(orders):
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_FIELDS)
+    for order in orders:
+        head = [
+            order.id, order.created_at.isoformat(), order.status, order.user.username,
+            order.user.email, order.total_amount,
+        ]
+        items = order.items.all()
+        if not items:
+            yield writer.writerow(head + ['', '', '', ''])
+        for item in items:
+            yield writer.writerow(head + [item.product_id, item.product.name, item.quantity, item.price])
+
+
+def ndjson_rows(orders):
+    for order in orders:
+        yield json.dumps({
+            'id': order.id,
+            'created_at': order.created_at.isoformat(),
+            'status': order.status,
+            'customer': order.user.username,
+            'email': order.user.email,
+            'total_amount': str(order.total_amount),
+            'shipping_address': order.shipping_address,
+            'billing_address': order.billing_address,
+            'items': [
+                {
+                    'product_id': item.product_id,
+                    'product_name': item.product.name,
+                    'quantity': item.quantity,
+                    'price': str(item.price),
+                }
+                for item in order.items.all()
+            ],
+        }) + '\n'
+
+
+def buffered(rows, size=BUFFER_SIZE):
+    """Join small rows into ~64KB chunks so the server doesn't write each one separately"""
+    buffer, length = [], 0
+    for row in rows:
+        buffer.append(row)
+        length += len(row)
+        if length >= size:
+            yield ''.join(buffer)
+            buffer, length = [], 0
+    if buffer:
+        yield ''.join(buffer)
@@ -0,0 +1,164 @@
+
+"""
+Query parameter filters, sorting and facets for the product list.
+
+Every supported filter/sort combination is backed by one of the composite
+indexes on Product; `manage.py bench_product_filters` checks the plans.
+"""
+
+from datetime import datetime, time, timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import Count, Max, Min, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import ValidationError
+
+# Lower bounds of the price facet buckets; the last bucket is open-ended
+PRICE_BUCKETS = [Decimal(edge) for edge in (0, 25, 50, 100, 250, 500, 1000)]
+
+# ?ordering= values mapped to (field, descending); ties are broken on id
+ORDERINGS = {
+    '-created_at': ('created_at', True),
+    'created_at': ('created_at', False),
+    'price': ('price', False),
+    '-price': ('price', True),
+    'name': ('name', False),
+    '-name': ('name', True),
+}
+DEFAULT_ORDERING = '-created_at'
+
+CENTS = Decimal('0.01')
+
+TRUE_VALUES = {'1', 'true', 'yes'}
+FALSE_VALUES = {'0', 'false', 'no'}
+
+
+def money(value):
+    # SQLite returns aggregates of decimal columns without their scale
+    return None if value is None else str(Decimal(value).quantize(CENTS))
+
+
+def created_range(params):
+    """
+    Filter kwargs for the created_after/created_before query parameters.
+
+    Plain dates cover the whole day on both ends; datetimes are exact. Dates
+    become datetime bounds rather than __date lookups so indexes on
+    created_at can be used. Raises ValueError for values that are neither.
+    """
+    filters = {}
+    for param, op in (('created_after', 'gte'), ('created_before', 'lte')):
+        value = params.get(param)
+        if not value:
+            continue
+        try:
+            day = parse_date(value)
+            moment = None if day else parse_datetime(value)
+        except ValueError:
+            day = moment = None
+        if day:
+            if op == 'lte':
+                # Up to, but not including, midnight after that day
+                op, day = 'lt', day + timedelta(days=1)
+            moment = datetime.combine(day, time.min)
+        if moment is None:
+            raise ValueError(f'{param} must be an ISO date or datetime')
+        filters[f'created_at__{op}'] = timezone.make_aware(moment) if timezone.is_naive(moment) else moment
+    return filters
+
+
+class ProductFilters:
+    """Validated product list parameters; invalid values raise a 400 ValidationError"""
+
+    def __init__(self, params):
+        errors = {}
+        self.min_price = self.parse_price(params, 'min_price', errors)
+        self.max_price = self.parse_price(params, 'max_price', errors)
+
+        self.in_stock = None
+        value = params.get('in_stock', '').lower()
+        if value in TRUE_VALUES:
+            self.in_stock = True
+        elif value in FALSE_VALUES:
+            self.in_stock = False
+        elif value:
+            errors['in_stock'] = 'Must be true or false'
+
+        try:
+            self.created = created_range(params)
+        except ValueError as e:
+            errors['created'] = str(e)
+
+        self.ordering = params.get('ordering') or DEFAULT_ORDERING
+        if self.ordering not in ORDERINGS:
+            errors['ordering'] = f"Must be one of: {', '.join(ORDERINGS)}"
+
+        self.facets = params.get('facets', '').lower() in TRUE_VALUES
+
+        if errors:
+            raise ValidationError(errors)
+
+    @staticmethod
+    def parse_price(params, name, errors):
+        value = params.get(name)
+        if not value:
+            return None
+        try:
+            price = Decimal(value)
+        except InvalidOperation:
+            errors[name] = 'Must be a number'
+            return None
+        if not price.is_finite() or price < 0:
+            errors[name] = 'Must be a non-negative number'
+            return None
+        return price
+
+    @property
+    def keyset_ordering(self):
+        return ORDERINGS[self.ordering]
+
+    def price_q(self):
+        q = Q()
+        if self.min_price is not None:
+            q &= Q(price__gte=self.min_price)
+        if self.max_price is not None:
+            q &= Q(price__lte=self.max_price)
+        return q
+
+    def stock_q(self):
+        return Q() if self.in_stock is None else Q(in_stock=self.in_stock)
+
+    def apply(self, queryset):
+        return queryset.filter(self.price_q(), self.stock_q(), **self.created)
+
+    def facet_counts(self, queryset):
+        """
+        Price buckets and in-stock counts in one aggregate query.
+
+        Each facet ignores its own filter, so the client can show how many
+        products every other choice would give.
+        """
+        price_q, stock_q = self.price_q(), self.stock_q()
+        aggregates = {
+            'total': Count('id', filter=price_q & stock_q),
+            'in_stock_true': Count('id', filter=price_q & Q(in_stock=True)),
+            'in_stock_false': Count('id', filter=price_q & Q(in_stock=False)),
+            'min_price': Min('price', filter=stock_q),
+            'max_price': Max('price', filter=stock_q),
+        }
+        bounds = list(zip(PRICE_BUCKETS, PRICE_BUCKETS[1:] + [None]))
+        for i, (low, high) in enumerate(bounds):
+            bucket = Q(price__gte=low) if high is None else Q(price__gte=low, price__lt=high)
+            aggregates[f'price_{i}'] = Count('id', filter=bucket & stock_q)
+
+        row = queryset.filter(**self.created).aggregate(**aggregates)
+        return {
+            'total': row['total'],
+            'price_range': {'min': money(row['min_price']), 'max': money(row['max_price'])},
+            'price': [
+                {'min': str(low), 'max': None if high is None else str(high), 'count': row[f'price_{i}']}
+                for i, (low, high) in enumerate(bounds)
+            ],
+            'in_stock': {'true': row['in_stock_true'], 'false': row['in_stock_false']},
+        }
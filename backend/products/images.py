@@ -0,0 +1,86 @@
+
+import hashlib
+import io
+import posixpath
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+try:
+    # Registers an AVIF codec with Pillow when installed
+    import pillow_avif  # noqa: F401
+except ImportError:
+    pass
+
+VARIANT_WIDTHS = getattr(settings, 'PRODUCT_IMAGE_WIDTHS', (200, 400, 800, 1200))
+
+# Ordered from smallest to most compatible; formats Pillow cannot write are skipped
+VARIANT_FORMATS = (
+    ('avif', 'AVIF', {'quality': 60}),
+    ('webp', 'WEBP', {'quality': 80, 'method': 4}),
+    ('jpeg', 'JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+)
+
+
+def available_formats():
+    Image.init()
+    return [(ext, name, options) for ext, name, options in VARIANT_FORMATS if name in Image.SAVE]
+
+
+def variant_name(source_name, width, ext):
+    # The hash of the full source path keeps shoe.jpg and shoe.png (or two
+    # products/shoe.jpg uploads in different folders) from sharing variants
+    stem = posixpath.splitext(posixpath.basename(source_name))[0]
+    digest = hashlib.sha1(source_name.encode('utf-8')).hexdigest()[:12]
+    return f'products/variants/{stem}-{digest}/{width}w.{ext}'
+
+
+def build_variants(source_name):
+    """
+    Write resized copies of a stored image in every available format.
+
+    Runs without touching the database so it can be handed to a process pool.
+    Returns a list of {format, width, height, name} dicts, widest last.
+    """
+    with default_storage.open(source_name, 'rb') as source:
+        original = ImageOps.exif_transpose(Image.open(source))
+        original.load()
+
+    # Never upscale; the original width is the last variant for small uploads
+    widths = sorted({min(width, original.width) for width in VARIANT_WIDTHS})
+    variants = []
+    for width in widths:
+        height = max(1, round(original.height * width / original.width))
+        resized = original.resize((width, height), Image.LANCZOS) if width != original.width else original
+
+        for ext, format_name, options in available_formats():
+            image = resized
+            if format_name == 'JPEG' and image.mode != 'RGB':
+                image = flatten(image)
+            elif image.mode not in ('RGB', 'RGBA'):
+                image = image.convert('RGBA')
+
+            buffer = io.BytesIO()
+            image.save(buffer, format_name, **options)
+            name = variant_name(source_name, width, ext)
+            if default_storage.exists(name):
+                default_storage.delete(name)
+            name = default_storage.save(name, ContentFile(buffer.getvalue()))
+            variants.append({'format': ext, 'width': width, 'height': height, 'name': name})
+    return variants
+
+
+def flatten(image):
+    # JPEG has no alpha channel, so composite onto white
+    image = image.convert('RGBA')
+    background = Image.new('RGB', image.size, (255, 255, 255))
+    background.paste(image, mask=image.getchannel('A'))
+    return background
+
+
+def delete_variants(variants):
+    for variant in variants:
+        if default_storage.exists(variant['name']):
+            default_storage.delete(variant['name'])
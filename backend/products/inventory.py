@@ -0,0 +1,82 @@
+
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import F
+
+from .cache import bump_catalog_version
+from .models import OrderItem, Product
+
+
+class InsufficientStock(Exception):
+    def __init__(self, product_ids):
+        self.product_ids = sorted(product_ids)
+        super().__init__(f"Insufficient stock for products {self.product_ids}")
+
+
+def reserve_stock(lines):
+    """
+    Take `quantity` units of each product in (product_id, quantity) lines.
+
+    Each product is decremented by a conditional UPDATE that only matches
+    while enough stock remains, so concurrent checkouts can never oversell.
+    Taking the last units is a second UPDATE that also clears in_stock, and
+    only that invalidates the cached catalog.
+    Products whose stock is NULL are not tracked and always succeed. Must
+    run inside a transaction: on InsufficientStock the caller rolls back
+    whatever was already reserved.
+    """
+    wanted = Counter()
+    for product_id, quantity in lines:
+        wanted[product_id] += quantity
+
+    short = []
+    flipped = 0
+    # Fixed lock order keeps concurrent multi-item checkouts from deadlocking
+    for product_id in sorted(wanted):
+        quantity = wanted[product_id]
+        # Stock left over: in_stock is unchanged
+        if Product.objects.filter(pk=product_id, stock__gt=quantity).update(stock=F('stock') - quantity):
+            continue
+        # Takes the last units: the product goes out of stock
+        if Product.objects.filter(pk=product_id, stock=quantity).update(stock=0, in_stock=False):
+            flipped += 1
+        else:
+            short.append(product_id)
+
+    if short:
+        # Untracked products never fail the conditional update above
+        short = list(Product.objects.filter(pk__in=short, stock__isnull=False).values_list('pk', flat=True))
+        if short:
+            raise InsufficientStock(short)
+
+    if flipped:
+        # update() skips post_save. Only in_stock is in the cached catalog, so only
+        # its change invalidates it; stock is served uncached by /api/products/stock/
+        transaction.on_commit(bump_catalog_version)
+
+
+def release_stock(order):
+    """Return the stock held by an order's items, e.g. when it is cancelled"""
+    release_stock_for_orders([order.pk])
+
+
+def release_stock_for_orders(order_ids):
+    """
+    Return the stock held by several orders, usually with one UPDATE per
+    product; a second one sets in_stock again for products that had run out.
+    """
+    returned = Counter()
+    for product_id, quantity in OrderItem.objects.filter(order_id__in=order_ids).values_list('product_id', 'quantity'):
+        returned[product_id] += quantity
+
+    flipped = 0
+    for product_id in sorted(returned):
+        quantity = returned[product_id]
+        tracked = Product.objects.filter(pk=product_id, stock__isnull=False)
+        if tracked.filter(in_stock=True).update(stock=F('stock') + quantity):
+            continue
+        flipped += tracked.filter(in_stock=False).update(stock=F('stock') + quantity, in_stock=True)
+
+    if flipped:
+        transaction.on_commit(bump_catalog_version)
@@ -0,0 +1,124 @@
+
+import json
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from products import benchmarks
+from products.models import Product
+from products.pagination import KeysetPagination
+
+# Per-endpoint budgets; any violation fails the run. Latencies are generous
+# on purpose: query counts are the stable signal, timings catch cliffs.
+DEFAULT_BUDGETS = {
+    'products list (cold)': {'max_queries': 2, 'p95_ms': 150, 'status': 200},
+    'products list (cached)': {'max_queries': 0, 'p95_ms': 25, 'status': 200},
+    'products deep page': {'max_queries': 2, 'p95_ms': 150, 'status': 200},
+    'product detail (cold)': {'max_queries': 1, 'p95_ms': 50, 'status': 200},
+    'orders list (staff)': {'max_queries': 2, 'p95_ms': 250, 'status': 200},
+    'orders list (customer)': {'max_queries': 2, 'p95_ms': 250, 'status': 200},
+    'orders summary (staff)': {'max_queries': 1, 'p95_ms': 250, 'status': 200},
+    'order create (5 items)': {'max_queries': 12, 'p95_ms': 250, 'status': 201},
+    'auth login': {'max_queries': 4, 'p95_ms': 2000, 'status': 200},
+    'auth user': {'max_queries': 0, 'p95_ms': 50, 'status': 200},
+}
+
+
+class Command(BaseCommand):
+    help = 'Seed synthetic data and benchmark the REST API in-process, failing on budget violations'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1k', help='Comma-separated dataset sizes: 1k, 10k, 100k, 1M or a number')
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--budgets', help='JSON file with per-endpoint budgets (overrides the defaults)')
+        parser.add_argument('--json', dest='json_path', help='Also write results to this JSON file')
+        parser.add_argument('--no-budgets', action='store_true', help='Report only, never fail')
+
+    def handle(self, *args, **options):
+        budgets = {} if options['no_budgets'] else dict(DEFAULT_BUDGETS)
+        if options['budgets']:
+            with open(options['budgets']) as f:
+                budgets.update(json.load(f))
+
+        results, failures = {}, []
+        for label in options['sizes'].split(','):
+            size = benchmarks.parse_size(label)
+            with benchmarks.benchmark_database():
+                started = time.perf_counter()
+                self.seed(size)
+                self.stdout.write(f'\n== {label}: seeded {size} products/orders in {time.perf_counter() - started:.1f}s')
+
+                measurements = self.run_scenarios(options['iterations'])
+                self.stdout.write(benchmarks.format_table(measurements, budgets))
+
+            results[label] = [m.as_dict() for m in measurements]
+            for m in measurements:
+                for violation in benchmarks.check_budget(m, budgets.get(m.name)):
+                    failures.append(f'[{label}] {m.name}: {violation}')
+
+        if options['json_path']:
+            with open(options['json_path'], 'w') as f:
+                json.dump(results, f, indent=2)
+
+        if failures:
+            raise CommandError('Budget exceeded:\n  ' + '\n  '.join(failures))
+
+    def seed(self, size):
+        benchmarks.seed_catalog(size)
+        customers = benchmarks.seed_customers(max(10, size // 10))
+        benchmarks.seed_orders(size, customers)
+        self.staff = benchmarks.create_bench_user('benchstaff', is_staff=True)
+        self.customer = benchmarks.create_bench_user('benchcustomer')
+        benchmarks.seed_orders(50, [self.customer.id])
+
+    def client_for(self, user=None):
+        client = APIClient()
+        if user is not None:
+            token = RefreshToken.for_user(user).access_token
+            client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        return client
+
+    def run_scenarios(self, iterations):
+        anonymous = self.client_for()
+        staff = self.client_for(self.staff)
+        customer = self.client_for(self.customer)
+
+        # A cursor halfway through the catalog shows keyset pages stay flat with depth
+        middle = Product.objects.order_by('-created_at', '-id')[Product.objects.count() // 2]
+        deep_cursor = KeysetPagination().encode_cursor(middle, reverse=False)
+        product_id = middle.id
+        product_ids = list(Product.objects.values_list('id', flat=True)[:5])
+
+        def create_order():
+            return customer.post('/api/orders/', {
+                'shipping_address': '1 Benchmark Way',
+                'billing_address': '1 Benchmark Way',
+                'items': [{'product': pk, 'quantity': 1} for pk in product_ids],
+            }, format='json')
+
+        measure = benchmarks.measure
+        measurements = [
+            measure('products list (cold)', lambda: anonymous.get('/api/products/'), iterations, setup=cache.clear),
+            measure('products list (cached)', lambda: anonymous.get('/api/products/'), iterations),
+            measure(
+                'products deep page', lambda: anonymous.get('/api/products/', {'cursor': deep_cursor}),
+                iterations, setup=cache.clear,
+            ),
+            measure(
+                'product detail (cold)', lambda: anonymous.get(f'/api/products/{product_id}/'),
+                iterations, setup=cache.clear,
+            ),
+            measure('orders list (staff)', lambda: staff.get('/api/orders/'), iterations),
+            measure('orders list (customer)', lambda: customer.get('/api/orders/'), iterations),
+            measure('orders summary (staff)', lambda: staff.get('/api/orders/', {'view': 'summary'}), iterations),
+            measure('order create (5 items)', create_order, iterations),
+            # Password hashing dominates login, so fewer rounds are enough
+            measure('auth login', lambda: anonymous.post('/api/auth/login/', {
+                'email': self.customer.email, 'password': benchmarks.BENCH_PASSWORD,
+            }, format='json'), max(5, iterations // 10)),
+            measure('auth user', lambda: customer.get('/api/auth/user/'), iterations),
+        ]
+        return measurements
@@ -0,0 +1,135 @@
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections, transaction
+from django.db.models import F
+
+from products import benchmarks
+from products.models import Order, OrderItem, Product
+
+
+class Command(BaseCommand):
+    help = 'Run concurrent checkout-style writers against each database profile and report throughput'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=8, help='Concurrent writer threads')
+        parser.add_argument('--seconds', type=float, default=5.0, help='Duration per profile')
+        parser.add_argument(
+            '--profiles', default='sqlite-default,sqlite-tuned',
+            help="Comma-separated: sqlite-default, sqlite-tuned, postgres (uses the DB_* settings)",
+        )
+
+    def handle(self, *args, **options):
+        self.tmp = tempfile.mkdtemp()
+        try:
+            self.stdout.write(
+                f'{"profile":<16} {"writers":>7} {"commits":>8} {"tx/s":>8} {"p50 ms":>9} {"p95 ms":>9} {"errors":>7}'
+            )
+            for name in options['profiles'].split(','):
+                self.run_profile(name, options['writers'], options['seconds'])
+        finally:
+            shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def profile(self, name):
+        path = os.path.join(self.tmp, f'{name}.sqlite3')
+        if name == 'sqlite-default':
+            # What Django does out of the box: rollback journal, deferred BEGIN, 5s timeout
+            return {'ENGINE': 'django.db.backends.sqlite3', 'NAME': path, 'TEST': {'NAME': path}}
+        if name == 'sqlite-tuned':
+            return {
+                'ENGINE': 'ecommerce_backend.sqlite3', 'NAME': path, 'TEST': {'NAME': path},
+                'OPTIONS': {'timeout': 20, 'transaction_mode': 'IMMEDIATE'},
+                'PRAGMAS': settings.SQLITE_PRAGMAS,
+            }
+        if name == 'postgres':
+            default = settings.DATABASES['default']
+            if 'postgresql' not in default['ENGINE']:
+                raise CommandError('The postgres profile needs DB_ENGINE=postgres and the DB_* settings')
+            return {**default, 'TEST': {'NAME': f"{default['NAME']}_bench_writers"}}
+        raise CommandError(f'Unknown profile {name}')
+
+    def run_profile(self, name, writers, seconds):
+        alias = f'bench_{name.replace("-", "_")}'
+        # Register a throwaway alias; configure_settings fills in the defaults Django expects
+        connections.settings[alias] = connections.configure_settings(
+            {**connections.settings, alias: self.profile(name)}
+        )[alias]
+        creation = connections[alias].creation
+        test_name = creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            user_ids, product_ids = self.seed(alias)
+            results = self.run_writers(alias, writers, seconds, user_ids, product_ids)
+        finally:
+            connections[alias].close()
+            creation.destroy_test_db(test_name, verbosity=0)
+            del connections.settings[alias]
+
+        timings = sorted(ms for ms in results['timings'])
+        self.stdout.write(
+            f'{name:<16} {writers:>7} {len(timings):>8} {len(timings) / seconds:>8.1f} '
+            f'{benchmarks.percentile(timings, 0.5):>9.2f} {benchmarks.percentile(timings, 0.95):>9.2f} '
+            f'{results["errors"]:>7}'
+        )
+        for message in sorted(results['messages']):
+            self.stdout.write(f'    error: {message}')
+
+    def seed(self, alias):
+        users = User.objects.using(alias).bulk_create([
+            User(username=f'writer{i}', email=f'writer{i}@example.com', password='!') for i in range(20)
+        ])
+        products = Product.objects.using(alias).bulk_create([
+            Product(name=f'Product {i}', description='', price=Decimal('9.99'), stock=10_000_000) for i in range(200)
+        ])
+        return [u.pk for u in users], [p.pk for p in products]
+
+    def checkout(self, alias, user_id, product_ids):
+        # Same shape as OrderSerializer.create: read products, reserve stock, write order and items.
+        # Orders are bulk-created so no notifications end up in the default database.
+        with transaction.atomic(using=alias):
+            products = Product.objects.using(alias).only('id', 'price', 'stock').in_bulk(product_ids)
+            for product_id in sorted(product_ids):
+                Product.objects.using(alias).filter(pk=product_id, stock__gte=1).update(stock=F('stock') - 1)
+            order = Order.objects.using(alias).bulk_create([Order(
+                user_id=user_id, shipping_address='1 Bench Way', billing_address='1 Bench Way',
+                total_amount=sum(p.price for p in products.values()),
+            )])[0]
+            OrderItem.objects.using(alias).bulk_create([
+                OrderItem(order_id=order.pk, product_id=pk, quantity=1, price=p.price) for pk, p in products.items()
+            ])
+
+    def run_writers(self, alias, writers, seconds, user_ids, product_ids):
+        results = {'timings': [], 'errors': 0, 'messages': set()}
+        lock = threading.Lock()
+        deadline = time.perf_counter() + seconds
+
+        def writer():
+            rng = random.Random()
+            try:
+                while time.perf_counter() < deadline:
+                    start = time.perf_counter()
+                    try:
+                        self.checkout(alias, rng.choice(user_ids), rng.sample(product_ids, 3))
+                    except OperationalError as e:
+                        with lock:
+                            results['errors'] += 1
+                            results['messages'].add(str(e))
+                        continue
+                    with lock:
+                        results['timings'].append((time.perf_counter() - start) * 1000)
+            finally:
+                connections[alias].close()
+
+        threads = [threading.Thread(target=writer) for _ in range(writers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
@@ -0,0 +1,71 @@
+
+import statistics
+import time
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from products.models import Product
+from products.views import OrderViewSet
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Benchmark order creation: SQL queries and latency as the number of line items grows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1,10,50,200', help='Comma-separated item counts')
+        parser.add_argument('--repeat', type=int, default=20, help='Orders created per size')
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',')]
+        # Everything runs in one transaction that is rolled back at the end, and
+        # notification mail is kept in memory so SMTP does not skew the timings
+        try:
+            with transaction.atomic(), override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend'):
+                self.run(sizes, options['repeat'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, sizes, repeat):
+        user = User.objects.create_user('bench-orders', 'bench-orders@example.com', 'bench-password')
+        products = Product.objects.bulk_create([
+            Product(name=f'Bench product {i}', description='', price=Decimal('9.99'))
+            for i in range(max(sizes))
+        ])
+
+        factory = APIRequestFactory()
+        view = OrderViewSet.as_view({'post': 'create'})
+
+        self.stdout.write(f'{"items":>6} {"queries":>8} {"p50 ms":>9} {"p95 ms":>9}')
+        for size in sizes:
+            payload = {
+                'shipping_address': 'Bench street 1',
+                'billing_address': 'Bench street 1',
+                'items': [{'product': product.id, 'quantity': 2} for product in products[:size]],
+            }
+            timings = []
+            queries = 0
+            for _ in range(repeat):
+                request = factory.post('/api/orders/', payload, format='json')
+                force_authenticate(request, user=user)
+                with CaptureQueriesContext(connection) as captured:
+                    start = time.perf_counter()
+                    response = view(request)
+                    timings.append((time.perf_counter() - start) * 1000)
+                if response.status_code != 201:
+                    self.stderr.write(f'Order creation failed: {response.status_code} {response.data}')
+                    return
+                queries = len(captured)
+
+            timings.sort()
+            p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+            self.stdout.write(f'{size:>6} {queries:>8} {statistics.median(timings):>9.2f} {p95:>9.2f}')
@@ -0,0 +1,54 @@
+
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from rest_framework.test import APIClient
+
+from products import benchmarks
+
+# Product list projections compared against the full payload
+SCENARIOS = [
+    ('full', {}),
+    ('omit description', {'omit': 'description'}),
+    ('card view', {'view': 'card'}),
+    ('fields=id,name,price', {'fields': 'id,name,price'}),
+]
+
+
+class Command(BaseCommand):
+    help = 'Compare payload size and latency of product list projections (?view=, ?fields=, ?omit=)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', default='100k', help='Catalog size: 1k, 10k, 100k, 1M or a number')
+        parser.add_argument('--iterations', type=int, default=30)
+        parser.add_argument('--page-size', type=int, default=100)
+
+    def handle(self, *args, **options):
+        size = benchmarks.parse_size(options['size'])
+        with benchmarks.benchmark_database():
+            started = time.perf_counter()
+            benchmarks.seed_catalog(size)
+            self.stdout.write(f'Seeded {size} products in {time.perf_counter() - started:.1f}s')
+            self.run(options['iterations'], options['page_size'])
+
+    def run(self, iterations, page_size):
+        client = APIClient()
+        measurements, sizes = [], {}
+        for name, params in SCENARIOS:
+            params = {**params, 'page_size': page_size}
+            cache.clear()
+            sizes[name] = len(client.get('/api/products/', params).content)
+            measurements.append(benchmarks.measure(
+                name, lambda: client.get('/api/products/', params), iterations, setup=cache.clear
+            ))
+
+        self.stdout.write(benchmarks.format_table(measurements))
+        full = measurements[0]
+        self.stdout.write(f'\nPayload per page of {page_size} (uncached):')
+        for m in measurements:
+            saved = 1 - sizes[m.name] / sizes[full.name]
+            faster = 1 - m.p50 / full.p50 if full.p50 else 0.0
+            self.stdout.write(
+                f'  {m.name:<24} {sizes[m.name]:>9} bytes  {saved:>6.1%} smaller  p50 {faster:>6.1%} faster'
+            )
@@ -0,0 +1,93 @@
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from products import benchmarks
+
+# Product list filter/sort combinations; each page query should be served by an index
+SCENARIOS = [
+    ('newest', {}),
+    ('in stock, newest', {'in_stock': 'true'}),
+    ('out of stock, newest', {'in_stock': 'false'}),
+    ('price asc', {'ordering': 'price'}),
+    ('price desc', {'ordering': '-price'}),
+    ('in stock, price asc', {'in_stock': 'true', 'ordering': 'price'}),
+    ('price range, price asc', {'min_price': '100', 'max_price': '150', 'ordering': 'price'}),
+    ('in stock, price range', {'in_stock': 'true', 'min_price': '100', 'max_price': '150', 'ordering': '-price'}),
+    ('created window', {'created_after': '2000-01-01', 'created_before': '2100-01-01'}),
+    ('name asc', {'ordering': 'name'}),
+]
+
+
+def explain(sql):
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            return [row[-1] for row in cursor.fetchall()]
+        cursor.execute('EXPLAIN ' + sql)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def uses_index(plan):
+    """True when the plan reads the table through an index and needs no separate sort"""
+    text = ' '.join(plan)
+    if connection.vendor == 'sqlite':
+        return 'USING INDEX' in text and 'TEMP B-TREE' not in text
+    return 'Index' in text and 'Sort' not in text and 'Seq Scan' not in text
+
+
+class Command(BaseCommand):
+    help = 'Benchmark product list filters and sorts, and check that every page query uses an index'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', default='100k', help='Catalog size: 1k, 10k, 100k, 1M or a number')
+        parser.add_argument('--iterations', type=int, default=30)
+        parser.add_argument('--verbose-plans', action='store_true', help='Print the full query plans')
+
+    def handle(self, *args, **options):
+        size = benchmarks.parse_size(options['size'])
+        with benchmarks.benchmark_database():
+            started = time.perf_counter()
+            benchmarks.seed_catalog(size)
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+            self.stdout.write(f'Seeded {size} products in {time.perf_counter() - started:.1f}s')
+            failures = self.run(options['iterations'], options['verbose_plans'])
+
+        if failures:
+            raise CommandError('Page queries without a usable index:\n  ' + '\n  '.join(failures))
+
+    def run(self, iterations, verbose_plans):
+        client = APIClient()
+        measurements, plans, failures = [], [], []
+        for name, params in SCENARIOS:
+            measurements.append(benchmarks.measure(
+                name, lambda: client.get('/api/products/', params), iterations, setup=cache.clear
+            ))
+
+            cache.clear()
+            with CaptureQueriesContext(connection) as captured:
+                client.get('/api/products/', params)
+            plan = explain(captured[0]['sql'])
+            indexed = uses_index(plan)
+            plans.append((name, indexed, plan))
+            if not indexed:
+                failures.append(f'{name}: {" / ".join(plan)}')
+
+        cache.clear()
+        facets = benchmarks.measure(
+            'facets (whole catalog)', lambda: client.get('/api/products/', {'facets': 'true'}), iterations,
+            setup=cache.clear,
+        )
+        measurements.append(facets)
+
+        self.stdout.write(benchmarks.format_table(measurements))
+        self.stdout.write('\nPage query plans:')
+        for name, indexed, plan in plans:
+            summary = plan if verbose_plans else [step for step in plan if 'INDEX' in step.upper()][:1] or plan[:1]
+            self.stdout.write(f'  {"ok  " if indexed else "FAIL"} {name:<24} {" / ".join(summary)}')
+        return failures
@@ -0,0 +1,76 @@
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+
+from ecommerce_backend.renderers import ORJSONRenderer
+from products import benchmarks
+from products.models import Product, Order, OrderItem
+from products.serializers import OrderItemSerializer, ProductSerializer
+
+
+class Rendered(bytes):
+    status_code = 200
+
+
+class Command(BaseCommand):
+    help = 'Compare instance serialization + JSONRenderer with the .values() fast path + ORJSONRenderer'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000, help='Products (and order items) serialized per call')
+        parser.add_argument('--iterations', type=int, default=30)
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        with benchmarks.benchmark_database():
+            started = time.perf_counter()
+            benchmarks.seed_catalog(rows)
+            user = benchmarks.create_bench_user('benchcustomer')
+            benchmarks.seed_orders(max(1, rows // 3), [user.id])
+            self.stdout.write(f'Seeded {rows} products in {time.perf_counter() - started:.1f}s')
+            self.run(rows, options['iterations'])
+
+    def run(self, rows, iterations):
+        context = {'request': APIRequestFactory().get('/api/products/')}
+        products = Product.objects.order_by('-created_at', '-id')[:rows]
+        items = OrderItem.objects.order_by('id')[:rows]
+
+        def product_instances(renderer):
+            return Rendered(renderer.render(ProductSerializer(products.all(), many=True, context=context).data))
+
+        def product_rows(renderer):
+            serializer = ProductSerializer(context=context)
+            queryset = products.values(*serializer.values_columns())
+            return Rendered(renderer.render(ProductSerializer(queryset, many=True, context=context).data))
+
+        def item_instances(renderer):
+            queryset = items.select_related('product').only(
+                'id', 'order_id', 'product_id', 'product__name', 'quantity', 'price'
+            )
+            return Rendered(renderer.render(OrderItemSerializer(queryset, many=True).data))
+
+        def item_rows(renderer):
+            queryset = items.values(*OrderItemSerializer().values_columns())
+            return Rendered(renderer.render(OrderItemSerializer(queryset, many=True).data))
+
+        drf, fast = JSONRenderer(), ORJSONRenderer()
+        for baseline, rows_path in ((product_instances, product_rows), (item_instances, item_rows)):
+            if baseline(drf) != rows_path(fast):
+                raise CommandError(f'{rows_path.__name__} output differs from {baseline.__name__}')
+
+        measure = benchmarks.measure
+        measurements = [
+            measure('products: instances + drf', lambda: product_instances(drf), iterations),
+            measure('products: rows + drf', lambda: product_rows(drf), iterations),
+            measure('products: rows + orjson', lambda: product_rows(fast), iterations),
+            measure('items: instances + drf', lambda: item_instances(drf), iterations),
+            measure('items: rows + drf', lambda: item_rows(drf), iterations),
+            measure('items: rows + orjson', lambda: item_rows(fast), iterations),
+        ]
+        self.stdout.write(benchmarks.format_table(measurements))
+
+        self.stdout.write(f'\nSpeedup of rows + orjson over instances + drf ({rows} rows, identical bytes):')
+        for baseline, fast_path in ((measurements[0], measurements[2]), (measurements[3], measurements[5])):
+            self.stdout.write(f'  {fast_path.name.split(":")[0]:<10} {baseline.p50 / fast_path.p50:.1f}x')
@@ -0,0 +1,81 @@
+
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.models import F
+
+from products.cache import bump_catalog_version
+from products.images import build_variants, delete_variants
+from products.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Build resized WebP/AVIF/JPEG variants for product images (backfill or --watch as a worker)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Rebuild variants for every image, not just stale ones')
+        parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: CPU count)')
+        parser.add_argument('--watch', action='store_true', help='Keep polling for new uploads')
+        parser.add_argument('--interval', type=float, default=5.0)
+
+    def handle(self, *args, **options):
+        while True:
+            built = self.build(options['all'], options['workers'])
+            if built:
+                self.stdout.write(f'Built variants for {built} image(s)')
+            if not options['watch']:
+                return
+            options['all'] = False
+            time.sleep(options['interval'])
+
+    def build(self, rebuild_all, workers):
+        queryset = Product.objects.exclude(image='').exclude(image__isnull=True)
+        if not rebuild_all:
+            queryset = queryset.exclude(image_variants_source=F('image'))
+        pending = list(queryset.values_list('id', 'image', 'image_variants'))
+        if not pending:
+            return 0
+
+        built = 0
+        if workers == 1:
+            for product_id, image, old_variants in pending:
+                try:
+                    variants = build_variants(image)
+                except Exception as e:
+                    self.stderr.write(f'Product #{product_id}: could not process {image}: {e}')
+                    continue
+                built += self.store(product_id, image, old_variants, variants)
+        else:
+            # Children only touch file storage; don't let them inherit open DB connections
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = {
+                    pool.submit(build_variants, image): (product_id, image, old_variants)
+                    for product_id, image, old_variants in pending
+                }
+                for future in as_completed(futures):
+                    product_id, image, old_variants = futures[future]
+                    try:
+                        variants = future.result()
+                    except Exception as e:
+                        self.stderr.write(f'Product #{product_id}: could not process {image}: {e}')
+                        continue
+                    built += self.store(product_id, image, old_variants, variants)
+
+        if built:
+            bump_catalog_version()
+        return built
+
+    def store(self, product_id, image, old_variants, variants):
+        # Only apply if the image was not replaced while we were working
+        updated = Product.objects.filter(pk=product_id, image=image).update(
+            image_variants=variants, image_variants_source=image
+        )
+        new_names = {variant['name'] for variant in variants}
+        if updated:
+            delete_variants([v for v in old_variants if v['name'] not in new_names])
+        else:
+            delete_variants(variants)
+        return updated
@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from products import catalog_io
+from products.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Stream the catalog to NDJSON or CSV (optionally .gz) in the format import_products reads'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Output file, or '-' for stdout")
+        parser.add_argument('--format', choices=['ndjson', 'csv'], help='Default: from the file extension')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        try:
+            fmt = catalog_io.detect_format(path, options['format'] or ('ndjson' if path == '-' else None))
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        started = time.perf_counter()
+        exported = 0
+        with catalog_io.open_text(path, 'w') as stream:
+            write = catalog_io.row_writer(stream, fmt)
+            for row in catalog_io.export_rows(Product.objects.all()):
+                write(row)
+                exported += 1
+
+        if path != '-':
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f'Exported {exported} products in {elapsed:.1f}s ({exported / elapsed if elapsed else 0:.0f} rows/s)'
+            )
@@ -0,0 +1,79 @@
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from products import catalog_io
+from products.cache import bump_catalog_version
+
+
+class Command(BaseCommand):
+    help = 'Stream products from NDJSON or CSV (optionally .gz) and upsert them by SKU, or by id without one'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to import, or '-' for stdin")
+        parser.add_argument('--format', choices=['ndjson', 'csv'], help='Default: from the file extension')
+        parser.add_argument('--workers', type=int, default=None, help='Parser processes (default: CPU count, 1 = serial)')
+        parser.add_argument('--batch-size', type=int, default=catalog_io.CHUNK_SIZE, help='Rows per upsert')
+        parser.add_argument('--max-errors', type=int, default=100, help='Abort after this many invalid rows')
+
+    def handle(self, *args, **options):
+        try:
+            fmt = catalog_io.detect_format(options['path'], options['format'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        self.max_errors = options['max_errors']
+        self.imported = self.errors = 0
+        self.started = time.perf_counter()
+
+        try:
+            with catalog_io.open_text(options['path'], 'r') as stream:
+                chunks = catalog_io.read_chunks(stream, fmt, options['batch_size'])
+                if options['workers'] == 1:
+                    for first_row, chunk in chunks:
+                        self.store(*catalog_io.parse_chunk(fmt, first_row, chunk))
+                else:
+                    self.parse_in_parallel(fmt, chunks, options['workers'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        finally:
+            # bulk_create skips post_save, so invalidate cached catalog pages here
+            if self.imported:
+                bump_catalog_version()
+
+        elapsed = time.perf_counter() - self.started
+        self.stdout.write(
+            f'Imported {self.imported} products in {elapsed:.1f}s '
+            f'({self.imported / elapsed if elapsed else 0:.0f} rows/s), {self.errors} invalid rows skipped'
+        )
+
+    def parse_in_parallel(self, fmt, chunks, workers):
+        # Children only parse; don't let them inherit open DB connections
+        connections.close_all()
+        workers = workers or os.cpu_count() or 2
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # Bounded read-ahead keeps memory flat; results are stored in file order
+            # so the last occurrence of a SKU wins, as with serial parsing
+            pending = deque()
+            for first_row, chunk in chunks:
+                pending.append(pool.submit(catalog_io.parse_chunk, fmt, first_row, chunk))
+                if len(pending) >= workers * 2:
+                    self.store(*pending.popleft().result())
+            while pending:
+                self.store(*pending.popleft().result())
+
+    def store(self, rows, errors):
+        for number, message in errors:
+            self.stderr.write(f'Row {number}: {message}')
+        self.errors += len(errors)
+        if self.errors > self.max_errors:
+            raise CommandError(f'Too many invalid rows ({self.errors}), aborting')
+
+        if rows:
+            self.imported += catalog_io.upsert(rows)
+            elapsed = time.perf_counter() - self.started
+            self.stdout.write(f'  {self.imported} rows ({self.imported / elapsed:.0f} rows/s)')
@@ -0,0 +1,18 @@
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from products.search import get_backend, rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the product full-text search index from the products table'
+
+    def handle(self, *args, **options):
+        backend = get_backend()
+        if backend is None:
+            raise CommandError(f'Full-text search is not supported on {connection.vendor}')
+
+        rebuild_search_index()
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt product search index ({backend.__class__.__name__})'
+        ))
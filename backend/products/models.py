@@ -1,26 +1,67 @@
 
 from django.db import models
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_save, post_delete, pre_delete
 from django.dispatch import receiver
-from django.core.mail import send_mail
 from django.conf import settings
+from notifications.outbox import enqueue_email, enqueue_sms
+from .cache import bump_catalog_version
 import logging
 
 logger = logging.getLogger(__name__)
 
 class Product(models.Model):
+    # Natural key used by import_products/export_products to upsert the catalog
+    sku = models.CharField(max_length=64, unique=True, null=True, blank=True)
     name = models.CharField(max_length=200)
     description = models.TextField()
     price = models.DecimalField(max_digits=10, decimal_places=2)
     image = models.ImageField(upload_to='products/', null=True, blank=True)
+    # Resized copies of `image`, built by `manage.py build_image_variants`
+    image_variants = models.JSONField(default=list, blank=True)
+    image_variants_source = models.CharField(max_length=100, blank=True)
     in_stock = models.BooleanField(default=True)
+    # Units available to sell; NULL means stock is not tracked for this product
+    stock = models.PositiveIntegerField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    class Meta:
+        indexes = [
+            # Backs keyset pagination, see products.pagination
+            models.Index(fields=['-created_at', '-id'], name='product_created_id_idx'),
+            # Filter and sort combinations of the product list, see products.filters.
+            # Indexes are scanned in either direction, so each serves both sort orders
+            models.Index(fields=['price', 'id'], name='product_price_id_idx'),
+            models.Index(fields=['name', 'id'], name='product_name_id_idx'),
+            models.Index(fields=['in_stock', '-created_at', '-id'], name='product_stock_created_idx'),
+            models.Index(fields=['in_stock', 'price', 'id'], name='product_stock_price_idx'),
+        ]
+    
     def __str__(self):
         return self.name
 
+class OrderQuerySet(models.QuerySet):
+    def with_details(self):
+        """Join user/profile and prefetch items with their products: three queries in total"""
+        return self.select_related('user__profile').prefetch_related(
+            models.Prefetch('items', queryset=OrderItem.objects.select_related('product').only(
+                'id', 'order_id', 'product_id', 'product__name', 'quantity', 'price'
+            ))
+        )
+    
+    def with_summary(self):
+        """Aggregate item count and quantity per order instead of loading the items"""
+        # Correlated subqueries rather than JOIN + GROUP BY, so only the rows on the
+        # requested page are aggregated instead of the whole order history
+        items = OrderItem.objects.filter(order=models.OuterRef('pk')).order_by().values('order')
+        return self.select_related('user__profile').annotate(
+            item_count=Coalesce(models.Subquery(items.annotate(n=models.Count('*')).values('n')), 0),
+            total_quantity=Coalesce(models.Subquery(items.annotate(n=models.Sum('quantity')).values('n')), 0),
+        )
+
 class Order(models.Model):
     STATUS_CHOICES = (
         ('pending', 'Pending'),
@@ -38,6 +79,17 @@ class Order(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = OrderQuerySet.as_manager()
+    
+    class Meta:
+        indexes = [
+            # Backs keyset pagination for staff (all orders) and customers (own orders)
+            models.Index(fields=['-created_at', '-id'], name='order_created_id_idx'),
+            models.Index(fields=['user', '-created_at', '-id'], name='order_user_created_id_idx'),
+            # Admin changelist filtered by status
+            models.Index(fields=['status', '-created_at', '-id'], name='order_status_created_id_idx'),
+        ]
+    
     def __str__(self):
         return f"Order #{self.id} by {self.user.username}"
 
@@ -50,72 +102,68 @@ class OrderItem(models.Model):
     def __str__(self):
         return f"{self.quantity} x {self.product.name} in Order #{self.order.id}"
 
+# Invalidate cached catalog responses once the write is visible to readers
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def product_changed(sender, instance, **kwargs):
+    transaction.on_commit(bump_catalog_version)
+
+# Orders deleted (through the API, the admin or a user cascade) while they could
+# still be cancelled give their reserved stock back, as cancelling would
+@receiver(pre_delete, sender=Order)
+def release_deleted_order_stock(sender, instance, **kwargs):
+    from .inventory import release_stock
+    from .transitions import TRANSITIONS
+    if 'cancelled' in TRANSITIONS[instance.status]:
+        release_stock(instance)
+
+# Notifications are written to the outbox in the order's transaction and
+# delivered by `manage.py process_outbox`
 @receiver(post_save, sender=Order)
 def order_notification(sender, instance, created, **kwargs):
     if created:
-        try:
-            # Send email to customer
-            user_email = instance.user.email
-            user_phone = instance.user.profile.phone if hasattr(instance.user, 'profile') else None
+        user_email = instance.user.email
+        user_phone = instance.user.profile.phone if hasattr(instance.user, 'profile') else None
+        
+        # Email to customer
+        customer_subject = f"Order Confirmation - Your Order #{instance.id} has been received"
+        customer_message = f"""
+            Dear {instance.user.profile.full_name if hasattr(instance.user, 'profile') else instance.user.username},
             
-            # Email to customer
-            customer_subject = f"Order Confirmation - Your Order #{instance.id} has been received"
-            customer_message = f"""
-                Dear {instance.user.profile.full_name if hasattr(instance.user, 'profile') else instance.user.username},
-                
-                Thank you for your order! We've received your order #{instance.id} and it's now being processed.
+            Thank you for your order! We've received your order #{instance.id} and it's now being processed.
+            
+            Order Details:
+            - Order ID: #{instance.id}
+            - Total Amount: ${instance.total_amount}
+            - Status: {instance.status}
+            
+            We'll notify you when your order ships.
+            
+            Thank you for shopping with us!
+        """
+        
+        enqueue_email(customer_subject, customer_message, [user_email])
+        
+        # Email to admin
+        admin_emails = [admin[1] for admin in settings.ADMINS]
+        if admin_emails:
+            admin_subject = f"New Order Received - Order #{instance.id}"
+            admin_message = f"""
+                A new order has been placed.
                 
                 Order Details:
                 - Order ID: #{instance.id}
+                - Customer: {instance.user.profile.full_name if hasattr(instance.user, 'profile') else instance.user.username}
+                - Email: {instance.user.email}
+                - Phone: {user_phone if user_phone else 'Not provided'}
                 - Total Amount: ${instance.total_amount}
                 - Status: {instance.status}
                 
-                We'll notify you when your order ships.
-                
-                Thank you for shopping with us!
+                Please process this order.
             """
             
-            send_mail(
-                customer_subject,
-                customer_message,
-                settings.DEFAULT_FROM_EMAIL,
-                [user_email],
-                fail_silently=False,
-            )
-            
-            # Email to admin
-            admin_emails = [admin[1] for admin in settings.ADMINS]
-            if admin_emails:
-                admin_subject = f"New Order Received - Order #{instance.id}"
-                admin_message = f"""
-                    A new order has been placed.
-                    
-                    Order Details:
-                    - Order ID: #{instance.id}
-                    - Customer: {instance.user.profile.full_name if hasattr(instance.user, 'profile') else instance.user.username}
-                    - Email: {instance.user.email}
-                    - Phone: {user_phone if user_phone else 'Not provided'}
-                    - Total Amount: ${instance.total_amount}
-                    - Status: {instance.status}
-                    
-                    Please process this order.
-                """
-                
-                send_mail(
-                    admin_subject,
-                    admin_message,
-                    settings.DEFAULT_FROM_EMAIL,
-                    admin_emails,
-                    fail_silently=False,
-                )
-            
-            # Send SMS (would require integration with SMS provider)
-            if user_phone:
-                try:
-                    # This is a placeholder - implement your SMS service integration here
-                    logger.info(f"Would send SMS to {user_phone}: Order #{instance.id} received and being processed.")
-                except Exception as e:
-                    logger.error(f"Failed to send SMS notification: {str(e)}")
-            
-        except Exception as e:
-            logger.error(f"Failed to send order notification: {str(e)}")
+            enqueue_email(admin_subject, admin_message, admin_emails)
+        
+        # SMS to customer
+        if user_phone:
+            enqueue_sms(user_phone, f"Order #{instance.id} received and being processed.")
@@ -0,0 +1,199 @@
+
+import base64
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset pagination on (created_at, id), newest first.
+
+    Each page is a single indexed range scan regardless of how deep the
+    client has paged. Passing ``offset`` switches to limit/offset paging,
+    which the admin UI uses to jump to arbitrary pages.
+
+    Views can page on another column by defining ``get_keyset_ordering()``
+    returning ``(field, descending)``; id always breaks ties.
+    """
+    field = 'created_at'
+    descending = True
+    page_size = 20
+    max_page_size = 100
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    offset_query_param = 'offset'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.count = None
+        self.offset = None
+        self.next_cursor = None
+        self.previous_cursor = None
+        self.next_offset = None
+        self.previous_offset = None
+
+        self.model = queryset.model
+        if hasattr(view, 'get_keyset_ordering'):
+            self.field, self.descending = view.get_keyset_ordering()
+        queryset = queryset.order_by(*self.order_by(self.descending))
+
+        if self.offset_query_param in request.query_params:
+            return self.paginate_offset(queryset, request)
+        return self.paginate_keyset(queryset, request)
+
+    def paginate_keyset(self, queryset, request):
+        cursor = self.decode_cursor(request)
+        reverse = False
+
+        if cursor is not None:
+            value, pk, reverse = cursor
+            # Pages run towards smaller keys when sorting descending; walking
+            # backwards flips both the comparison and the order
+            towards_smaller = self.descending != reverse
+            op = 'lt' if towards_smaller else 'gt'
+            # The redundant leading range on the sort key lets the database seek
+            # straight to the cursor in the index instead of filtering the OR
+            queryset = queryset.filter(
+                Q(**{f'{self.field}__{op}e': value}),
+                Q(**{f'{self.field}__{op}': value}) | Q(**{f'id__{op}': pk}),
+            )
+            if reverse:
+                queryset = queryset.order_by(*self.order_by(not self.descending))
+
+        # Fetch one extra row to find out whether another page follows
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+
+        if reverse:
+            results.reverse()
+            has_previous, has_next = has_more, True
+        else:
+            has_previous, has_next = cursor is not None, has_more
+
+        if results and has_next:
+            self.next_cursor = self.encode_cursor(results[-1], reverse=False)
+        if results and has_previous:
+            self.previous_cursor = self.encode_cursor(results[0], reverse=True)
+
+        return results
+
+    def paginate_offset(self, queryset, request):
+        try:
+            self.offset = _positive_int(request.query_params[self.offset_query_param])
+        except ValueError:
+            self.offset = 0
+
+        self.count = queryset.count()
+        results = list(queryset[self.offset:self.offset + self.page_size])
+
+        if self.offset + self.page_size < self.count:
+            self.next_offset = self.offset + self.page_size
+        if self.offset > 0:
+            self.previous_offset = max(self.offset - self.page_size, 0)
+
+        return results
+
+    def order_by(self, descending):
+        prefix = '-' if descending else ''
+        return [f'{prefix}{self.field}', f'{prefix}id']
+
+    def get_page_size(self, request):
+        try:
+            return _positive_int(
+                request.query_params[self.page_size_query_param],
+                strict=True,
+                cutoff=self.max_page_size
+            )
+        except (KeyError, ValueError):
+            return self.page_size
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+
+        try:
+            data = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            # Cursors only make sense for the ordering they were issued for
+            if data.get('k', 'created_at') != self.field:
+                raise ValueError
+            value = self.model._meta.get_field(self.field).to_python(data['v'] if 'v' in data else data['c'])
+            pk = int(data['i'])
+            reverse = bool(data.get('r', False))
+        except (TypeError, ValueError, KeyError, UnicodeError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+        if value is None:
+            raise NotFound(self.invalid_cursor_message)
+        return value, pk, reverse
+
+    def encode_cursor(self, obj, reverse):
+        if isinstance(obj, dict):
+            # A .values() row
+            value, pk = obj[self.field], obj['id']
+        else:
+            value, pk = getattr(obj, self.field), obj.pk
+        data = {
+            'k': self.field,
+            'v': value.isoformat() if hasattr(value, 'isoformat') else str(value),
+            'i': pk,
+        }
+        if reverse:
+            data['r'] = True
+        return base64.urlsafe_b64encode(json.dumps(data, separators=(',', ':')).encode('ascii')).decode('ascii')
+
+    def get_next_link(self):
+        url = self.request.build_absolute_uri()
+        if self.next_cursor is not None:
+            return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+        if self.next_offset is not None:
+            return replace_query_param(url, self.offset_query_param, self.next_offset)
+        return None
+
+    def get_previous_link(self):
+        url = self.request.build_absolute_uri()
+        if self.previous_cursor is not None:
+            return replace_query_param(url, self.cursor_query_param, self.previous_cursor)
+        if self.previous_offset is not None:
+            return replace_query_param(url, self.offset_query_param, self.previous_offset)
+        return None
+
+    def get_paginated_response(self, data):
+        # The same keys are returned in both modes so clients can switch freely
+        return Response(OrderedDict([
+            ('page_size', self.page_size),
+            ('count', self.count),
+            ('offset', self.offset),
+            ('next_cursor', self.next_cursor),
+            ('previous_cursor', self.previous_cursor),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        nullable_string = {'type': 'string', 'nullable': True}
+        return {
+            'type': 'object',
+            'required': ['page_size', 'results'],
+            'properties': {
+                'page_size': {'type': 'integer'},
+                'count': {'type': 'integer', 'nullable': True},
+                'offset': {'type': 'integer', 'nullable': True},
+                'next_cursor': nullable_string,
+                'previous_cursor': nullable_string,
+                'next': dict(nullable_string, format='uri'),
+                'previous': dict(nullable_string, format='uri'),
+                'results': schema,
+            },
+        }
@@ -0,0 +1,57 @@
+
+"""
+Sparse fieldsets for product responses.
+
+`?view=card` picks the named projection used by grid views, `?fields=` lists
+the fields to return and `?omit=` drops fields. The views read only the
+columns the selected fields need (see ValuesSerializerMixin), so skipped
+columns (the description above all) are never read from the database.
+"""
+
+from rest_framework.exceptions import ValidationError
+
+# Named projections for ?view=
+VIEWS = {
+    'card': ('id', 'name', 'price', 'in_stock', 'image', 'image_srcset'),
+}
+
+
+def split(value):
+    return [name.strip() for name in value.split(',') if name.strip()]
+
+
+class ProductProjection:
+    """
+    Parsed ?view=/?fields=/?omit= parameters.
+
+    `fields` is None when every serializer field is wanted; the id is always
+    returned. Raises a DRF ValidationError for unknown views or fields.
+    """
+
+    def __init__(self, params, available):
+        errors = {}
+        selected = None
+
+        view = params.get('view')
+        if view:
+            if view not in VIEWS:
+                errors['view'] = f"Unknown view, expected one of: {', '.join(VIEWS)}"
+            else:
+                selected = list(VIEWS[view])
+
+        requested = split(params.get('fields', ''))
+        omitted = split(params.get('omit', ''))
+        for param, names in (('fields', requested), ('omit', omitted)):
+            unknown = [name for name in names if name not in available]
+            if unknown:
+                errors[param] = f"Unknown field(s): {', '.join(unknown)}"
+        if errors:
+            raise ValidationError(errors)
+
+        if requested:
+            selected = [name for name in selected or available if name in requested]
+        if omitted:
+            selected = [name for name in selected or available if name not in omitted]
+        if selected is not None and 'id' not in selected:
+            selected.insert(0, 'id')
+        self.fields = selected
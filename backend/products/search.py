@@ -0,0 +1,220 @@
+
+import html
+import re
+from collections import namedtuple
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+SearchHit = namedtuple('SearchHit', ['id', 'rank', 'highlight', 'snippet'])
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+MAX_TERMS = 8
+
+HIGHLIGHT_START = '<mark>'
+HIGHLIGHT_STOP = '</mark>'
+
+# The database wraps matches in these private-use characters; mark() escapes
+# the product text around them and only then inserts the <mark> tags
+MATCH_START = '\ue000'
+MATCH_STOP = '\ue001'
+
+
+def tokenize(query):
+    return TOKEN_RE.findall(query.lower())[:MAX_TERMS]
+
+
+def mark(text):
+    """HTML-escape a highlight or snippet and turn the match delimiters into <mark> tags"""
+    if text is None:
+        return None
+    return html.escape(text).replace(MATCH_START, HIGHLIGHT_START).replace(MATCH_STOP, HIGHLIGHT_STOP)
+
+
+class SQLiteSearchBackend:
+    """
+    FTS5 external-content index over products_product(name, description).
+
+    Triggers keep the index in step with every write to the product table,
+    including bulk_create/bulk_update and raw SQL, so no signals are needed.
+    """
+    table = 'products_product_fts'
+
+    def install(self, cursor):
+        """Create the index if missing; returns True when it was created and needs filling"""
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [self.table])
+        created = cursor.fetchone() is None
+        cursor.execute(f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS {self.table} USING fts5(
+                name, description,
+                content='products_product', content_rowid='id',
+                tokenize='porter unicode61 remove_diacritics 2',
+                prefix='2 3'
+            )
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {self.table}_ai AFTER INSERT ON products_product BEGIN
+                INSERT INTO {self.table}(rowid, name, description)
+                VALUES (new.id, new.name, new.description);
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {self.table}_ad AFTER DELETE ON products_product BEGIN
+                INSERT INTO {self.table}({self.table}, rowid, name, description)
+                VALUES ('delete', old.id, old.name, old.description);
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {self.table}_au AFTER UPDATE OF name, description ON products_product BEGIN
+                INSERT INTO {self.table}({self.table}, rowid, name, description)
+                VALUES ('delete', old.id, old.name, old.description);
+                INSERT INTO {self.table}(rowid, name, description)
+                VALUES (new.id, new.name, new.description);
+            END
+        """)
+        return created
+
+    def rebuild(self, cursor):
+        cursor.execute(f"INSERT INTO {self.table}({self.table}) VALUES ('rebuild')")
+        cursor.execute(f"INSERT INTO {self.table}({self.table}) VALUES ('optimize')")
+
+    def build_query(self, terms, prefix):
+        # Quote every term so FTS5 operators in user input are treated as text
+        quoted = ['"%s"' % term for term in terms]
+        if prefix:
+            quoted[-1] += '*'
+        return ' '.join(quoted)
+
+    def search(self, cursor, terms, limit, prefix=True):
+        # bm25() weights: a hit in the name counts ten times one in the description
+        cursor.execute(f"""
+            SELECT rowid,
+                   bm25({self.table}, 10.0, 1.0) AS rank,
+                   highlight({self.table}, 0, %s, %s),
+                   snippet({self.table}, 1, %s, %s, '…', 16)
+            FROM {self.table}
+            WHERE {self.table} MATCH %s
+            ORDER BY rank
+            LIMIT %s
+        """, [
+            MATCH_START, MATCH_STOP, MATCH_START, MATCH_STOP,
+            self.build_query(terms, prefix), limit,
+        ])
+        # bm25() is negative, lower is better; flip it so higher means more relevant
+        return [SearchHit(row[0], -row[1], mark(row[2]), mark(row[3])) for row in cursor.fetchall()]
+
+    def match_sql(self, terms, prefix=True):
+        return f'SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s', [self.build_query(terms, prefix)]
+
+
+class PostgresSearchBackend:
+    """
+    GIN expression index over a weighted tsvector of name and description.
+
+    The index is maintained by Postgres itself on every write. Ranking uses
+    ts_rank_cd (cover density), which is the closest built-in to BM25.
+    """
+    index = 'products_product_search_idx'
+    config = 'english'
+
+    @property
+    def vector(self):
+        return (
+            f"setweight(to_tsvector('{self.config}', coalesce(name, '')), 'A') || "
+            f"setweight(to_tsvector('{self.config}', coalesce(description, '')), 'B')"
+        )
+
+    def install(self, cursor):
+        # CREATE INDEX indexes the rows already in the table, so there is nothing to fill
+        cursor.execute(
+            f'CREATE INDEX IF NOT EXISTS {self.index} ON products_product USING GIN (({self.vector}))'
+        )
+        return False
+
+    def rebuild(self, cursor):
+        cursor.execute(f'REINDEX INDEX {self.index}')
+
+    def build_query(self, terms, prefix):
+        parts = list(terms)
+        if prefix:
+            parts[-1] += ':*'
+        return ' & '.join(parts)
+
+    def search(self, cursor, terms, limit, prefix=True):
+        highlight_options = f'StartSel={MATCH_START}, StopSel={MATCH_STOP}'
+        cursor.execute(f"""
+            SELECT id,
+                   ts_rank_cd({self.vector}, query) AS rank,
+                   ts_headline('{self.config}', name, query, %s),
+                   ts_headline('{self.config}', description, query, %s)
+            FROM products_product, to_tsquery('{self.config}', %s) query
+            WHERE ({self.vector}) @@ query
+            ORDER BY rank DESC, id
+            LIMIT %s
+        """, [
+            highlight_options + ', HighlightAll=true',
+            highlight_options + ', MaxWords=24, MinWords=8',
+            self.build_query(terms, prefix), limit,
+        ])
+        return [SearchHit(pk, rank, mark(highlight), mark(snippet)) for pk, rank, highlight, snippet in cursor.fetchall()]
+
+    def match_sql(self, terms, prefix=True):
+        return (
+            f"SELECT id FROM products_product WHERE ({self.vector}) @@ to_tsquery('{self.config}', %s)",
+            [self.build_query(terms, prefix)],
+        )
+
+
+BACKENDS = {
+    'sqlite': SQLiteSearchBackend,
+    'postgresql': PostgresSearchBackend,
+}
+
+
+def get_backend():
+    vendor = getattr(settings, 'PRODUCT_SEARCH_BACKEND', None) or connection.vendor
+    backend_class = BACKENDS.get(vendor)
+    return backend_class() if backend_class else None
+
+
+def install_search_index(sender=None, using='default', **kwargs):
+    # Connected to post_migrate; every statement is idempotent. An index created
+    # on a database that already has products is filled from the table
+    backend = get_backend()
+    if backend is not None and using == 'default':
+        with connection.cursor() as cursor:
+            if backend.install(cursor):
+                backend.rebuild(cursor)
+
+
+def rebuild_search_index():
+    backend = get_backend()
+    with connection.cursor() as cursor:
+        backend.install(cursor)
+        backend.rebuild(cursor)
+
+
+def search_products(query, limit=20, prefix=True):
+    """Return ranked SearchHits for a free-text query, best match first"""
+    terms = tokenize(query)
+    backend = get_backend()
+    if not terms or backend is None:
+        return []
+    with connection.cursor() as cursor:
+        return backend.search(cursor, terms, limit, prefix=prefix)
+
+
+def matching_q(query, prefix=True):
+    """
+    Q for every product matching a free-text query, unranked and unlimited,
+    for narrowing querysets (e.g. admin search). None without a search backend.
+    """
+    backend = get_backend()
+    if backend is None:
+        return None
+    terms = tokenize(query)
+    if not terms:
+        return Q(pk__in=[])
+    return Q(pk__in=RawSQL(*backend.match_sql(terms, prefix)))
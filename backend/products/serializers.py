@@ -1,13 +1,155 @@
 
-from rest_framework import serializers
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from django.utils.functional import cached_property
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
 from .models import Product, Order, OrderItem
+from .checkout import place_order
+from .inventory import InsufficientStock
 
-class ProductSerializer(serializers.ModelSerializer):
+class SparseFieldsMixin:
+    """Serializer that only keeps the field names passed as `fields=`, see products.projections"""
+    
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+# Fields whose to_representation() returns database values unchanged
+PASSTHROUGH_FIELDS = (
+    serializers.IntegerField, serializers.CharField, serializers.BooleanField, serializers.ReadOnlyField,
+)
+
+class ValuesSerializerMixin:
+    """
+    Read-only fast path: serialize `.values(*serializer.values_columns())` rows.
+    
+    A dict passed as the instance is represented straight from the row, with
+    the same output the model instance would give, but without building model
+    instances or resolving attributes field by field. Method fields need a
+    `row_<name>(row)` method and their columns listed in `row_method_columns`.
+    """
+    row_method_columns = {}
+    
+    def values_columns(self, *required):
+        columns = dict.fromkeys(required)
+        for field in self._readable_fields:
+            if field.field_name in self.row_method_columns:
+                columns.update(dict.fromkeys(self.row_method_columns[field.field_name]))
+            else:
+                columns[field.source.replace('.', '__')] = None
+        return list(columns)
+    
+    def row_converter(self, field):
+        if isinstance(field, serializers.FileField):
+            if not getattr(field, 'use_url', api_settings.UPLOADED_FILES_USE_URL):
+                return lambda name: name or None
+            storage = self.Meta.model._meta.get_field(field.source).storage
+            request = self.context.get('request')
+            # Rows hold the file name; mirrors FileField.to_representation
+            def file_url(name):
+                if not name:
+                    return None
+                url = storage.url(name)
+                return request.build_absolute_uri(url) if request is not None else url
+            return file_url
+        if isinstance(field, serializers.DateTimeField):
+            output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+            if output_format is None or output_format.lower() != ISO_8601:
+                return field.to_representation
+            # Resolve the (per-request) timezone once instead of once per value
+            field_timezone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+            def iso_datetime(value):
+                if field_timezone is None or not timezone.is_aware(value):
+                    return field.to_representation(value)
+                value = value.astimezone(field_timezone).isoformat()
+                return value[:-6] + 'Z' if value.endswith('+00:00') else value
+            return iso_datetime
+        if isinstance(field, serializers.PrimaryKeyRelatedField) and field.pk_field is None:
+            return None
+        if type(field) in PASSTHROUGH_FIELDS or (isinstance(field, serializers.JSONField) and not field.binary):
+            return None
+        return field.to_representation
+    
+    @cached_property
+    def row_plan(self):
+        plan = []
+        for field in self._readable_fields:
+            if isinstance(field, serializers.SerializerMethodField):
+                plan.append((field.field_name, None, getattr(self, f'row_{field.field_name}')))
+            else:
+                plan.append((field.field_name, field.source.replace('.', '__'), self.row_converter(field)))
+        return plan
+    
+    def to_representation(self, instance):
+        if not isinstance(instance, dict):
+            return super().to_representation(instance)
+        ret = {}
+        for name, column, convert in self.row_plan:
+            if column is None:
+                ret[name] = convert(instance)
+                continue
+            value = instance[column]
+            ret[name] = value if value is None or convert is None else convert(value)
+        return ret
+
+class ProductSerializer(SparseFieldsMixin, ValuesSerializerMixin, serializers.ModelSerializer):
+    image_variants = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
+    
+    row_method_columns = {
+        'image_variants': ('image', 'image_variants', 'image_variants_source'),
+        'image_srcset': ('image', 'image_variants', 'image_variants_source'),
+    }
+    
     class Meta:
         model = Product
-        fields = '__all__'
+        exclude = ['image_variants_source']
+        # Stock changes with every order and would go stale in the cached catalog;
+        # it is read from /api/products/stock/ instead
+        extra_kwargs = {'stock': {'write_only': True}}
+    
+    def variant_url(self, name):
+        url = default_storage.url(name)
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request is not None else url
+    
+    def variants_for(self, image_name, variants, source):
+        # Variants describe an older upload until the builder catches up
+        if not image_name or source != image_name:
+            return []
+        return [
+            {
+                'format': variant['format'],
+                'width': variant['width'],
+                'height': variant['height'],
+                'url': self.variant_url(variant['name']),
+            }
+            for variant in variants
+        ]
+    
+    def srcset_for(self, variants):
+        """Ready-made srcset strings per format, e.g. {'webp': '.../200w.webp 200w, ...'}"""
+        srcset = {}
+        for variant in variants:
+            srcset.setdefault(variant['format'], []).append(f"{variant['url']} {variant['width']}w")
+        return {fmt: ', '.join(entries) for fmt, entries in srcset.items()}
+    
+    def get_image_variants(self, obj):
+        return self.variants_for(obj.image.name if obj.image else None, obj.image_variants, obj.image_variants_source)
+    
+    def get_image_srcset(self, obj):
+        return self.srcset_for(self.get_image_variants(obj))
+    
+    def row_image_variants(self, row):
+        return self.variants_for(row['image'], row['image_variants'], row['image_variants_source'])
+    
+    def row_image_srcset(self, row):
+        return self.srcset_for(self.row_image_variants(row))
 
-class OrderItemSerializer(serializers.ModelSerializer):
+class OrderItemSerializer(ValuesSerializerMixin, serializers.ModelSerializer):
     product_name = serializers.ReadOnlyField(source='product.name')
     
     class Meta:
@@ -26,7 +168,10 @@ class OrderSerializer(serializers.ModelSerializer):
             'status', 'shipping_address', 'billing_address', 
             'total_amount', 'created_at', 'updated_at', 'items'
         ]
-        read_only_fields = ['id', 'created_at', 'updated_at', 'user_email', 'user_fullname']
+        # Status only changes through update_status/bulk_update_status (see transitions.py)
+        read_only_fields = [
+            'id', 'user', 'status', 'created_at', 'updated_at', 'user_email', 'user_fullname', 'total_amount'
+        ]
     
     def get_user_fullname(self, obj):
         if hasattr(obj.user, 'profile'):
@@ -39,23 +184,38 @@ class OrderSerializer(serializers.ModelSerializer):
         # Set the user from the request
         validated_data['user'] = self.context['request'].user
         
-        # Create order
-        order = Order.objects.create(**validated_data)
-        
-        # Create order items
+        lines = []
         for item_data in items_data:
-            product_id = item_data.get('product')
-            quantity = item_data.get('quantity', 1)
-            
             try:
-                product = Product.objects.get(id=product_id)
-                OrderItem.objects.create(
-                    order=order,
-                    product=product,
-                    quantity=quantity,
-                    price=product.price
-                )
-            except Product.DoesNotExist:
-                pass  # Skip items with invalid product IDs
+                product_id = int(item_data.get('product'))
+                quantity = int(item_data.get('quantity', 1))
+            except (AttributeError, TypeError, ValueError):
+                raise serializers.ValidationError({'items': 'Each item needs an integer product and quantity'})
+            if quantity < 1:
+                raise serializers.ValidationError({'items': 'Quantity must be at least 1'})
+            lines.append((product_id, quantity))
         
-        return order
+        try:
+            return place_order(validated_data.pop('user'), lines, **validated_data)
+        except InsufficientStock as e:
+            raise serializers.ValidationError({
+                'items': 'Not enough stock', 'out_of_stock': e.product_ids
+            })
+
+class OrderSummarySerializer(serializers.ModelSerializer):
+    """Order header with aggregated item totals, see OrderQuerySet.with_summary"""
+    user_email = serializers.ReadOnlyField(source='user.email')
+    user_fullname = serializers.SerializerMethodField()
+    item_count = serializers.IntegerField(read_only=True)
+    total_quantity = serializers.IntegerField(read_only=True)
+    
+    class Meta:
+        model = Order
+        fields = [
+            'id', 'user', 'user_email', 'user_fullname',
+            'status', 'total_amount', 'created_at', 'updated_at',
+            'item_count', 'total_quantity'
+        ]
+        read_only_fields = fields
+    
+    get_user_fullname = OrderSerializer.get_user_fullname
@@ -1,4 +1,1130 @@
 
-from django.test import TestCase
+from datetime import datetime, timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import OperationalError, connection, connections, transaction
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from PIL import Image
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from ecommerce_backend.admin import EstimatedCountPaginator
+from ecommerce_backend.parsers import ORJSONParser
+from ecommerce_backend.renderers import ORJSONRenderer
+from ecommerce_backend.sqlite3.base import DatabaseWrapper
+from notifications.models import OutboxMessage
+
+from . import benchmarks
+from .cache import SingleFlight, get_catalog_version
+from .search import get_backend, install_search_index, search_products
+from .inventory import InsufficientStock, reserve_stock
+from .models import Product, Order, OrderItem
+from .serializers import OrderSerializer, ProductSerializer
+
+
+class ProductPaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        now = timezone.now()
+        products = Product.objects.bulk_create([
+            Product(name=f'Product {i}', description='', price=Decimal('1.00'))
+            for i in range(25)
+        ])
+        # Give a few rows the same timestamp so ties fall back to id
+        for i, product in enumerate(products):
+            product.created_at = now - timedelta(minutes=i // 3)
+        Product.objects.bulk_update(products, ['created_at'])
+        self.expected = list(
+            Product.objects.order_by('-created_at', '-id').values_list('id', flat=True)
+        )
+
+    def test_cursor_walks_every_row_once(self):
+        seen = []
+        url = '/api/products/?page_size=7'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.data['page_size'], 7)
+            self.assertIsNone(response.data['count'])
+            seen.extend(row['id'] for row in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(seen, self.expected)
+
+    def test_previous_cursor_returns_prior_page(self):
+        first = self.client.get('/api/products/?page_size=5').data
+        second = self.client.get(first['next']).data
+        self.assertIsNone(first['previous_cursor'])
+        back = self.client.get(second['previous']).data
+        self.assertEqual(
+            [row['id'] for row in back['results']],
+            [row['id'] for row in first['results']],
+        )
+        self.assertIsNone(back['previous_cursor'])
+
+    def test_offset_mode_reports_count(self):
+        response = self.client.get('/api/products/?offset=20&page_size=10')
+        self.assertEqual(response.data['count'], 25)
+        self.assertEqual(response.data['offset'], 20)
+        self.assertIsNone(response.data['next'])
+        self.assertEqual([row['id'] for row in response.data['results']], self.expected[20:])
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/products/?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, 404)
+
+
+class ProductFilterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        now = timezone.now()
+        prices = ['5.00', '20.00', '30.00', '30.00', '75.00', '120.00', '600.00', '1500.00', '30.00', '45.00']
+        products = Product.objects.bulk_create([
+            Product(name=f'Product {i:02}', description='', price=Decimal(price), in_stock=i % 3 != 0)
+            for i, price in enumerate(prices)
+        ])
+        for i, product in enumerate(products):
+            product.created_at = now - timedelta(days=i)
+        Product.objects.bulk_update(products, ['created_at'])
+        self.products = products
+
+    def ids(self, params):
+        response = self.client.get('/api/products/', params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return [row['id'] for row in response.data['results']]
+
+    def test_filters(self):
+        p = self.products
+        self.assertEqual(self.ids({'min_price': '30', 'max_price': '100'}), [p[2].id, p[3].id, p[4].id, p[8].id, p[9].id])
+        self.assertEqual(self.ids({'in_stock': 'false'}), [p[0].id, p[3].id, p[6].id, p[9].id])
+        day = (timezone.now() - timedelta(days=2)).date()
+        self.assertEqual(self.ids({'created_after': str(day), 'created_before': str(day)}), [p[2].id])
+        self.assertEqual(self.client.get('/api/products/', {'min_price': 'cheap'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/products/', {'ordering': 'description'}).status_code, 400)
+
+    def test_price_ordering_pages_with_cursor(self):
+        expected = list(Product.objects.order_by('price', 'id').values_list('id', flat=True))
+        seen = []
+        url = '/api/products/?ordering=price&page_size=3'
+        while url:
+            data = self.client.get(url).data
+            seen.extend(row['id'] for row in data['results'])
+            url = data['next']
+        self.assertEqual(seen, expected)
+
+        first = self.client.get('/api/products/?ordering=-price&page_size=4').data
+        second = self.client.get(first['next']).data
+        back = self.client.get(second['previous']).data
+        self.assertEqual([r['id'] for r in back['results']], [r['id'] for r in first['results']])
+        self.assertEqual(
+            [r['price'] for r in first['results'] + second['results']],
+            ['1500.00', '600.00', '120.00', '75.00', '45.00', '30.00', '30.00', '30.00'],
+        )
+        # A cursor issued for one ordering is rejected for another
+        self.assertEqual(self.client.get('/api/products/', {'cursor': first['next_cursor']}).status_code, 404)
+
+    def test_facets_in_one_query(self):
+        with self.assertNumQueries(2):
+            data = self.client.get('/api/products/', {'facets': 'true', 'in_stock': 'true', 'max_price': '100'}).data
+        facets = data['facets']
+        self.assertEqual(facets['total'], 4)
+        self.assertEqual(len(data['results']), 4)
+        # Each facet ignores its own filter
+        self.assertEqual(facets['in_stock'], {'true': 4, 'false': 3})
+        self.assertEqual([b['count'] for b in facets['price']], [1, 2, 1, 1, 0, 0, 1])
+        self.assertEqual(facets['price'][-1], {'min': '1000', 'max': None, 'count': 1})
+        self.assertEqual(facets['price_range'], {'min': '20.00', 'max': '1500.00'})
+
+
+class ProductProjectionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        Product.objects.bulk_create([
+            Product(name=f'Product {i}', description='A long description ' * 20, price=Decimal('10.00') + i)
+            for i in range(5)
+        ])
+
+    def test_card_view_skips_heavy_columns(self):
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get('/api/products/', {'view': 'card', 'ordering': 'price', 'page_size': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertCountEqual(
+            response.data['results'][0], ['id', 'name', 'price', 'image', 'in_stock', 'image_srcset']
+        )
+        self.assertNotIn('description', captured[0]['sql'])
+        self.assertEqual(len(captured), 1)
+
+        # Cursors built from the projected rows still page correctly
+        second = self.client.get(response.data['next']).data
+        self.assertEqual([r['price'] for r in second['results']], ['12.00', '13.00'])
+
+    def test_fields_and_omit(self):
+        product = Product.objects.first()
+        data = self.client.get(f'/api/products/{product.id}/', {'fields': 'name,price'}).data
+        self.assertEqual(data, {'id': product.id, 'name': product.name, 'price': '10.00'})
+
+        row = self.client.get('/api/products/', {'omit': 'description,image_variants'}).data['results'][0]
+        self.assertNotIn('description', row)
+        self.assertIn('updated_at', row)
+        self.assertIn('image_srcset', row)
+
+        self.assertEqual(self.client.get('/api/products/', {'fields': 'name,secret'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/products/', {'view': 'poster'}).status_code, 400)
+
+
+class ProductBatchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.products = [
+            Product.objects.create(name=f'Product {i}', description='', price=Decimal('10.00') + i) for i in range(3)
+        ]
+
+    def batch(self, ids, **params):
+        return self.client.get('/api/products/batch/', {'ids': ','.join(map(str, ids)), **params})
+
+    def test_request_order_and_missing_ids_in_one_query(self):
+        a, b, c = (p.id for p in self.products)
+        with self.assertNumQueries(1):
+            response = self.batch([c, 999999, a, c])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['id'] for row in response.data['results']], [c, a])
+        self.assertEqual(response.data['missing'], [999999])
+        self.assertEqual(response.data['results'][1], self.client.get(f'/api/products/{a}/').data)
+
+        data = self.batch([b], fields='name').data
+        self.assertEqual(data['results'], [{'id': b, 'name': 'Product 1'}])
+
+    def test_conditional_requests(self):
+        ids = ','.join(str(p.id) for p in self.products)
+        response = self.client.get('/api/products/batch/', {'ids': ids})
+        etag = response['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/products/batch/', {'ids': ids}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.products[0].save()
+        response = self.client.get('/api/products/batch/', {'ids': ids}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_validation(self):
+        self.assertEqual(self.client.get('/api/products/batch/').status_code, 400)
+        self.assertEqual(self.client.get('/api/products/batch/', {'ids': '1,two'}).status_code, 400)
+        self.assertEqual(self.batch(range(1, 102)).status_code, 400)
+
+
+class SerializationFastPathTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user('jane', 'jane@example.com')
+        self.products = [
+            Product.objects.create(
+                name='Lamp \u2028 «brass»', description='Line one\nline two', price=Decimal('10.5'), sku='LAMP-1',
+                image='products/lamp.jpg', image_variants_source='products/lamp.jpg', stock=3,
+                image_variants=[{'format': 'webp', 'width': 200, 'height': 100, 'name': 'products/variants/lamp/200w.webp'}],
+            ),
+            Product.objects.create(name='Rug', description='', price=Decimal('5'), image='products/old.jpg'),
+            Product.objects.create(name='Mat', description='', price=Decimal('0.99'), in_stock=False),
+        ]
+        for _ in range(2):
+            order = Order.objects.create(
+                user=self.user, shipping_address='1 Road', billing_address='1 Road', total_amount=Decimal('15.50')
+            )
+            for product in self.products[:2]:
+                OrderItem.objects.create(order=order, product=product, quantity=2, price=product.price)
+
+    def assertSameBytes(self, response, instance_data):
+        expected = b'"results":' + JSONRenderer().render(instance_data) + b'}'
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content.endswith(expected), response.content)
+
+    def test_product_rows_render_like_instances(self):
+        response = self.client.get('/api/products/')
+        products = Product.objects.order_by('-created_at', '-id')
+        context = {'request': response.wsgi_request}
+        self.assertSameBytes(response, ProductSerializer(products, many=True, context=context).data)
+
+        response = self.client.get('/api/products/', {'view': 'card'})
+        fields = ['id', 'name', 'price', 'in_stock', 'image', 'image_srcset']
+        self.assertSameBytes(response, ProductSerializer(products, many=True, context=context, fields=fields).data)
+
+        product = self.products[0]
+        response = self.client.get(f'/api/products/{product.id}/')
+        self.assertEqual(response.content, JSONRenderer().render(ProductSerializer(product, context=context).data))
+
+    def test_order_item_rows_render_like_instances(self):
+        self.client.force_authenticate(self.user)
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/orders/')
+        orders = Order.objects.with_details().order_by('-created_at', '-id')
+        self.assertSameBytes(response, OrderSerializer(orders, many=True).data)
+
+    def test_renderer_matches_drf(self):
+        data = {
+            'when': timezone.make_aware(datetime(2024, 1, 2, 3, 4, 5, 678000)),
+            'day': datetime(2024, 1, 2).date(),
+            'amount': Decimal('1.50'),
+            'lazy': gettext_lazy('Not found.'),
+            'text': 'quote " slash \\ \u2029 ünïcode',
+            'ids': (1, 2),
+            1: [None, True, 2.5],
+            'huge': 2 ** 70,
+        }
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(
+            ORJSONRenderer().render(data, 'application/json; indent=2'),
+            JSONRenderer().render(data, 'application/json; indent=2'),
+        )
+
+    def test_renderer_float_differences(self):
+        # Exponents are written in the shortest form; the value is the same
+        data = {'rank': -1e-06}
+        self.assertEqual(ORJSONRenderer().render(data), b'{"rank":-1e-6}')
+        self.assertEqual(JSONRenderer().render(data), b'{"rank":-1e-06}')
+        self.assertEqual(json.loads(ORJSONRenderer().render(data)), data)
+        # Non-finite floats are refused as in DRF's strict mode, not written as null
+        for value in (float('nan'), float('inf'), float('-inf')):
+            with self.assertRaises(ValueError):
+                ORJSONRenderer().render({'results': [{'rank': value, 'id': None}]})
+
+    def test_parser(self):
+        parsed = ORJSONParser().parse(BytesIO('{"name": "Lämp", "items": [1, 2.5]}'.encode()))
+        self.assertEqual(parsed, {'name': 'Lämp', 'items': [1, 2.5]})
+        for body in (b'{"a": NaN}', b'{', b''):
+            with self.assertRaises(ParseError):
+                ORJSONParser().parse(BytesIO(body))
+
+
+class OrderPaginationTests(TestCase):
+    def test_customers_page_through_own_orders(self):
+        user = User.objects.create_user('buyer', 'buyer@example.com', 'pass12345')
+        other = User.objects.create_user('other', 'other@example.com', 'pass12345')
+        for owner in (user, other):
+            for _ in range(3):
+                Order.objects.create(
+                    user=owner, shipping_address='x', billing_address='x', total_amount=Decimal('1.00')
+                )
+
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.get('/api/orders/?page_size=2')
+        self.assertEqual(len(response.data['results']), 2)
+        rest = client.get(response.data['next']).data
+        self.assertEqual(len(rest['results']), 1)
+        self.assertIsNone(rest['next'])
+        self.assertTrue(all(row['user'] == user.id for row in response.data['results'] + rest['results']))
+
+
+class ProductSearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.headphones = Product.objects.create(
+            name='Wireless Headphones', description='Noise cancelling over-ear headphones', price=Decimal('99.00')
+        )
+        self.speaker = Product.objects.create(
+            name='Bluetooth Speaker', description='Pairs with wireless headphones and phones', price=Decimal('49.00')
+        )
+        Product.objects.create(name='Desk Lamp', description='Warm light', price=Decimal('19.00'))
+
+    def search(self, query, **params):
+        response = self.client.get('/api/products/search/', {'q': query, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.data['results']
+
+    def test_name_matches_rank_above_description_matches(self):
+        results = self.search('headphones')
+        self.assertEqual([r['id'] for r in results], [self.headphones.id, self.speaker.id])
+        self.assertIn('<mark>Headphones</mark>', results[0]['search']['highlight'])
+        self.assertIn('<mark>headphones</mark>', results[1]['search']['snippet'])
+
+    def test_prefix_matching_for_typeahead(self):
+        self.assertEqual([r['id'] for r in self.search('blue')], [self.speaker.id])
+        self.assertEqual(self.search('blue', prefix='false'), [])
+
+    def test_operators_in_input_are_literal(self):
+        self.assertEqual(self.search('lamp" OR "*'), [])
+        self.assertEqual(self.search('^lamp:*')[0]['name'], 'Desk Lamp')
+
+    def test_index_follows_updates_and_deletes(self):
+        self.headphones.name = 'Studio Monitors'
+        self.headphones.save()
+        self.assertEqual([r['id'] for r in self.search('studio')], [self.headphones.id])
+        self.speaker.delete()
+        self.assertEqual([r['id'] for r in self.search('headphones')], [self.headphones.id])
+
+    def test_highlights_escape_product_text(self):
+        product = Product.objects.create(
+            name='<b>Loud</b> speaker & amp', description='Plays "<script>" loud', price=Decimal('5.00')
+        )
+        results = self.search('loud')
+        self.assertEqual([r['id'] for r in results], [product.id])
+        self.assertEqual(results[0]['search']['highlight'], '&lt;b&gt;<mark>Loud</mark>&lt;/b&gt; speaker &amp; amp')
+        self.assertEqual(results[0]['search']['snippet'], 'Plays &quot;&lt;script&gt;&quot; <mark>loud</mark>')
+
+    def test_index_created_on_existing_products_is_filled(self):
+        backend = get_backend()
+        with connection.cursor() as cursor:
+            for suffix in ('ai', 'ad', 'au'):
+                cursor.execute(f'DROP TRIGGER {backend.table}_{suffix}')
+            cursor.execute(f'DROP TABLE {backend.table}')
+        install_search_index(using='default')
+        self.assertEqual([r['id'] for r in self.search('headphones')], [self.headphones.id, self.speaker.id])
+        # Already installed: nothing is rebuilt
+        with CaptureQueriesContext(connection) as queries:
+            install_search_index(using='default')
+        self.assertFalse(any('rebuild' in query['sql'] for query in queries))
+
+    def test_rebuild_command(self):
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(len(self.search('wireless')), 2)
+
+    def test_query_required(self):
+        response = self.client.get('/api/products/search/')
+        self.assertEqual(response.status_code, 400)
+
+
+class AdminTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'pass12345')
+        self.client.force_login(self.admin)
+        self.customer = User.objects.create_user('jane', 'jane@example.com')
+        self.customer.profile.full_name = 'Jane Doe'
+        self.customer.profile.save()
+        self.hose = Product.objects.create(sku='HOSE-1', name='Garden hose', description='Flexible', price=Decimal('20.00'), stock=5)
+        self.lamp = Product.objects.create(sku='LAMP-1', name='Desk lamp', description='Brass', price=Decimal('30.00'))
+        self.orders = [self.make_order(status) for status in ('pending', 'pending', 'delivered')]
+
+    def make_order(self, status='pending', user=None):
+        order = Order.objects.create(
+            user=user or self.customer, status=status, shipping_address='1 Road', billing_address='1 Road',
+            total_amount=Decimal('20.00'),
+        )
+        OrderItem.objects.create(order=order, product=self.hose, quantity=1, price=Decimal('20.00'))
+        return order
+
+    def changelist(self, model, **params):
+        response = self.client.get(f'/admin/{model}/', params)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        for model in ('products/order', 'products/product', 'authentication/userprofile'):
+            with CaptureQueriesContext(connection) as few:
+                self.changelist(model)
+            for i in range(5):
+                customer = User.objects.create_user(f'customer{User.objects.count()}')
+                self.make_order(user=customer)
+                Product.objects.create(name=f'Rake {i}', description='', price=Decimal('5.00'))
+            with CaptureQueriesContext(connection) as many:
+                self.changelist(model)
+            self.assertEqual(len(many), len(few), model)
+
+    def test_order_items_are_read_only(self):
+        order = self.orders[0]
+        response = self.client.get(f'/admin/products/order/{order.id}/change/')
+        self.assertContains(response, 'Garden hose')
+        self.assertNotContains(response, 'name="items-0-quantity"')
+        self.assertNotContains(response, 'name="items-0-DELETE"')
+
+        self.client.post(f'/admin/products/order/{order.id}/change/', {
+            'user': self.customer.id, 'shipping_address': '2 Road', 'billing_address': '2 Road',
+            'items-TOTAL_FORMS': 2, 'items-INITIAL_FORMS': 1, 'items-MIN_NUM_FORMS': 0, 'items-MAX_NUM_FORMS': 1000,
+            'items-0-id': order.items.get().id, 'items-0-order': order.id, 'items-0-quantity': 9, 'items-0-DELETE': 'on',
+            'items-1-order': order.id, 'items-1-product': self.lamp.id, 'items-1-quantity': 1, 'items-1-price': '1.00',
+        })
+        order.refresh_from_db()
+        self.assertEqual(order.shipping_address, '2 Road')
+        self.assertEqual(list(order.items.values_list('product_id', 'quantity')), [(self.hose.id, 1)])
+
+    def test_unfiltered_count_is_estimated_on_large_tables(self):
+        lamp_id = self.lamp.id
+        self.hose.delete()
+        queryset = Product.objects.order_by('-id')
+        self.assertEqual(EstimatedCountPaginator(queryset, 10).count, 1)
+
+        with mock.patch.object(EstimatedCountPaginator, 'exact_below', 0):
+            # SQLite estimates from the largest rowid, so the deleted row still counts
+            self.assertEqual(EstimatedCountPaginator(queryset, 10).count, lamp_id)
+            self.assertEqual(EstimatedCountPaginator(queryset.filter(in_stock=True), 10).count, 1)
+            with CaptureQueriesContext(connection) as captured:
+                self.changelist('products/product')
+            self.assertFalse([q for q in captured.captured_queries if 'COUNT(' in q['sql']])
+
+    def test_search_uses_indexed_lookups(self):
+        def results(model, term):
+            return list(self.changelist(model, q=term).context['cl'].result_list)
+
+        self.assertEqual(results('products/product', 'hose'), [self.hose])
+        self.assertEqual(results('products/product', 'bras'), [self.lamp])
+        self.assertEqual(results('products/product', 'LAMP-'), [self.lamp])
+        self.assertEqual(results('products/product', 'nothing'), [])
+
+        other = self.make_order(user=User.objects.create_user('joe', 'joe@example.com'))
+        self.assertEqual(results('products/order', f'#{other.id}'), [other])
+        self.assertEqual(results('products/order', 'joe'), [other])
+        self.assertEqual(results('products/order', 'joe@example.com'), [other])
+        self.assertEqual(len(results('products/order', 'jane')), 3)
+
+        profile = self.customer.profile
+        self.assertEqual(results('authentication/userprofile', 'Jane D'), [profile])
+        self.assertEqual(results('authentication/userprofile', 'ja'), [profile])
+        self.assertEqual(results('authentication/userprofile', 'jane@example.com'), [profile])
+
+    def test_order_actions_follow_the_state_machine(self):
+        ids = [order.id for order in self.orders]
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.post('/admin/products/order/', {
+                'action': 'mark_processing', '_selected_action': ids,
+            }, follow=True)
+        messages_sent = [str(m) for m in response.context['messages']]
+        self.assertEqual(messages_sent, [
+            '2 orders moved to processing.', '1 orders skipped: their status cannot change to processing.',
+        ])
+        self.assertEqual(
+            list(Order.objects.filter(pk__in=ids).order_by('id').values_list('status', flat=True)),
+            ['processing', 'processing', 'delivered'],
+        )
+        order_updates = [q for q in captured.captured_queries if q['sql'].startswith('UPDATE "products_order"')]
+        self.assertEqual(len(order_updates), 1)
+        self.assertEqual(self.client.get('/admin/products/order/add/').status_code, 403)
+
+    def test_product_stock_actions_update_in_bulk(self):
+        version = get_catalog_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/admin/products/product/', {
+                'action': 'mark_out_of_stock', '_selected_action': [self.hose.id, self.lamp.id],
+            })
+        self.assertGreater(get_catalog_version(), version)
+        self.assertEqual(
+            list(Product.objects.order_by('id').values_list('in_stock', 'stock')), [(False, 0), (False, None)],
+        )
+
+        # A tracked product without stock needs restocking first
+        self.client.post('/admin/products/product/', {
+            'action': 'mark_in_stock', '_selected_action': [self.hose.id, self.lamp.id],
+        })
+        self.assertEqual(
+            list(Product.objects.order_by('id').values_list('in_stock', 'stock')), [(False, 0), (True, None)],
+        )
+
+
+class CatalogCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.product = Product.objects.create(name='Mug', description='Ceramic', price=Decimal('8.00'))
+
+    def test_repeat_reads_skip_the_database(self):
+        first = self.client.get(f'/api/products/{self.product.id}/')
+        with self.assertNumQueries(0):
+            second = self.client.get(f'/api/products/{self.product.id}/')
+        self.assertEqual(first.data, second.data)
+        self.assertEqual(first['ETag'], second['ETag'])
+
+    def test_if_none_match_returns_304(self):
+        etag = self.client.get('/api/products/')['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/products/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_product_write_invalidates(self):
+        before = self.client.get(f'/api/products/{self.product.id}/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.name = 'Travel Mug'
+            self.product.save()
+        after = self.client.get(f'/api/products/{self.product.id}/', HTTP_IF_NONE_MATCH=before['ETag'])
+        self.assertEqual(after.status_code, 200)
+        self.assertEqual(after.data['name'], 'Travel Mug')
+        self.assertNotEqual(after['ETag'], before['ETag'])
+
+    def test_missing_product_is_not_cached(self):
+        self.assertEqual(self.client.get('/api/products/999999/').status_code, 404)
+        self.assertEqual(self.client.get('/api/products/999999/').status_code, 404)
+
+    def test_single_flight_coalesces_concurrent_misses(self):
+        flight = SingleFlight()
+        calls = []
+
+        def load():
+            calls.append(1)
+            time.sleep(0.05)
+            return 'value'
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(flight.do('key', load)))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, ['value'] * 8)
+        self.assertEqual(len(calls), 1)
+
+
+class OrderCreateTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('buyer', 'buyer@example.com', 'pass12345')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.products = Product.objects.bulk_create([
+            Product(name=f'Item {i}', description='', price=Decimal('2.50'))
+            for i in range(30)
+        ])
+
+    def post_order(self, items, **extra):
+        return self.client.post('/api/orders/', {
+            'shipping_address': 'Street 1',
+            'billing_address': 'Street 1',
+            'items': items,
+            **extra,
+        }, format='json')
+
+    def test_total_is_computed_on_the_server(self):
+        response = self.post_order(
+            [{'product': self.products[0].id, 'quantity': 3}, {'product': 999999, 'quantity': 1}],
+            total_amount='0.01',
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['total_amount'], '7.50')
+        self.assertEqual(len(response.data['items']), 1)
+        self.assertEqual(response.data['user'], self.user.id)
+
+    def test_query_count_does_not_grow_with_items(self):
+        def count_queries(n):
+            items = [{'product': p.id, 'quantity': 1} for p in self.products[:n]]
+            with CaptureQueriesContext(connection) as captured:
+                self.assertEqual(self.post_order(items).status_code, 201)
+            return len(captured)
+
+        self.assertEqual(count_queries(2), count_queries(30))
+
+    def test_invalid_quantity_creates_nothing(self):
+        response = self.post_order([{'product': self.products[0].id, 'quantity': 0}])
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.exists())
+
+
+class OrderListingTests(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user('staff', 'staff@example.com', 'pass12345', is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.staff)
+        self.products = Product.objects.bulk_create([
+            Product(name=f'Item {i}', description='', price=Decimal('1.00')) for i in range(3)
+        ])
+
+    def add_orders(self, count):
+        for i in range(count):
+            customer = User.objects.create_user(f'customer{Order.objects.count()}')
+            order = Order.objects.create(
+                user=customer, shipping_address='x', billing_address='x', total_amount=Decimal('3.00')
+            )
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, product=product, quantity=2, price=product.price)
+                for product in self.products
+            ])
+
+    def count_list_queries(self, url):
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(captured)
+
+    def test_staff_listing_uses_constant_queries(self):
+        self.add_orders(2)
+        few = self.count_list_queries('/api/orders/')
+        self.add_orders(8)
+        self.assertEqual(self.count_list_queries('/api/orders/'), few)
+        self.assertEqual(self.count_list_queries('/api/orders/?view=summary'), 1)
+
+    def test_summary_view(self):
+        self.add_orders(1)
+        row = self.client.get('/api/orders/?view=summary').data['results'][0]
+        self.assertNotIn('items', row)
+        self.assertEqual(row['item_count'], 3)
+        self.assertEqual(row['total_quantity'], 6)
+        self.assertEqual(row['user_email'], '')
+
+
+class ImageVariantTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        override = self.settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        buffer = BytesIO()
+        Image.new('RGBA', (1000, 500), (200, 10, 10, 255)).save(buffer, 'PNG')
+        self.product = Product.objects.create(name='Poster', description='', price=Decimal('10.00'))
+        self.product.image.save('poster.png', ContentFile(buffer.getvalue()))
+
+    def test_build_command_creates_resized_variants(self):
+        self.assertEqual(ProductSerializer(self.product).data['image_variants'], [])
+
+        call_command('build_image_variants', '--workers', '1', stdout=StringIO())
+        self.product.refresh_from_db()
+        data = ProductSerializer(self.product).data
+
+        webp = [v for v in data['image_variants'] if v['format'] == 'webp']
+        # 1200 would upscale, so the original width is used instead
+        self.assertEqual([(v['width'], v['height']) for v in webp], [(200, 100), (400, 200), (800, 400), (1000, 500)])
+        self.assertIn('200w.webp 200w', data['image_srcset']['webp'])
+        self.assertIn('jpeg', data['image_srcset'])
+        with Image.open(os.path.join(self.media_root, self.product.image_variants[0]['name'])) as variant:
+            self.assertEqual(variant.width, 200)
+
+    def test_same_file_names_do_not_share_variants(self):
+        buffer = BytesIO()
+        Image.new('RGB', (300, 300), (10, 10, 200)).save(buffer, 'JPEG')
+        other = Product.objects.create(name='Other poster', description='', price=Decimal('10.00'))
+        other.image.save('poster.jpg', ContentFile(buffer.getvalue()))
+
+        call_command('build_image_variants', '--workers', '1', stdout=StringIO())
+        self.product.refresh_from_db()
+        other.refresh_from_db()
+        names = {v['name'] for v in self.product.image_variants}
+        other_names = {v['name'] for v in other.image_variants}
+        self.assertFalse(names & other_names)
+        for name in names | other_names:
+            self.assertTrue(os.path.exists(os.path.join(self.media_root, name)), name)
+
+    def test_only_stale_images_are_rebuilt(self):
+        call_command('build_image_variants', '--workers', '1', stdout=StringIO())
+        out = StringIO()
+        call_command('build_image_variants', '--workers', '1', stdout=out)
+        self.assertEqual(out.getvalue(), '')
+
+
+class CatalogImportExportTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+
+    def write(self, name, text):
+        path = os.path.join(self.tmp, name)
+        with open(path, 'w') as f:
+            f.write(text)
+        return path
+
+    def test_ndjson_import_upserts_by_sku(self):
+        Product.objects.create(sku='LAMP-1', name='Old lamp', description='', price=Decimal('5.00'))
+        path = self.write('catalog.ndjson', '\n'.join([
+            '{"sku": "LAMP-1", "name": "Brass lamp", "price": "49.5", "stock": 3}',
+            '{"sku": "RUG-1", "name": "Wool rug", "description": "Hand knotted", "price": 120, "in_stock": false}',
+            '{"sku": "BAD", "name": "No price"}',
+            'not json',
+            '{"sku": "RUG-1", "name": "Wool rug, large", "price": 150}',
+        ]) + '\n')
+
+        out, err = StringIO(), StringIO()
+        call_command('import_products', path, '--workers', '1', stdout=out, stderr=err)
+        self.assertIn('Imported 2 products', out.getvalue())
+        self.assertIn('2 invalid rows', out.getvalue())
+        self.assertIn('Row 4:', err.getvalue())
+
+        lamp = Product.objects.get(sku='LAMP-1')
+        self.assertEqual((lamp.name, lamp.price, lamp.stock), ('Brass lamp', Decimal('49.50'), 3))
+        rug = Product.objects.get(sku='RUG-1')
+        self.assertEqual((rug.name, rug.price, rug.in_stock), ('Wool rug, large', Decimal('150.00'), True))
+        self.assertEqual(Product.objects.count(), 2)
+        # The search index follows upserts
+        self.assertEqual([hit.id for hit in search_products('brass')], [lamp.id])
+
+    def test_parallel_import_matches_serial(self):
+        lines = [f'{{"sku": "SKU-{i % 150}", "name": "Item {i}", "price": "{i}.00"}}' for i in range(300)]
+        path = self.write('catalog.ndjson', '\n'.join(lines))
+        call_command('import_products', path, '--workers', '2', '--batch-size', '40', stdout=StringIO())
+        self.assertEqual(Product.objects.count(), 150)
+        # Later rows win
+        self.assertEqual(Product.objects.get(sku='SKU-7').name, 'Item 157')
+
+    def test_csv_round_trip(self):
+        Product.objects.create(sku='A', name='Chair, oak', description='Line one\nline two', price=Decimal('80.00'), stock=4)
+        Product.objects.create(sku='B', name='Table', description='', price=Decimal('200.00'), in_stock=False)
+        path = os.path.join(self.tmp, 'catalog.csv.gz')
+        call_command('export_products', path, stdout=StringIO())
+
+        Product.objects.all().delete()
+        call_command('import_products', path, '--workers', '1', stdout=StringIO())
+        self.assertEqual(
+            list(Product.objects.order_by('sku').values_list('sku', 'name', 'description', 'price', 'in_stock', 'stock')),
+            [
+                ('A', 'Chair, oak', 'Line one\nline two', Decimal('80.00'), True, 4),
+                ('B', 'Table', '', Decimal('200.00'), False, None),
+            ],
+        )
+
+
+    def test_products_without_sku_round_trip(self):
+        kept = Product.objects.create(sku='A', name='Chair', description='', price=Decimal('80.00'))
+        loose = Product.objects.create(name='Stool', description='Pine', price=Decimal('15.00'), stock=2)
+        path = os.path.join(self.tmp, 'catalog.ndjson')
+        call_command('export_products', path, stdout=StringIO())
+
+        # Into the same database: updated in place, no duplicates
+        Product.objects.filter(pk=loose.pk).update(name='Renamed')
+        out = StringIO()
+        call_command('import_products', path, '--workers', '1', stdout=out, stderr=StringIO())
+        self.assertIn('Imported 2 products', out.getvalue())
+        self.assertEqual(
+            list(Product.objects.order_by('id').values_list('id', 'sku', 'name', 'stock')),
+            [(kept.id, 'A', 'Chair', None), (loose.id, None, 'Stool', 2)],
+        )
+
+        # Into an empty database, twice: inserted once under its old id, still without a SKU
+        Product.objects.all().delete()
+        for _ in range(2):
+            call_command('import_products', path, '--workers', '1', stdout=StringIO(), stderr=StringIO())
+        self.assertEqual(
+            list(Product.objects.order_by('name').values_list('sku', 'name', 'description', 'price')),
+            [('A', 'Chair', '', Decimal('80.00')), (None, 'Stool', 'Pine', Decimal('15.00'))],
+        )
+        self.assertEqual(Product.objects.get(sku=None).id, loose.id)
+        # New products are numbered after the imported ids
+        self.assertGreater(Product.objects.create(name='Bench', description='', price=Decimal('1.00')).id, loose.id)
+
+
+class OrderExportTests(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user('staff', 'staff@example.com', is_staff=True)
+        self.customer = User.objects.create_user('jane', 'jane@example.com')
+        lamp = Product.objects.create(name='Lamp, brass', description='', price=Decimal('10.00'))
+        rug = Product.objects.create(name='Rug', description='', price=Decimal('5.00'))
+        self.orders = []
+        for day, state in ((1, 'pending'), (2, 'shipped'), (3, 'cancelled')):
+            order = Order.objects.create(
+                user=self.customer, status=state, shipping_address='1 Road', billing_address='1 Road',
+                total_amount=Decimal('25.00'),
+            )
+            OrderItem.objects.create(order=order, product=lamp, quantity=2, price=Decimal('10.00'))
+            OrderItem.objects.create(order=order, product=rug, quantity=1, price=Decimal('5.00'))
+            Order.objects.filter(pk=order.pk).update(created_at=timezone.make_aware(datetime(2024, 1, day, 12)))
+            self.orders.append(order)
+        self.client = APIClient()
+        self.client.force_authenticate(self.staff)
+
+    def content(self, response):
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_export_streams_one_row_per_item(self):
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/orders/export/')
+            body = self.content(response)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        lines = body.strip().splitlines()
+        self.assertEqual(lines[0], 'order_id,created_at,status,customer,email,total_amount,product_id,product_name,quantity,price')
+        self.assertEqual(len(lines), 7)
+        self.assertIn('"Lamp, brass",2,10.00', lines[1])
+
+    def test_ndjson_export_with_filters(self):
+        response = self.client.get('/api/orders/export/', {
+            'format': 'ndjson', 'status': 'pending,shipped,cancelled',
+            'created_after': '2024-01-02', 'created_before': '2024-01-02',
+        })
+        orders = [json.loads(line) for line in self.content(response).splitlines()]
+        self.assertEqual([o['id'] for o in orders], [self.orders[1].id])
+        self.assertEqual([i['quantity'] for i in orders[0]['items']], [2, 1])
+
+        response = self.client.get('/api/orders/export/', {'format': 'ndjson', 'status': 'pending,shipped'})
+        self.assertEqual(len(self.content(response).splitlines()), 2)
+
+    def test_export_is_staff_only_and_validates_dates(self):
+        self.assertEqual(self.client.get('/api/orders/export/', {'created_after': 'yesterday'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/orders/export/', {'format': 'xml'}).status_code, 400)
+        self.client.force_authenticate(self.customer)
+        self.assertEqual(self.client.get('/api/orders/export/').status_code, 403)
+
+    def test_errors_are_json_whatever_the_accept_header(self):
+        response = self.client.get('/api/orders/export/', HTTP_ACCEPT='application/json')
+        self.assertEqual((response.status_code, response['Content-Type']), (200, 'text/csv'))
+        self.client.force_authenticate(self.customer)
+        for params in ({}, {'format': 'ndjson'}):
+            response = self.client.get('/api/orders/export/', params, HTTP_ACCEPT='application/json')
+            self.assertEqual((response.status_code, response['Content-Type']), (403, 'application/json'))
+            self.assertIn('detail', json.loads(response.content))
+
+
+class StockReservationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('buyer', 'buyer@example.com')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.product = Product.objects.create(name='Limited', description='', price=Decimal('5.00'), stock=3)
+
+    def order(self, quantity):
+        return self.client.post('/api/orders/', {
+            'shipping_address': 'x', 'billing_address': 'x',
+            'items': [{'product': self.product.id, 'quantity': quantity}],
+        }, format='json')
+
+    def test_reserves_and_refuses_to_oversell(self):
+        self.assertEqual(self.order(2).status_code, 201)
+        response = self.order(2)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['out_of_stock'], [str(self.product.id)])
+        self.assertEqual(Order.objects.count(), 1)
+
+        self.assertEqual(self.order(1).status_code, 201)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 0)
+        self.assertFalse(self.product.in_stock)
+
+    def test_catalog_cache_is_only_invalidated_when_in_stock_flips(self):
+        staff = User.objects.create_user('staff', is_staff=True)
+
+        def bumped(change):
+            version = get_catalog_version()
+            with self.captureOnCommitCallbacks(execute=True):
+                change()
+            return get_catalog_version() != version
+
+        def cancel(order_id):
+            self.client.force_authenticate(staff)
+            self.client.post(f'/api/orders/{order_id}/update_status/', {'status': 'cancelled'})
+            self.client.force_authenticate(self.user)
+
+        first = {}
+        self.assertFalse(bumped(lambda: first.update(self.order(2).data)))
+        self.assertTrue(bumped(lambda: self.order(1)))
+        # Back in stock after cancelling, then still in stock after the second cancel
+        self.assertTrue(bumped(lambda: cancel(first['id'])))
+        last = Order.objects.latest('id').id
+        self.assertFalse(bumped(lambda: cancel(last)))
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.stock, self.product.in_stock), (3, True))
+
+    def test_reservation_shows_in_the_next_stock_read(self):
+        cache.clear()
+        url = f'/api/products/stock/?ids={self.product.id},999999'
+        self.assertEqual(self.client.get(url).data, {
+            'results': [{'id': self.product.id, 'stock': 3, 'in_stock': True}], 'missing': [999999],
+        })
+        # Cached product responses leave stock out, so they cannot go stale on it
+        self.assertNotIn('stock', self.client.get(f'/api/products/{self.product.id}/').data)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.order(2).status_code, 201)
+        self.assertEqual(self.client.get(url).data['results'], [{'id': self.product.id, 'stock': 1, 'in_stock': True}])
+        self.assertEqual(self.client.get('/api/products/stock/?ids=x').status_code, 400)
+
+    def test_deleting_an_open_order_releases_its_stock(self):
+        open_id = self.order(1).data['id']
+        delivered_id = self.order(1).data['id']
+        Order.objects.filter(pk=delivered_id).update(status='delivered')
+        self.assertEqual(self.client.delete(f'/api/orders/{open_id}/').status_code, 204)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 2)
+        # Delivered stock has left the warehouse
+        Order.objects.filter(pk=delivered_id).delete()
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 2)
+
+        # Cascades from deleting the customer too
+        self.order(2)
+        self.user.delete()
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.stock, self.product.in_stock), (2, True))
+
+    def test_cancellation_releases_stock_once(self):
+        order_id = self.order(3).data['id']
+        staff = User.objects.create_user('staff', is_staff=True)
+        self.client.force_authenticate(staff)
+        for _ in range(2):
+            response = self.client.post(f'/api/orders/{order_id}/update_status/', {'status': 'cancelled'})
+            self.assertEqual(response.status_code, 200)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 3)
+        self.assertTrue(self.product.in_stock)
+
+        response = self.client.post(f'/api/orders/{order_id}/update_status/', {'status': 'pending'})
+        self.assertEqual(response.status_code, 400)
+
+
+class OrderTransitionTests(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user('staff', 'staff@example.com', is_staff=True)
+        self.customer = User.objects.create_user('jane', 'jane@example.com')
+        self.customer.profile.phone = '+15550100'
+        self.customer.profile.save()
+        self.product = Product.objects.create(name='Lamp', description='', price=Decimal('10.00'), stock=10)
+        self.orders = {}
+        for state in ('pending', 'pending', 'processing', 'shipped', 'cancelled'):
+            order = Order.objects.create(
+                user=self.customer, status=state, shipping_address='1 Road', billing_address='1 Road',
+                total_amount=Decimal('10.00'),
+            )
+            OrderItem.objects.create(order=order, product=self.product, quantity=1, price=Decimal('10.00'))
+            self.orders.setdefault(state, []).append(order.id)
+        self.client = APIClient()
+        self.client.force_authenticate(self.staff)
+
+    def bulk(self, ids, new_status):
+        return self.client.post('/api/orders/bulk_update_status/', {'ids': ids, 'status': new_status}, format='json')
+
+    def test_bulk_cancel_reports_outcome_per_order(self):
+        pending, processing = self.orders['pending'], self.orders['processing']
+        ids = pending + processing + self.orders['shipped'] + self.orders['cancelled'] + [999999]
+        outbox = OutboxMessage.objects.count()
+        with CaptureQueriesContext(connection) as captured:
+            response = self.bulk(ids, 'cancelled')
+        self.assertEqual(response.status_code, 200)
+
+        results = response.data['results']
+        self.assertEqual([r['id'] for r in results], ids)
+        self.assertEqual(
+            [r['result'] for r in results],
+            ['updated', 'updated', 'updated', 'invalid_transition', 'unchanged', 'not_found'],
+        )
+        self.assertEqual(response.data['counts'], {'updated': 3, 'invalid_transition': 1, 'unchanged': 1, 'not_found': 1})
+        self.assertEqual(results[3]['from'], 'shipped')
+
+        # One UPDATE per source status, not per order
+        order_updates = [q for q in captured.captured_queries if q['sql'].startswith('UPDATE "products_order"')]
+        self.assertEqual(len(order_updates), 2)
+        self.assertEqual(set(Order.objects.filter(pk__in=pending + processing).values_list('status', flat=True)), {'cancelled'})
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 13)
+        # An email and an SMS for each changed order, written in one batch
+        self.assertEqual(OutboxMessage.objects.count() - outbox, 6)
+
+    def test_state_machine_allows_forward_steps_only(self):
+        order_id = self.orders['pending'][0]
+        for new_status, expected in (('shipped', 400), ('processing', 200), ('shipped', 200), ('shipped', 200),
+                                     ('processing', 400), ('cancelled', 400), ('delivered', 200)):
+            response = self.client.post(f'/api/orders/{order_id}/update_status/', {'status': new_status})
+            self.assertEqual(response.status_code, expected, new_status)
+        self.assertEqual(Order.objects.get(pk=order_id).status, 'delivered')
+
+    def test_customers_can_only_cancel_pending_orders(self):
+        self.client.force_authenticate(self.customer)
+        pending, processing = self.orders['pending'][0], self.orders['processing'][0]
+        for order_id, new_status, expected in ((pending, 'processing', 403), (pending, 'delivered', 403),
+                                               (processing, 'cancelled', 400), (pending, 'cancelled', 200),
+                                               (pending, 'cancelled', 200)):
+            response = self.client.post(f'/api/orders/{order_id}/update_status/', {'status': new_status})
+            self.assertEqual(response.status_code, expected, (order_id, new_status))
+        self.assertEqual(Order.objects.get(pk=processing).status, 'processing')
+        self.assertEqual(Order.objects.get(pk=pending).status, 'cancelled')
+
+    def test_patch_cannot_change_status(self):
+        order_id = self.orders['cancelled'][0]
+        for client_user in (self.staff, self.customer):
+            self.client.force_authenticate(client_user)
+            response = self.client.patch(f'/api/orders/{order_id}/', {'status': 'pending'}, format='json')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.data['status'], 'cancelled')
+        self.assertEqual(Order.objects.get(pk=order_id).status, 'cancelled')
+
+    def test_bulk_is_staff_only_and_validates_input(self):
+        self.assertEqual(self.bulk([1], 'bogus').status_code, 400)
+        self.assertEqual(self.bulk('1,2', 'shipped').status_code, 400)
+        self.assertEqual(self.bulk([], 'shipped').status_code, 400)
+        self.assertEqual(self.bulk(list(range(5001)), 'shipped').status_code, 400)
+        self.client.force_authenticate(self.customer)
+        self.assertEqual(self.bulk(self.orders['pending'], 'processing').status_code, 403)
+
+
+class StockConcurrencyTests(TransactionTestCase):
+    def test_concurrent_checkouts_never_oversell(self):
+        product = Product.objects.create(name='Drop', description='', price=Decimal('1.00'), stock=25)
+        threads, outcomes = 40, []
+        barrier = threading.Barrier(threads)
+
+        def checkout():
+            try:
+                barrier.wait()
+                for _ in range(50):
+                    try:
+                        with transaction.atomic():
+                            reserve_stock([(product.id, 1)])
+                        outcomes.append(True)
+                        return
+                    except InsufficientStock:
+                        outcomes.append(False)
+                        return
+                    except OperationalError:
+                        # SQLite reports lock contention instead of waiting; try again
+                        time.sleep(0.005)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=checkout) for _ in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        product.refresh_from_db()
+        self.assertEqual(len(outcomes), threads)
+        self.assertEqual(outcomes.count(True), 25)
+        self.assertEqual(product.stock, 0)
+        self.assertFalse(product.in_stock)
+
+
+class DatabaseProfileTests(SimpleTestCase):
+    def open_connection(self, path, **options):
+        config = connections.configure_settings({'default': {
+            'ENGINE': 'ecommerce_backend.sqlite3', 'NAME': path, 'PRAGMAS': {'journal_mode': 'WAL', 'synchronous': 'NORMAL'},
+            'OPTIONS': options,
+        }})['default']
+        conn = DatabaseWrapper(config, alias='profile-test')
+        self.addCleanup(conn.close)
+        conn.ensure_connection()
+        return conn
+
+    def test_sqlite_profile_applies_pragmas_and_immediate_transactions(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        path = os.path.join(tmp, 'profile.sqlite3')
+        first = self.open_connection(path, transaction_mode='IMMEDIATE')
+        second = self.open_connection(path, timeout=0, transaction_mode='IMMEDIATE')
+
+        with first.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+        # BEGIN IMMEDIATE takes the write lock up front, before anything is written
+        first._start_transaction_under_autocommit()
+        self.addCleanup(first.connection.rollback)
+        with self.assertRaisesMessage(OperationalError, 'database is locked'):
+            second._start_transaction_under_autocommit()
+
+
+class BenchmarkBudgetTests(SimpleTestCase):
+    def test_budget_violations_are_reported(self):
+        measurement = benchmarks.Measurement('orders', [float(ms) for ms in range(1, 101)], [3, 5], [200, 200])
+        self.assertEqual(measurement.p50, 50.5)
+        self.assertEqual(measurement.p95, 95.0)
+        self.assertEqual(measurement.p99, 99.0)
+        self.assertEqual(benchmarks.check_budget(measurement, {'max_queries': 5, 'p95_ms': 100, 'status': 200}), [])
+        self.assertEqual(
+            benchmarks.check_budget(measurement, {'max_queries': 4, 'p99_ms': 50, 'status': 201}),
+            ['queries 5 > 4', 'p99_ms 99.0 > 50', 'status [200] != 201'],
+        )
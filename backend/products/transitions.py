@@ -0,0 +1,108 @@
+
+"""
+Order status state machine.
+
+pending -> processing -> shipped -> delivered, and pending/processing ->
+cancelled. Setting an order to the status it already has is a no-op.
+Transitions are applied with one conditional UPDATE per source status, and
+the follow-up work (sales rollups, stock release, customer notifications)
+is done for the whole batch at once, inside the same transaction.
+"""
+
+from collections import defaultdict
+
+from django.db import transaction
+from django.utils import timezone
+
+from analytics.rollups import move_orders
+from notifications.outbox import email_message, enqueue_batch, sms_message
+from .inventory import release_stock_for_orders
+from .models import Order
+
+TRANSITIONS = {
+    'pending': ('processing', 'cancelled'),
+    'processing': ('shipped', 'cancelled'),
+    'shipped': ('delivered',),
+    'delivered': (),
+    'cancelled': (),
+}
+
+UPDATED = 'updated'
+UNCHANGED = 'unchanged'
+INVALID = 'invalid_transition'
+NOT_FOUND = 'not_found'
+
+
+def status_messages(order):
+    """Unsaved outbox messages telling the customer about the order's new status"""
+    profile = getattr(order.user, 'profile', None)
+    message = f"""
+                Dear {profile.full_name if profile else order.user.username},
+                
+                Your order #{order.id} status has been updated to: {order.get_status_display()}
+                
+                Thank you for shopping with us!
+            """
+    messages = [email_message(f"Order #{order.id} Status Update", message, [order.user.email])]
+    
+    # Send SMS notification if phone number available
+    if profile and profile.phone:
+        messages.append(sms_message(
+            profile.phone, f"Order #{order.id} status updated to {order.get_status_display()}"
+        ))
+    return messages
+
+
+def transition_orders(order_ids, new_status, queryset=None):
+    """
+    Move the given orders to `new_status` where the state machine allows it.
+
+    `queryset` limits which orders may be touched (default: all). Returns a
+    list of per-order outcomes in input order and the updated Order objects.
+    """
+    if new_status not in TRANSITIONS:
+        raise ValueError(f'Unknown status {new_status}')
+    queryset = Order.objects.all() if queryset is None else queryset
+    
+    with transaction.atomic():
+        # Lock the rows (PostgreSQL; SQLite holds the write lock for the whole
+        # transaction) so the statuses read here are still current below
+        orders = queryset.filter(pk__in=order_ids).select_related('user__profile').select_for_update(of=('self',))
+        orders = {order.pk: order for order in orders}
+        
+        outcomes = []
+        by_source = defaultdict(list)
+        for order_id in dict.fromkeys(order_ids):
+            order = orders.get(order_id)
+            if order is None:
+                outcomes.append({'id': order_id, 'result': NOT_FOUND})
+                continue
+            outcome = {'id': order_id, 'from': order.status, 'to': new_status}
+            if order.status == new_status:
+                outcome['result'] = UNCHANGED
+            elif new_status in TRANSITIONS[order.status]:
+                outcome['result'] = UPDATED
+                by_source[order.status].append(order)
+            else:
+                outcome['result'] = INVALID
+                outcome['error'] = f'Cannot change status from {order.status} to {new_status}'
+            outcomes.append(outcome)
+        
+        moved = []
+        now = timezone.now()
+        for source, source_orders in by_source.items():
+            Order.objects.filter(pk__in=[order.pk for order in source_orders], status=source).update(
+                status=new_status, updated_at=now
+            )
+            for order in source_orders:
+                order.status = new_status
+                order.updated_at = now
+                moved.append((order, source))
+        
+        if moved:
+            move_orders(moved, new_status)
+            if new_status == 'cancelled':
+                release_stock_for_orders([order.pk for order, _ in moved])
+            enqueue_batch([message for order, _ in moved for message in status_messages(order)])
+    
+    return outcomes, list(orders.values())
@@ -2,29 +2,198 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.core.mail import send_mail
-from django.conf import settings
-from .models import Product, Order
-from .serializers import ProductSerializer, OrderSerializer
+from django.http import StreamingHttpResponse
+from ecommerce_backend.renderers import ORJSONRenderer
+from .models import Product, Order, OrderItem
+from .serializers import ProductSerializer, OrderSerializer, OrderItemSerializer, OrderSummarySerializer
+from .search import search_products
+from .cache import CatalogCacheMixin
+from .transitions import INVALID, NOT_FOUND, TRANSITIONS, transition_orders
+from .exports import FORMATS, ExportContentNegotiation, buffered, csv_rows, iterate_orders, ndjson_rows
+from .filters import ProductFilters, created_range
+from .pagination import KeysetPagination
+from .projections import ProductProjection
 import logging
 
 logger = logging.getLogger(__name__)
 
-class ProductViewSet(viewsets.ModelViewSet):
+class ProductViewSet(CatalogCacheMixin, viewsets.ModelViewSet):
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    pagination_class = KeysetPagination
+    search_max_results = 50
+    batch_max_ids = 100
+    # Actions that honour ?view=, ?fields= and ?omit=
+    projected_actions = ('list', 'retrieve', 'search', 'batch')
+    
+    def get_product_filters(self):
+        if not hasattr(self, '_product_filters'):
+            self._product_filters = ProductFilters(self.request.query_params)
+        return self._product_filters
+    
+    def get_projection(self):
+        if not hasattr(self, '_projection'):
+            available = list(ProductSerializer().fields)
+            params = self.request.query_params if self.action in self.projected_actions else {}
+            self._projection = ProductProjection(params, available)
+        return self._projection
+    
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        required = ['id']
+        if self.action == 'list':
+            queryset = self.get_product_filters().apply(queryset)
+            # The keyset field is read to build the next/previous cursors
+            required.append(self.get_keyset_ordering()[0])
+        if self.action in self.projected_actions:
+            # Read-only actions serialize plain rows holding just the selected fields' columns
+            queryset = queryset.values(*self.get_serializer().values_columns(*required))
+        return queryset
+    
+    def get_serializer(self, *args, **kwargs):
+        if self.action in self.projected_actions:
+            kwargs.setdefault('fields', self.get_projection().fields)
+        return super().get_serializer(*args, **kwargs)
+    
+    def get_keyset_ordering(self):
+        """Sort key for KeysetPagination, from the whitelisted ?ordering= values"""
+        return self.get_product_filters().keyset_ordering
+    
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        filters = self.get_product_filters()
+        if filters.facets:
+            response.data['facets'] = filters.facet_counts(Product.objects.all())
+        return response
+    
+    @action(detail=False, methods=['get'])
+    def batch(self, request):
+        """Products for ?ids=3,1,2 in request order, in one query; unknown ids are listed in `missing`"""
+        return self.cached_response(request, self.batch_response)
+    
+    def requested_ids(self):
+        """Unique ids from ?ids=3,1,2 in request order, and an error response if they are unusable"""
+        try:
+            ids = [int(value) for value in self.request.query_params.get('ids', '').split(',') if value.strip()]
+        except ValueError:
+            return None, Response({'error': 'ids must be a comma-separated list of product ids'}, status=status.HTTP_400_BAD_REQUEST)
+        ids = list(dict.fromkeys(ids))
+        if not ids:
+            return None, Response({'error': 'Query parameter ids is required'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(ids) > self.batch_max_ids:
+            return None, Response(
+                {'error': f'At most {self.batch_max_ids} ids per request'}, status=status.HTTP_400_BAD_REQUEST
+            )
+        return ids, None
+    
+    def batch_response(self):
+        ids, error = self.requested_ids()
+        if error is not None:
+            return error
+        
+        serializer = self.get_serializer()
+        products = {row['id']: row for row in self.get_queryset().filter(pk__in=ids)}
+        return Response({
+            'results': [serializer.to_representation(products[pk]) for pk in ids if pk in products],
+            'missing': [pk for pk in ids if pk not in products],
+        })
+    
+    @action(detail=False, methods=['get'])
+    def stock(self, request):
+        """
+        Live stock counts for ?ids=3,1,2. Not cached: stock changes with every
+        order, so it is left out of the cached product responses.
+        """
+        ids, error = self.requested_ids()
+        if error is not None:
+            return error
+        
+        products = {row['id']: row for row in Product.objects.filter(pk__in=ids).values('id', 'stock', 'in_stock')}
+        return Response({
+            'results': [products[pk] for pk in ids if pk in products],
+            'missing': [pk for pk in ids if pk not in products],
+        })
+    
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """Ranked full-text search over product name and description"""
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'error': 'Query parameter q is required'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            limit = min(int(request.query_params.get('limit', 20)), self.search_max_results)
+        except ValueError:
+            limit = 20
+        prefix = request.query_params.get('prefix', 'true').lower() != 'false'
+        
+        hits = search_products(query, limit=max(limit, 1), prefix=prefix)
+        serializer = self.get_serializer()
+        rows = self.get_queryset().filter(pk__in=[hit.id for hit in hits])
+        products = {row['id']: row for row in rows}
+        
+        results = []
+        for hit in hits:
+            product = products.get(hit.id)
+            if product is None:
+                continue
+            data = serializer.to_representation(product)
+            data['search'] = {
+                'rank': hit.rank,
+                'highlight': hit.highlight,
+                'snippet': hit.snippet,
+            }
+            results.append(data)
+        
+        return Response({'query': query, 'count': len(results), 'results': results})
 
 class OrderViewSet(viewsets.ModelViewSet):
     serializer_class = OrderSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
+    bulk_max_orders = 5000
+    
+    def is_summary_view(self):
+        return self.action == 'list' and self.request.query_params.get('view') == 'summary'
+    
+    def get_serializer_class(self):
+        if self.is_summary_view():
+            return OrderSummarySerializer
+        return OrderSerializer
     
     def get_queryset(self):
         user = self.request.user
         # Admins can see all orders, users can only see their own
         if user.is_staff:
-            return Order.objects.all().order_by('-created_at')
-        return Order.objects.filter(user=user).order_by('-created_at')
+            queryset = Order.objects.all()
+        else:
+            queryset = Order.objects.filter(user=user)
+        
+        if self.is_summary_view():
+            queryset = queryset.with_summary()
+        elif self.action == 'list':
+            # Items are attached as rows once the page is known, see paginate_queryset
+            queryset = queryset.select_related('user__profile')
+        else:
+            queryset = queryset.with_details()
+        return queryset.order_by('-created_at', '-id')
+    
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        if page is not None and self.action == 'list' and not self.is_summary_view():
+            self.attach_item_rows(page)
+        return page
+    
+    def attach_item_rows(self, orders):
+        """Load the items of `orders` in one query as rows for OrderItemSerializer's fast path"""
+        columns = OrderItemSerializer().values_columns('order_id')
+        items = {}
+        for row in OrderItem.objects.filter(order_id__in=[order.pk for order in orders]).order_by('id').values(*columns):
+            items.setdefault(row['order_id'], []).append(row)
+        for order in orders:
+            # order.items.all() reads this cache, as it does after prefetch_related
+            order._prefetched_objects_cache = {'items': items.get(order.pk, [])}
     
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data, context={'request': request})
@@ -33,48 +202,85 @@ class OrderViewSet(viewsets.ModelViewSet):
         
         # Order notification is handled by the signal in models.py
         
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+        # Re-read with related rows joined so the response costs a fixed number of queries
+        order = Order.objects.with_details().get(pk=order.pk)
+        return Response(self.get_serializer(order).data, status=status.HTTP_201_CREATED)
+    
+    @action(
+        detail=False, methods=['get'], permission_classes=[permissions.IsAdminUser],
+        renderer_classes=[ORJSONRenderer], content_negotiation_class=ExportContentNegotiation,
+    )
+    def export(self, request):
+        """Stream all matching orders with their items as CSV (default) or NDJSON"""
+        fmt = request.query_params.get('format', 'csv')
+        if fmt not in FORMATS:
+            return Response({'error': 'format must be csv or ndjson'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        queryset = Order.objects.all()
+        
+        statuses = [s for s in request.query_params.get('status', '').split(',') if s]
+        if statuses:
+            queryset = queryset.filter(status__in=statuses)
+        
+        try:
+            queryset = queryset.filter(**created_range(request.query_params))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        rows = csv_rows if fmt == 'csv' else ndjson_rows
+        response = StreamingHttpResponse(buffered(rows(iterate_orders(queryset))), content_type=FORMATS[fmt])
+        response['Content-Disposition'] = f'attachment; filename="orders.{fmt}"'
+        return response
     
     @action(detail=True, methods=['post'])
     def update_status(self, request, pk=None):
-        """Update order status and notify customer"""
+        """
+        Update order status and queue a customer notification.
+        
+        Staff may make any allowed transition; customers may only cancel
+        their own pending orders.
+        """
         order = self.get_object()
         new_status = request.data.get('status')
         
         if not new_status:
             return Response({'error': 'Status is required'}, status=status.HTTP_400_BAD_REQUEST)
         
-        order.status = new_status
-        order.save()
+        if new_status not in TRANSITIONS:
+            return Response({'error': 'Unknown status'}, status=status.HTTP_400_BAD_REQUEST)
         
-        # Send notification email to customer about status change
-        try:
-            subject = f"Order #{order.id} Status Update"
-            message = f"""
-                Dear {order.user.profile.full_name if hasattr(order.user, 'profile') else order.user.username},
-                
-                Your order #{order.id} status has been updated to: {order.get_status_display()}
-                
-                Thank you for shopping with us!
-            """
-            
-            send_mail(
-                subject,
-                message,
-                settings.DEFAULT_FROM_EMAIL,
-                [order.user.email],
-                fail_silently=False,
+        queryset = self.get_queryset()
+        if not request.user.is_staff:
+            if new_status != 'cancelled':
+                return Response({'error': 'Only staff can change an order to this status'}, status=status.HTTP_403_FORBIDDEN)
+            # Checked again under the row lock by transition_orders
+            queryset = queryset.filter(status__in=('pending', 'cancelled'))
+        
+        outcomes, orders = transition_orders([order.pk], new_status, queryset=queryset)
+        if outcomes[0]['result'] == NOT_FOUND:
+            return Response({'error': 'Only pending orders can be cancelled'}, status=status.HTTP_400_BAD_REQUEST)
+        if outcomes[0]['result'] == INVALID:
+            return Response({'error': outcomes[0]['error']}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response(OrderSerializer(orders[0]).data)
+    
+    @action(detail=False, methods=['post'], permission_classes=[permissions.IsAdminUser])
+    def bulk_update_status(self, request):
+        """Move many orders to one status; responds with an outcome per order"""
+        ids = request.data.get('ids')
+        new_status = request.data.get('status')
+        
+        if new_status not in TRANSITIONS:
+            return Response({'error': 'Unknown status'}, status=status.HTTP_400_BAD_REQUEST)
+        if not isinstance(ids, list) or not ids or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+            return Response({'error': 'ids must be a non-empty list of order ids'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(ids) > self.bulk_max_orders:
+            return Response(
+                {'error': f'At most {self.bulk_max_orders} orders per request'}, status=status.HTTP_400_BAD_REQUEST
             )
-            
-            # Send SMS notification if phone number available
-            if hasattr(order.user, 'profile') and order.user.profile.phone:
-                try:
-                    # This is a placeholder - implement your SMS service integration here
-                    logger.info(f"Would send SMS to {order.user.profile.phone}: Order #{order.id} status updated to {order.get_status_display()}")
-                except Exception as e:
-                    logger.error(f"Failed to send SMS notification: {str(e)}")
-        
-        except Exception as e:
-            logger.error(f"Failed to send status update notification: {str(e)}")
-        
-        return Response(OrderSerializer(order).data)
+        
+        outcomes, _ = transition_orders(ids, new_status)
+        counts = {}
+        for outcome in outcomes:
+            counts[outcome['result']] = counts.get(outcome['result'], 0) + 1
+        return Response({'status': new_status, 'counts': counts, 'results': outcomes})
@@ -83,15 +83,70 @@ export const authAPI = {
   }
 };
 
+// Envelope returned by paginated list endpoints
+export interface Page<T> {
+  page_size: number;
+  count: number | null;
+  offset: number | null;
+  next_cursor: string | null;
+  previous_cursor: string | null;
+  next: string | null;
+  previous: string | null;
+  results: T[];
+}
+
+const pageQuery = (cursor?: string | null) =>
+  cursor ? `?cursor=${encodeURIComponent(cursor)}` : '';
+
+// Server-side product list filters, sort order and facet counts
+export interface ProductQuery {
+  min_price?: string | number;
+  max_price?: string | number;
+  in_stock?: boolean;
+  created_after?: string;
+  created_before?: string;
+  ordering?: '-created_at' | 'created_at' | 'price' | '-price' | 'name' | '-name';
+  facets?: boolean;
+  view?: 'card';
+  fields?: string;
+  omit?: string;
+}
+
+export interface ProductFacets {
+  total: number;
+  price_range: { min: string | null; max: string | null };
+  price: { min: string; max: string | null; count: number }[];
+  in_stock: { true: number; false: number };
+}
+
+const productQuery = (cursor?: string | null, query: ProductQuery = {}) => {
+  const params = new URLSearchParams();
+  Object.entries(query).forEach(([key, value]) => {
+    if (value !== undefined && value !== '') params.set(key, String(value));
+  });
+  if (cursor) params.set('cursor', cursor);
+  const search = params.toString();
+  return search ? `?${search}` : '';
+};
+
 // Product related functions
 export const productsAPI = {
-  getAll: async () => {
-    return fetchAPI<any[]>('/products/');
+  getAll: async (cursor?: string | null, query?: ProductQuery) => {
+    return fetchAPI<Page<any> & { facets?: ProductFacets }>(`/products/${productQuery(cursor, query)}`);
   },
   
   getById: async (id: string | number) => {
     return fetchAPI<any>(`/products/${id}/`);
   },
+
+  // Hydrate carts/wishlists in one request: results keep the order of `ids`
+  getMany: async (ids: (string | number)[], query: Pick<ProductQuery, 'view' | 'fields' | 'omit'> = {}) => {
+    const params = new URLSearchParams({ ids: ids.join(',') });
+    Object.entries(query).forEach(([key, value]) => {
+      if (value) params.set(key, String(value));
+    });
+    return fetchAPI<{ results: any[]; missing: number[] }>(`/products/batch/?${params.toString()}`);
+  },
   
   create: async (productData: any) => {
     return fetchAPI<any>('/products/', {
@@ -120,11 +175,49 @@ export const productsAPI = {
     });
   },
 
-  getOrders: async () => {
-    return fetchAPI<any[]>('/orders/');
+  getOrders: async (cursor?: string | null) => {
+    return fetchAPI<Page<any>>(`/orders/${pageQuery(cursor)}`);
   },
   
   getOrderById: async (id: string | number) => {
     return fetchAPI<any>(`/orders/${id}/`);
   }
 };
+
+export interface Cart {
+  items: { product: number; name: string; price: string; quantity: number; line_total: string }[];
+  item_count: number;
+  subtotal: string;
+}
+
+// Server-side cart; totals are maintained by the server
+export const cartAPI = {
+  get: async () => fetchAPI<Cart>('/cart/'),
+
+  add: async (product: number, quantity = 1) => {
+    return fetchAPI<Cart>('/cart/items/', {
+      method: 'POST',
+      body: JSON.stringify({ product, quantity })
+    });
+  },
+
+  setQuantity: async (product: number, quantity: number) => {
+    return fetchAPI<Cart>(`/cart/items/${product}/`, {
+      method: 'PUT',
+      body: JSON.stringify({ quantity })
+    });
+  },
+
+  remove: async (product: number) => {
+    return fetchAPI<Cart>(`/cart/items/${product}/`, { method: 'DELETE' });
+  },
+
+  clear: async () => fetchAPI<Cart>('/cart/', { method: 'DELETE' }),
+
+  checkout: async (addresses: { shipping_address: string; billing_address: string }) => {
+    return fetchAPI<any>('/cart/checkout/', {
+      method: 'POST',
+      body: JSON.stringify(addresses)
+    });
+  }
+};